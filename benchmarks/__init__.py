@@ -0,0 +1 @@
+"""Benchmarks for the openai_token_counter package."""
@@ -0,0 +1,110 @@
+"""Harness for the error and the speed of the approximate token counts.
+
+Requests are built from held out synthetic text and from the Python standard library sources, and counted exactly
+and approximately. The harness reports how much the upper bound overestimates, how often it would undercount (which
+should be never), the speedup against the exact path, and how often a budget check falls back to the exact count.
+Run with ``python -m benchmarks.approximate``.
+"""
+
+import glob
+import os
+import statistics
+import timeit
+from functools import partial
+from typing import Any
+
+from openai_token_counter import get_token_counter
+from openai_token_counter.approximate import calibration_corpus
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def make_requests() -> list[list[dict[str, Any]]]:
+    """Build the messages of the requests.
+
+    Returns:
+        list[list[dict[str, Any]]]: The messages of each request.
+    """
+    contents = calibration_corpus(seed=42)
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[
+        :100
+    ]:
+        with open(path, encoding="utf-8", errors="ignore") as source:
+            contents.append(source.read()[:8000])
+
+    return [
+        [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": content},
+        ]
+        for content in contents
+    ]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Get a percentile of values.
+
+    Args:
+        values (list[float]): The values.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main() -> None:
+    """Run the harness and print the error distribution, the speedup and the fallback rate."""
+    token_counter = get_token_counter(MODEL)
+    requests = make_requests()
+    exact = [token_counter.estimate_raw_token_count(messages) for messages in requests]
+    approximate = [
+        token_counter.estimate_raw_token_count(messages, approximate=True)
+        for messages in requests
+    ]
+
+    ratios = [approximate[index] / exact[index] for index in range(len(requests))]
+    undercounts = sum(
+        approximate[index] < exact[index] for index in range(len(requests))
+    )
+    print(f"{len(requests)} requests, {undercounts} undercounted")
+    print(
+        "upper bound / exact:"
+        f" min {min(ratios):.2f}  p50 {percentile(ratios, 0.5):.2f}"
+        f"  p90 {percentile(ratios, 0.9):.2f}  p99 {percentile(ratios, 0.99):.2f}"
+        f"  max {max(ratios):.2f}"
+    )
+
+    def count_all(approximate: bool) -> list[int]:
+        return [
+            token_counter.estimate_raw_token_count(messages, approximate=approximate)
+            for messages in requests
+        ]
+
+    timings = {}
+    for label, is_approximate in (("exact", False), ("approximate", True)):
+        seconds = min(
+            timeit.repeat(partial(count_all, is_approximate), number=1, repeat=5)
+        )
+        timings[label] = seconds / len(requests)
+    print(
+        f"exact {timings['exact'] * 1e6:8.1f} us/request"
+        f"  approximate {timings['approximate'] * 1e6:8.1f} us/request"
+        f"  speedup {timings['exact'] / timings['approximate']:5.1f}x"
+    )
+
+    median = statistics.median(exact)
+    for scale in (0.5, 1.0, 2.0, 4.0):
+        budget = int(median * scale)
+        fallbacks = sum(upper_bound > budget for upper_bound in approximate)
+        print(
+            f"budget {budget:>6} tokens: exact fallback for"
+            f" {fallbacks / len(requests):6.1%} of the requests"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark for counting many requests in a single batch.
+
+Run with ``python -m benchmarks.batch_counting``.
+"""
+
+import time
+from typing import Any
+
+from openai_token_counter import openai_token_counter, openai_token_counts
+
+
+MODEL = "gpt-3.5-turbo"
+REQUESTS = 5000
+
+functions: list[dict[str, Any]] = [
+    {
+        "name": "get_weather",
+        "description": "Get the current weather in a city",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string", "description": "The city name"},
+                "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
+            },
+            "required": ["city"],
+        },
+    }
+]
+
+
+def make_request(index: int) -> dict[str, Any]:
+    """Build a synthetic chat request.
+
+    Args:
+        index (int): The index of the request, used to vary its content.
+
+    Returns:
+        dict[str, Any]: The request.
+    """
+    return {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {
+                "role": "user",
+                "content": f"Request number {index}: what is the weather?",
+            },
+            {
+                "role": "assistant",
+                "content": None,
+                "function_call": {
+                    "name": "get_weather",
+                    "arguments": f'{{"city": "City {index % 50}"}}',
+                },
+            },
+            {"role": "function", "name": "get_weather", "content": '{"temp": 22}'},
+        ],
+        "functions": functions if index % 2 else None,
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print the throughput of both paths."""
+    requests = [make_request(index) for index in range(REQUESTS)]
+
+    start = time.perf_counter()
+    looped = [openai_token_counter(model=MODEL, **request) for request in requests]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = openai_token_counts(requests, model=MODEL)
+    batch_seconds = time.perf_counter() - start
+
+    if looped != batched:
+        raise RuntimeError("Batched and looped token counts differ")
+
+    print(f"loop over openai_token_counter  {REQUESTS / loop_seconds:10.0f} requests/s")
+    print(
+        f"openai_token_counts             {REQUESTS / batch_seconds:10.0f} requests/s"
+    )
+    print(f"speedup                         {loop_seconds / batch_seconds:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
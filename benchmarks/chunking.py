@@ -0,0 +1,100 @@
+"""Benchmark for chunking a large document.
+
+Chunks a generated file with chunk_text, and with the usual approach of reading the whole file, encoding it and
+decoding slices of the tokens, and prints the throughput and the peak memory of each. Run with
+``python -m benchmarks.chunking``.
+"""
+
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from openai_token_counter import chunk_text, get_token_counter
+
+
+MODEL = "gpt-4o"
+DOCUMENT_CHARACTERS = 20_000_000
+MAX_TOKENS = 512
+OVERLAP = 64
+
+
+def document(path: Path) -> None:
+    """Write a document of prose-like text.
+
+    Args:
+        path (Path): The path of the document.
+    """
+    generator = random.Random(0)  # noqa: S311
+    words = "the token counter splits documents into chunks of text 2024 naïve café 数据 überall (see below) and a".split()
+    with open(path, "w", encoding="utf-8") as file:
+        written = 0
+        while written < DOCUMENT_CHARACTERS:
+            sentence = " ".join(generator.choices(words, k=generator.randint(5, 25)))
+            paragraph = ". ".join(sentence.capitalize() for _ in range(5)) + ".\n\n"
+            written += file.write(paragraph)
+
+
+def chunk_file(path: Path) -> int:
+    """Chunk a file with chunk_text.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        int: The number of chunks.
+    """
+    token_counter = get_token_counter(MODEL)
+    return sum(1 for _ in chunk_text(path, MAX_TOKENS, OVERLAP, token_counter))
+
+
+def slice_tokens(path: Path) -> int:
+    """Chunk a file by encoding it whole and decoding slices of its tokens.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        int: The number of chunks.
+    """
+    encoding = get_token_counter(MODEL).encoding
+    tokens = encoding.encode_ordinary(path.read_text(encoding="utf-8"))
+    step = MAX_TOKENS - OVERLAP
+    return sum(
+        1
+        for start in range(0, len(tokens), step)
+        if encoding.decode(tokens[start : start + MAX_TOKENS])
+    )
+
+
+def main() -> None:
+    """Print the throughput and the peak memory of each way to chunk the document."""
+    get_token_counter(MODEL).encoding
+    cases: dict[str, Callable[[Path], int]] = {
+        "chunk_text": chunk_file,
+        "encode and slice": slice_tokens,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "document.txt"
+        document(path)
+        megabytes = path.stat().st_size / 1e6
+
+        for label, chunker in cases.items():
+            start = time.perf_counter()
+            chunks = chunker(path)
+            seconds = time.perf_counter() - start
+
+            tracemalloc.start()
+            chunker(path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{label:<18} {chunks:6d} chunks  {megabytes / seconds:6.2f} MB/s  {peak / 2**20:8.1f} MiB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark for counting very large message contents without building token lists.
+
+Run with ``python -m benchmarks.count_only``. Requires numpy for the count-only path.
+"""
+
+import time
+import tracemalloc
+
+from openai_token_counter.models import OpenAIMessage, OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+SIZES = [10_000, 50_000, 100_000]
+PARAGRAPH = (
+    "Retrieved passage: the quarterly report shows revenue of 1,234,567 dollars, "
+    "up 12% year over year, driven by new synergies and increased leverage. "
+)
+
+
+def measure(
+    token_counter: TokenCounter, request: OpenAIRequest
+) -> tuple[int, float, int]:
+    """Count the tokens of a request, measuring latency and peak memory.
+
+    Args:
+        token_counter (TokenCounter): The token counter to use.
+        request (OpenAIRequest): The request to count.
+
+    Returns:
+        tuple[int, float, int]: The token count, the latency in seconds and the peak traced memory in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = token_counter.estimate_token_count(request)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tokens, seconds, peak
+
+
+def main() -> None:
+    """Run the benchmark for both counting modes and print the results."""
+    list_counter = TokenCounter(model=MODEL, count_only=False)
+    count_only_counter = TokenCounter(model=MODEL, count_only=True)
+
+    for size in SIZES:
+        content = (PARAGRAPH * (size // 20))[: size * 4]
+        request = OpenAIRequest(messages=[OpenAIMessage(role="user", content=content)])
+        # Warm up the encodings before measuring
+        list_counter.estimate_token_count(request)
+        count_only_counter.estimate_token_count(request)
+
+        list_tokens, list_seconds, list_peak = measure(list_counter, request)
+        count_tokens, count_seconds, count_peak = measure(count_only_counter, request)
+        if list_tokens != count_tokens:
+            raise RuntimeError("Count-only and list token counts differ")
+
+        print(f"~{size} tokens ({list_tokens} counted)")
+        print(
+            f"  token list  {list_seconds * 1e3:8.2f} ms  peak {list_peak / 1024:10.1f} KiB"
+        )
+        print(
+            f"  count only  {count_seconds * 1e3:8.2f} ms  peak {count_peak / 1024:10.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
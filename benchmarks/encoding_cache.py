@@ -0,0 +1,83 @@
+"""Micro-benchmark for the cached encoding, the kept counts of short strings and the shared token counter registry.
+
+The same request is counted on every call, as when a system prompt and tool results repeat across requests.
+
+Run with ``python -m benchmarks.encoding_cache``.
+"""
+
+import timeit
+from typing import Any
+
+from tiktoken import encoding_for_model
+
+from openai_token_counter import openai_token_counter
+from openai_token_counter.models import OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+NUMBER = 2000
+
+messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "name": "example_user", "content": "Hello, how are you?"},
+    {"role": "assistant", "content": "I am fine, thank you. How can I help?"},
+    {
+        "role": "assistant",
+        "content": None,
+        "function_call": {"name": "get_weather", "arguments": '{"city": "Paris"}'},
+    },
+    {"role": "function", "name": "get_weather", "content": '{"temperature": 22}'},
+]
+
+
+class UncachedTokenCounter(TokenCounter):
+    """Token counter that resolves the encoding on every call, like the previous implementation."""
+
+    def string_tokens(self, string: str) -> int:
+        """Get the token count for a string, resolving the encoding each time.
+
+        Args:
+            string (str): The string to count.
+
+        Returns:
+            int: The token count.
+        """
+        return len(encoding_for_model(MODEL).encode(string))
+
+
+def uncached_openai_token_counter() -> int:
+    """Count tokens the way the previous implementation did.
+
+    Returns:
+        int: The number of tokens the prompt will use.
+    """
+    return UncachedTokenCounter(model=MODEL).estimate_token_count(
+        OpenAIRequest.model_validate({"messages": messages})
+    )
+
+
+def cached_openai_token_counter() -> int:
+    """Count tokens through the shared token counter, which keeps the encoding and the counts of short strings.
+
+    Returns:
+        int: The number of tokens the prompt will use.
+    """
+    return openai_token_counter(messages=messages, model=MODEL)
+
+
+def main() -> None:
+    """Run the benchmark and print the per-call latency."""
+    if uncached_openai_token_counter() != cached_openai_token_counter():
+        raise RuntimeError("Cached and uncached token counts differ")
+
+    for label, func in (
+        ("before (resolve per call)", uncached_openai_token_counter),
+        ("after (cached counts)", cached_openai_token_counter),
+    ):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+        print(f"{label:<28} {seconds * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark for formatting deep and wide function definitions.
+
+The single buffer formatter is compared with the previous recursive formatter, which built the string of every
+nested object and copied it again into its parent. Run with ``python -m benchmarks.format_functions``.
+"""
+
+import timeit
+from functools import partial
+from typing import Any, Optional
+
+from openai_token_counter.format import format_function_definitions
+from openai_token_counter.models import (
+    ArrayProp,
+    BoolProp,
+    NullProp,
+    NumberProp,
+    ObjectProp,
+    OpenAIFunction,
+    PropItem,
+    StringProp,
+)
+
+
+def recursive_format_function_definitions(functions: list[OpenAIFunction]) -> str:
+    """Format the function definitions with the previous recursive formatter.
+
+    Args:
+        functions (list[OpenAIFunction]): The list of functions to format.
+
+    Returns:
+        str: The formatted string.
+    """
+    lines = ["namespace functions {", ""]
+    for f in functions:
+        if f.description:
+            lines.append(f"// {f.description}")
+        parameters = f.parameters
+        properties = parameters.properties if parameters else {}
+        if not properties:
+            lines.append(f"type {f.name} = () => any;")
+        else:
+            lines.append(f"type {f.name} = (_: " + "{")
+            lines.append(recursive_format_object_properties(f.parameters, 0))
+            lines.append("}) => any;")
+        lines.append("")
+    lines.append("} // namespace functions")
+    return "\n".join(lines)
+
+
+def recursive_format_object_properties(obj: ObjectProp, indent: int) -> str:
+    """Format the object properties with the previous recursive formatter.
+
+    Args:
+        obj (ObjectProp): The object to format.
+        indent (int): The indentation level.
+
+    Returns:
+        str: The formatted string.
+    """
+    if obj.properties is None:
+        return ""
+    required_params = obj.required or []
+    lines: list[str] = []
+    for name, param in obj.properties.items():
+        if param.description and indent < 2:
+            lines.append(f"// {param.description}")
+        question = "" if name in required_params else "?"
+        lines.append(f"{name}{question}: {recursive_format_type(param, indent)},")
+    return "\n".join([(" " * indent + line) for line in lines])
+
+
+def recursive_format_type(param: PropItem, indent: int) -> Optional[str]:
+    """Format the type with the previous recursive formatter.
+
+    Args:
+        param (PropItem): The parameter to format.
+        indent (int): The indentation level.
+
+    Returns:
+        Optional[str]: The formatted string.
+    """
+    if isinstance(param, StringProp):
+        if param.enum:
+            return " | ".join(f'"{v}"' for v in param.enum)  # noqa: B907
+        return "string"
+    elif isinstance(param, NumberProp):
+        if param.enum:
+            return " | ".join(str(v) for v in param.enum)
+        return "number"
+    elif isinstance(param, BoolProp):
+        return "boolean"
+    elif isinstance(param, NullProp):
+        return "null"
+    elif isinstance(param, ArrayProp):
+        if param.items:
+            return f"{recursive_format_type(param.items, indent)}[]"
+        return "any[]"
+    elif isinstance(param, ObjectProp):
+        return "{\n" + recursive_format_object_properties(param, indent + 2) + "\n}"
+    return None
+
+
+def leaf(index: int) -> dict[str, Any]:
+    """Build a scalar property schema.
+
+    Args:
+        index (int): The index of the property, which selects its type.
+
+    Returns:
+        dict[str, Any]: The property schema.
+    """
+    schemas: list[dict[str, Any]] = [
+        {"type": "string", "description": f"Field {index}"},
+        {"type": "integer", "enum": ["1", "2", "3"]},
+        {"type": "boolean"},
+        {"type": "string", "enum": ["a", "b"]},
+        {"type": "array", "items": {"type": "number"}},
+    ]
+    return schemas[index % len(schemas)]
+
+
+def deep_function(depth: int, width: int) -> OpenAIFunction:
+    """Build a function whose parameters nest objects and arrays of objects.
+
+    Args:
+        depth (int): The nesting depth of the parameters.
+        width (int): The number of scalar properties at each level.
+
+    Returns:
+        OpenAIFunction: The function definition.
+    """
+    schema: dict[str, Any] = {
+        "type": "object",
+        "properties": {f"leaf{index}": leaf(index) for index in range(width)},
+    }
+    for level in range(depth):
+        child = (
+            {"type": "array", "items": schema, "description": f"Level {level}"}
+            if level % 2
+            else schema
+        )
+        schema = {
+            "type": "object",
+            "properties": {
+                **{f"leaf{index}": leaf(index) for index in range(width)},
+                f"child{level}": child,
+            },
+            "required": [f"child{level}", "leaf0"],
+        }
+    return OpenAIFunction.model_validate(
+        {"name": f"deep_{depth}", "description": "A deep schema", "parameters": schema}
+    )
+
+
+def wide_function(width: int) -> OpenAIFunction:
+    """Build a function with many flat parameters.
+
+    Args:
+        width (int): The number of parameters.
+
+    Returns:
+        OpenAIFunction: The function definition.
+    """
+    return OpenAIFunction.model_validate(
+        {
+            "name": f"wide_{width}",
+            "parameters": {
+                "type": "object",
+                "properties": {f"param{index}": leaf(index) for index in range(width)},
+                "required": [f"param{index}" for index in range(0, width, 2)],
+            },
+        }
+    )
+
+
+def main() -> None:
+    """Check both formatters agree and print their latency."""
+    cases = {
+        "deep 8 x 4": [deep_function(8, 4)],
+        "deep 32 x 4": [deep_function(32, 4)],
+        "deep 128 x 2": [deep_function(128, 2)],
+        "wide 100": [wide_function(100)],
+        "wide 2000": [wide_function(2000)],
+        "100 x deep 4 x 8": [deep_function(4, 8) for _ in range(100)],
+    }
+
+    for label, functions in cases.items():
+        if format_function_definitions(functions) != (
+            recursive_format_function_definitions(functions)
+        ):
+            raise RuntimeError(f"The formatters disagree on {label}")
+
+        timings = {}
+        for name, formatter in (
+            ("recursive", recursive_format_function_definitions),
+            ("buffer", format_function_definitions),
+        ):
+            timer = timeit.Timer(partial(formatter, functions))
+            number, _ = timer.autorange()
+            timings[name] = min(timer.repeat(repeat=5, number=number)) / number
+
+        print(
+            f"{label:<18} recursive {timings['recursive'] * 1e3:8.3f} ms"
+            f"  buffer {timings['buffer'] * 1e3:8.3f} ms"
+            f"  speedup {timings['recursive'] / timings['buffer']:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
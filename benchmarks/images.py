@@ -0,0 +1,72 @@
+"""Benchmark for counting messages with base64 screenshots.
+
+The size of each image is read from its header, so the count doesn't depend on the size of the images. Run with
+``python -m benchmarks.images``.
+"""
+
+import base64
+import os
+import struct
+import timeit
+from functools import partial
+from typing import Any
+
+from openai_token_counter import openai_token_counter
+
+
+MODEL = "gpt-4o"
+SCREENSHOTS = 20
+IMAGE_BYTES = 1_500_000
+
+
+def screenshot(index: int) -> str:
+    """Build the data URL of a 1920 x 1080 screenshot, alternating PNG and JPEG with metadata.
+
+    Args:
+        index (int): The index of the screenshot.
+
+    Returns:
+        str: The data URL.
+    """
+    if index % 2:
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 1920, 1080)
+        kind = "png"
+    else:
+        metadata = b"\xff\xe1" + struct.pack(">H", 65535) + os.urandom(65533)
+        header = (
+            b"\xff\xd8"
+            + metadata
+            + b"\xff\xc0"
+            + struct.pack(">HBHHB", 11, 8, 1080, 1920, 3)
+        )
+        kind = "jpeg"
+    image = header + os.urandom(IMAGE_BYTES - len(header))
+    return f"data:image/{kind};base64,{base64.b64encode(image).decode()}"
+
+
+def main() -> None:
+    """Print the latency of counting a message with screenshots."""
+    messages: list[dict[str, Any]] = [
+        {
+            "role": "user",
+            "content": [{"type": "text", "text": "What changed between these?"}]
+            + [
+                {"type": "image_url", "image_url": {"url": screenshot(index)}}
+                for index in range(SCREENSHOTS)
+            ],
+        }
+    ]
+
+    for validate in (False, True):
+        count = partial(openai_token_counter, messages, MODEL, validate=validate)
+        timer = timeit.Timer(count)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=5, number=number)) / number
+        print(
+            f"validate={validate!s:<5}  {count()} tokens  {seconds * 1e6:8.1f} us/count"
+            f"  for {SCREENSHOTS} images of {IMAGE_BYTES / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark for the cold start time of the package.
+
+Each case runs in a fresh interpreter, and measures importing the package and counting a first prompt, which loads
+the encoding. Run with ``python -m benchmarks.import_time``.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess  # noqa: S404
+import sys
+from typing import Optional
+
+
+MESSAGES = [{"role": "user", "content": "Hello world"}]
+
+CASES = {
+    "import": "import openai_token_counter",
+    "import + raw count": (
+        "from openai_token_counter import openai_token_counter\n"
+        f"openai_token_counter({MESSAGES!r}, validate=False)"
+    ),
+    "import + validated count": (
+        "from openai_token_counter import openai_token_counter\n"
+        f"openai_token_counter({MESSAGES!r})"
+    ),
+    "import + preload": "import openai_token_counter\nopenai_token_counter.preload()",
+}
+
+CHILD = """\
+import json
+import sys
+import time
+
+start = time.perf_counter()
+{statement}
+print(json.dumps({{
+    "milliseconds": (time.perf_counter() - start) * 1e3,
+    "pydantic": "pydantic" in sys.modules,
+}}))
+"""
+
+
+def measure(statement: str) -> tuple[float, bool]:
+    """Run a statement in a fresh interpreter.
+
+    Args:
+        statement (str): The statement to run.
+
+    Returns:
+        tuple[float, bool]: The time the statement took in milliseconds, and whether it imported pydantic.
+    """
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", CHILD.format(statement=statement)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result["milliseconds"], result["pydantic"]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the benchmark and print the median and best time of each case.
+
+    Args:
+        argv (Optional[list[str]]): The command line arguments. Defaults to sys.argv.
+
+    Raises:
+        SystemExit: If importing the package takes longer than --max-import-ms.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-import-ms", type=float, help="Fail if the median import is slower."
+    )
+    args = parser.parse_args(argv)
+
+    medians = {}
+    for label, statement in CASES.items():
+        results = [measure(statement) for _ in range(args.runs)]
+        times = [milliseconds for milliseconds, _ in results]
+        medians[label] = statistics.median(times)
+        print(
+            f"{label:<26} median {medians[label]:7.1f} ms  best {min(times):7.1f} ms"
+            f"  pydantic {'imported' if results[0][1] else 'not imported'}"
+        )
+
+    if args.max_import_ms is not None and medians["import"] > args.max_import_ms:
+        raise SystemExit(
+            f"Importing took {medians['import']:.1f} ms, more than {args.max_import_ms} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
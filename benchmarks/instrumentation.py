@@ -0,0 +1,52 @@
+"""Benchmark for the cost of the phase instrumentation.
+
+Counts short chats, where the per string overhead is the largest, without metrics, with a no-op callback and with
+the PhaseMetrics aggregator. Run with ``python -m benchmarks.instrumentation``.
+"""
+
+import timeit
+from functools import partial
+from typing import Any, Optional
+
+from openai_token_counter.instrumentation import Metrics, PhaseEvent, PhaseMetrics
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "What is the weather in Paris?"},
+    {"role": "assistant", "content": "It is sunny, 22 degrees."},
+    {"role": "user", "content": "And tomorrow?"},
+]
+
+
+def ignore(event: PhaseEvent) -> None:
+    """Drop a phase.
+
+    Args:
+        event (PhaseEvent): The phase.
+    """
+
+
+def main() -> None:
+    """Print the latency of a count with each kind of metrics."""
+    cases: dict[str, Optional[Metrics]] = {
+        "no metrics": None,
+        "no-op callback": ignore,
+        "PhaseMetrics": PhaseMetrics(),
+    }
+
+    baseline = None
+    for label, metrics in cases.items():
+        token_counter = TokenCounter(model=MODEL, metrics=metrics)
+        timer = timeit.Timer(partial(token_counter.estimate_raw_token_count, messages))
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=7, number=number)) / number
+        baseline = baseline or seconds
+        print(f"{label:<16} {seconds * 1e6:7.2f} us/count  {seconds / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
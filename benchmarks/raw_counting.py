@@ -0,0 +1,90 @@
+"""Benchmark for counting long conversations with and without validation.
+
+Run with ``python -m benchmarks.raw_counting``.
+"""
+
+import timeit
+from functools import partial
+from typing import Any
+
+from openai_token_counter import get_token_counter, openai_token_counter
+
+
+MODEL = "gpt-3.5-turbo"
+HISTORY_LENGTHS = [10, 100, 1000]
+
+functions: list[dict[str, Any]] = [
+    {
+        "name": "search",
+        "description": "Search the knowledge base",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"],
+        },
+    }
+]
+
+
+def make_history(length: int) -> list[dict[str, Any]]:
+    """Build a synthetic conversation history.
+
+    Args:
+        length (int): The number of turns in the history.
+
+    Returns:
+        list[dict[str, Any]]: The messages of the conversation.
+    """
+    messages: list[dict[str, Any]] = [
+        {"role": "system", "content": "You are a helpful assistant."}
+    ]
+    for index in range(length):
+        messages.append({"role": "user", "content": f"Question {index}?"})
+        messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "function_call": {
+                    "name": "search",
+                    "arguments": f'{{"query": "{index:d}"}}',
+                },
+            }
+        )
+        messages.append({"role": "function", "name": "search", "content": "Result."})
+        messages.append({"role": "assistant", "content": f"Answer {index}."})
+    return messages
+
+
+def main() -> None:
+    """Run the benchmark and print the latency of both paths."""
+    get_token_counter(MODEL).encoding  # Warm up the encoding
+
+    for length in HISTORY_LENGTHS:
+        messages = make_history(length)
+        validated = openai_token_counter(messages, MODEL, functions)
+        raw = openai_token_counter(messages, MODEL, functions, validate=False)
+        if validated != raw:
+            raise RuntimeError("Validated and raw token counts differ")
+
+        number = max(1, 2000 // length)
+        for label, validate in (("validated", True), ("raw dicts", False)):
+            seconds = min(
+                timeit.repeat(
+                    partial(
+                        openai_token_counter,
+                        messages,
+                        MODEL,
+                        functions,
+                        validate=validate,
+                    ),
+                    number=number,
+                    repeat=5,
+                )
+            )
+            print(
+                f"{len(messages):>5} messages  {label:<10} {seconds / number * 1e3:8.3f} ms/call"
+            )
+
+
+if __name__ == "__main__":
+    main()
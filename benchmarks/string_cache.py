@@ -0,0 +1,128 @@
+"""Benchmark for the lookups of the shared SQLite string cache.
+
+Prints the time of a count of a repeated string by encoding it and through an SQLite cache, marking the entry as
+used on every hit and at most once per interval, for strings of several lengths. Then prints the throughput of
+worker processes counting through the same cache file. Run with ``python -m benchmarks.string_cache``.
+"""
+
+import multiprocessing
+import tempfile
+import time
+import timeit
+from functools import partial
+from pathlib import Path
+
+from openai_token_counter.cache import SQLiteTokenCountCache
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+NUMBER = 2000
+LENGTHS = [256, 1024, 4096, 16384]
+WORKERS = 4
+WORKER_SECONDS = 2.0
+
+WORDS = "The retrieved document is shared by many users, 2024 naïve café. "
+
+
+def text(length: int) -> str:
+    """Get a prose-like string.
+
+    Args:
+        length (int): The length of the string.
+
+    Returns:
+        str: The string.
+    """
+    return (WORDS * (length // len(WORDS) + 1))[:length]
+
+
+def count_in_worker(
+    path: str, touch_interval: float, queue: "multiprocessing.Queue[int]"
+) -> None:
+    """Count a cached string for a while through a cache file, and report the number of counts.
+
+    Args:
+        path (str): The path of the cache file.
+        touch_interval (float): The touch interval of the cache.
+        queue (multiprocessing.Queue[int]): The queue the number of counts is put on.
+    """
+    cache = SQLiteTokenCountCache(path, min_length=0, touch_interval=touch_interval)
+    token_counter = TokenCounter(model=MODEL, string_cache=cache)
+    string = text(LENGTHS[0])
+    counts = 0
+    deadline = time.perf_counter() + WORKER_SECONDS
+    while time.perf_counter() < deadline:
+        token_counter.string_tokens(string)
+        counts += 1
+    queue.put(counts)
+
+
+def main() -> None:
+    """Print the latency of the counts, and the throughput of the workers sharing a cache."""
+    encoder = TokenCounter(model=MODEL, string_cache_min_length=0)
+    encoder.encoding
+
+    with tempfile.TemporaryDirectory() as directory:
+        counters = {
+            label: TokenCounter(
+                model=MODEL,
+                string_cache=SQLiteTokenCountCache(
+                    str(Path(directory) / f"{index}.sqlite"),
+                    min_length=0,
+                    touch_interval=touch_interval,
+                ),
+                string_cache_min_length=0,
+            )
+            for index, (label, touch_interval) in enumerate(
+                (("touch every hit", 0.0), ("touch every 60 s", 60.0))
+            )
+        }
+
+        print(
+            f"{'characters':>10} {'encode':>10} "
+            + " ".join(f"{label:>18}" for label in counters)
+        )
+        for length in LENGTHS:
+            string = text(length)
+            timings = []
+            for token_counter in [encoder, *counters.values()]:
+                if token_counter.string_tokens(string) != encoder.string_tokens(string):
+                    raise RuntimeError("Cached and encoded token counts differ")
+                seconds = min(
+                    timeit.repeat(
+                        partial(token_counter.string_tokens, string),
+                        number=NUMBER,
+                        repeat=5,
+                    )
+                )
+                timings.append(seconds / NUMBER * 1e6)
+            print(
+                f"{length:>10} {timings[0]:>8.1f}us "
+                + " ".join(f"{timing:>16.1f}us" for timing in timings[1:])
+            )
+
+        for label, touch_interval in (
+            ("touch every hit", 0.0),
+            ("touch every 60 s", 60.0),
+        ):
+            path = str(Path(directory) / f"shared-{touch_interval}.sqlite")
+            queue: "multiprocessing.Queue[int]" = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=count_in_worker, args=(path, touch_interval, queue)
+                )
+                for _ in range(WORKERS)
+            ]
+            for worker in workers:
+                worker.start()
+            counts = sum(queue.get() for _ in workers)
+            for worker in workers:
+                worker.join()
+            print(
+                f"{WORKERS} workers, {label:<17} {counts / WORKER_SECONDS:10.0f} counts/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
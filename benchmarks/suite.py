@@ -0,0 +1,422 @@
+"""Offline benchmark suite for counting throughput and scaling.
+
+Each case runs one operation over the requests of a corpus: ``openai_token_counter`` on the request dicts,
+``TokenCounter.estimate_token_count`` on validated requests, ``format_function_definitions`` on validated functions,
+and validating the request dicts into models. The synthetic corpora are short chats, contexts of about 100k tokens
+and toolsets of 50 functions with deep schemas. Recorded corpora are JSONL files with one chat completion request
+body per line, in the format of ``openai-token-counter-bulk``. The requests recorded against the API for the tests are
+shipped in ``benchmarks/corpora``, and more files are passed with ``--recorded``.
+
+Each case reports its throughput, its p50 and p99 latency and the peak memory allocated while it runs. With
+``--save`` the results are stored as the baseline, otherwise they are compared with the stored baseline, and the run
+fails if there is no baseline, or if a case is slower or allocates more than the tolerance allows. Baselines are only
+comparable on the same machine, so save one before making changes on another machine. Run with
+``python -m benchmarks.suite`` or ``nox -s benchmarks``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+from openai_token_counter import get_token_counter, openai_token_counter
+from openai_token_counter.format import format_function_definitions
+from openai_token_counter.models import request_adapter
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+RECORDED_DIR = os.path.join(os.path.dirname(__file__), "corpora")
+
+_WORDS = (
+    "the of and to in is you that it he was for on are as with his they at be this have from or one had by word "
+    "but not what all were we when your can said there use an each which she do how their if will up other about "
+    "request message function assistant system user model content schema parameter encoding budget weather order"
+).split()
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """The requests a case runs over.
+
+    Attributes:
+        name (str): The name of the corpus.
+        requests (list[dict[str, Any]]): The request dicts, with messages and optionally functions, function_call,
+            tools and tool_choice.
+    """
+
+    name: str
+    requests: list[dict[str, Any]] = field(repr=False)
+
+
+@dataclass(frozen=True)
+class Result:
+    """The measurements of a case.
+
+    Attributes:
+        ops_per_second (float): The operations per second.
+        p50_us (float): The median latency of an operation in microseconds.
+        p99_us (float): The 99th percentile latency of an operation in microseconds.
+        peak_kib (float): The peak memory allocated during a pass over the corpus in KiB.
+    """
+
+    ops_per_second: float
+    p50_us: float
+    p99_us: float
+    peak_kib: float
+
+
+def _text(generator: random.Random, words: int) -> str:
+    """Generate prose.
+
+    Args:
+        generator (random.Random): The random generator.
+        words (int): The number of words.
+
+    Returns:
+        str: The prose.
+    """
+    return " ".join(generator.choices(_WORDS, k=words))
+
+
+def short_chats(generator: random.Random, count: int = 200) -> Corpus:
+    """Build chats of a few short turns, with a system prompt.
+
+    Args:
+        generator (random.Random): The random generator.
+        count (int): The number of requests.
+
+    Returns:
+        Corpus: The corpus.
+    """
+    requests = []
+    for _ in range(count):
+        messages = [{"role": "system", "content": "You are a helpful assistant."}]
+        for turn in range(generator.randint(1, 6)):
+            role = "assistant" if turn % 2 else "user"
+            messages.append(
+                {"role": role, "content": _text(generator, generator.randint(3, 40))}
+            )
+        requests.append({"messages": messages})
+    return Corpus("short-chat", requests)
+
+
+def long_contexts(generator: random.Random, count: int = 3) -> Corpus:
+    """Build requests with retrieved documents of about 100k tokens in total.
+
+    Args:
+        generator (random.Random): The random generator.
+        count (int): The number of requests.
+
+    Returns:
+        Corpus: The corpus.
+    """
+    requests = []
+    for _ in range(count):
+        documents = "\n\n".join(_text(generator, 2000) for _ in range(50))
+        requests.append(
+            {
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": f"Answer from these documents:\n{documents}",
+                    },
+                    {"role": "user", "content": _text(generator, 20)},
+                ]
+            }
+        )
+    return Corpus("long-context", requests)
+
+
+def _schema(generator: random.Random, depth: int) -> dict[str, Any]:
+    """Generate the parameters of a function, nested to a depth.
+
+    Args:
+        generator (random.Random): The random generator.
+        depth (int): The number of nested object levels.
+
+    Returns:
+        dict[str, Any]: The parameters schema.
+    """
+    leaves: list[dict[str, Any]] = [
+        {"type": "string", "description": _text(generator, 8)},
+        {"type": "string", "enum": generator.sample(_WORDS, 4)},
+        {"type": "integer", "minimum": 0, "maximum": 100},
+        {"type": "number", "description": _text(generator, 4)},
+        {"type": "boolean"},
+        {"type": "array", "items": {"type": "string"}},
+    ]
+    properties: dict[str, Any] = {
+        f"{generator.choice(_WORDS)}_{index}": generator.choice(leaves)
+        for index in range(generator.randint(3, 8))
+    }
+    if depth:
+        properties["options"] = _schema(generator, depth - 1)
+        properties["items"] = {"type": "array", "items": _schema(generator, depth - 1)}
+    return {
+        "type": "object",
+        "description": _text(generator, 6),
+        "properties": properties,
+        "required": list(properties)[:2],
+    }
+
+
+def deep_toolsets(generator: random.Random, count: int = 10) -> Corpus:
+    """Build requests with 50 functions of deep schemas each.
+
+    Args:
+        generator (random.Random): The random generator.
+        count (int): The number of requests, each with a different toolset.
+
+    Returns:
+        Corpus: The corpus.
+    """
+    requests = []
+    for _ in range(count):
+        functions = [
+            {
+                "name": f"{generator.choice(_WORDS)}_{index}",
+                "description": _text(generator, 12),
+                "parameters": _schema(generator, 3),
+            }
+            for index in range(50)
+        ]
+        requests.append(
+            {
+                "messages": [
+                    {"role": "system", "content": "Use the tools to answer."},
+                    {"role": "user", "content": _text(generator, 30)},
+                ],
+                "functions": functions,
+                "function_call": "auto",
+            }
+        )
+    return Corpus("deep-toolset", requests)
+
+
+def recorded(path: str) -> Corpus:
+    """Load the requests of a JSONL file of chat completion request bodies.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        Corpus: The corpus, named after the file.
+    """
+    requests = []
+    with open(path, "rb") as corpus_file:
+        for line in corpus_file:
+            if line.strip():
+                record = json.loads(line)
+                requests.append(
+                    {
+                        "messages": record["messages"],
+                        "functions": record.get("functions"),
+                        "function_call": record.get("function_call"),
+                        "tools": record.get("tools"),
+                        "tool_choice": record.get("tool_choice"),
+                    }
+                )
+    name = os.path.splitext(os.path.basename(path))[0]
+    return Corpus(f"recorded-{name}", requests)
+
+
+def cases(corpus: Corpus, model: str) -> dict[str, Callable[[int], Any]]:
+    """Build the operations measured on a corpus, each called with the index of a request.
+
+    Args:
+        corpus (Corpus): The corpus.
+        model (str): The model to count for.
+
+    Returns:
+        dict[str, Callable[[int], Any]]: The operations by name.
+    """
+    token_counter = get_token_counter(model)
+    raw = corpus.requests
+    validated = [request_adapter.validate_python(request) for request in raw]
+
+    operations: dict[str, Callable[[int], Any]] = {
+        "openai_token_counter": lambda index: openai_token_counter(
+            model=model, **raw[index]
+        ),
+        "estimate_token_count": lambda index: token_counter.estimate_token_count(
+            validated[index]
+        ),
+        "validation": lambda index: request_adapter.validate_python(raw[index]),
+    }
+    if all(request.functions for request in validated):
+        operations[
+            "format_function_definitions"
+        ] = lambda index: format_function_definitions(validated[index].functions or [])
+    return operations
+
+
+def measure(operation: Callable[[int], Any], count: int, min_time: float) -> Result:
+    """Measure an operation over the requests of a corpus.
+
+    The operation runs over every request once to warm up, then in passes over the corpus until min_time has passed,
+    then once more under tracemalloc for the peak memory.
+
+    Args:
+        operation (Callable[[int], Any]): The operation, called with the index of a request.
+        count (int): The number of requests.
+        min_time (float): The minimum time to measure for, in seconds.
+
+    Returns:
+        Result: The measurements.
+    """
+    for index in range(count):
+        operation(index)
+
+    latencies: list[float] = []
+    clock = time.perf_counter
+    elapsed = 0.0
+    while elapsed < min_time:
+        for index in range(count):
+            start = clock()
+            operation(index)
+            latencies.append(clock() - start)
+        elapsed = sum(latencies)
+
+    tracemalloc.start()
+    try:
+        for index in range(count):
+            operation(index)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return Result(
+        ops_per_second=len(latencies) / elapsed,
+        p50_us=statistics.median(latencies) * 1e6,
+        p99_us=percentiles[98] * 1e6,
+        peak_kib=peak / 1024,
+    )
+
+
+def compare(
+    results: dict[str, Result], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Find the cases that regressed against the baseline.
+
+    Args:
+        results (dict[str, Result]): The results of this run, by case.
+        baseline (dict[str, Any]): The stored baseline.
+        tolerance (float): The fraction a case can be slower, or allocate more, than the baseline.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        stored = baseline["cases"].get(name)
+        if stored is None:
+            continue
+        if result.ops_per_second < stored["ops_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result.ops_per_second:.1f} ops/s,"
+                f" baseline {stored['ops_per_second']:.1f} ops/s"
+            )
+        if result.peak_kib > stored["peak_kib"] * (1 + tolerance) + 64:
+            regressions.append(
+                f"{name}: peak {result.peak_kib:.0f} KiB, baseline {stored['peak_kib']:.0f} KiB"
+            )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the suite, print the results and compare them with the baseline.
+
+    Args:
+        argv (Optional[list[str]]): The command line arguments. Defaults to sys.argv.
+
+    Raises:
+        SystemExit: If there is no baseline to compare with, or a case regressed against it.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument(
+        "--recorded", nargs="*", default=[], help="JSONL files of request bodies."
+    )
+    parser.add_argument("--only", help="Only run the cases whose name contains this.")
+    parser.add_argument(
+        "--min-time", type=float, default=1.0, help="Seconds to measure each case."
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as the baseline."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="The fraction a case can regress before failing.",
+    )
+    args = parser.parse_args(argv)
+
+    generator = random.Random(0)  # noqa: S311
+    corpora = [
+        short_chats(generator),
+        long_contexts(generator),
+        deep_toolsets(generator),
+    ]
+    shipped = sorted(
+        os.path.join(RECORDED_DIR, name)
+        for name in os.listdir(RECORDED_DIR)
+        if name.endswith(".jsonl")
+    )
+    corpora += [recorded(path) for path in shipped + args.recorded]
+
+    results: dict[str, Result] = {}
+    print(f"{'case':<50} {'ops/s':>10} {'p50 us':>10} {'p99 us':>10} {'peak KiB':>10}")
+    for corpus in corpora:
+        for operation_name, operation in cases(corpus, args.model).items():
+            name = f"{corpus.name}/{operation_name}"
+            if args.only and args.only not in name:
+                continue
+            result = results[name] = measure(
+                operation, len(corpus.requests), args.min_time
+            )
+            print(
+                f"{name:<50} {result.ops_per_second:10.1f} {result.p50_us:10.1f}"
+                f" {result.p99_us:10.1f} {result.peak_kib:10.1f}"
+            )
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "machine": platform.platform(),
+                    "cases": {name: asdict(result) for name, result in results.items()},
+                },
+                baseline_file,
+                indent=2,
+            )
+            baseline_file.write("\n")
+        print(f"Saved the baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        raise SystemExit(f"No baseline at {args.baseline}, store one with --save")
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        raise SystemExit("Regressed against the baseline:\n" + "\n".join(regressions))
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
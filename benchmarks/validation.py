@@ -0,0 +1,173 @@
+"""Benchmark for validating requests with large function schemas.
+
+The property models are validated through a union discriminated on their type. This compares them with copies
+validated through a plain union, where every member is tried in turn. Run with ``python -m benchmarks.validation``.
+"""
+
+from __future__ import annotations
+
+import timeit
+from functools import partial
+from typing import Any, Literal, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+from openai_token_counter.models import OpenAIMessage, request_adapter
+
+
+class StringProp(BaseModel):
+    """A string property validated through a plain union."""
+
+    type: Literal["string"]
+    description: Optional[str] = None
+    enum: Optional[list[str]] = None
+
+
+class NumberProp(BaseModel):
+    """A number property validated through a plain union."""
+
+    type: Literal["integer", "number"]
+    description: Optional[str] = None
+    minimum: Optional[int] = None
+    maximum: Optional[int] = None
+    enum: Optional[list[str]] = None
+
+
+class BoolProp(BaseModel):
+    """A boolean property validated through a plain union."""
+
+    type: Literal["boolean"]
+    description: Optional[str] = None
+
+
+class NullProp(BaseModel):
+    """A null property validated through a plain union."""
+
+    type: Literal["null"]
+    description: Optional[str] = None
+
+
+class ArrayProp(BaseModel):
+    """An array property validated through a plain union."""
+
+    type: Literal["array"]
+    description: Optional[str] = None
+    items: PropItem
+
+
+class ObjectProp(BaseModel):
+    """An object property validated through a plain union."""
+
+    type: Literal["object"]
+    description: Optional[str] = None
+    required: Optional[list[str]] = None
+    properties: Optional[dict[str, PropItem]] = None
+
+
+PropItem = Union[StringProp, NumberProp, BoolProp, NullProp, ArrayProp, ObjectProp]
+
+
+class OpenAIFunction(BaseModel):
+    """A function validated through a plain union."""
+
+    name: str
+    description: Optional[str] = None
+    parameters: ObjectProp
+
+
+class OpenAIRequest(BaseModel):
+    """A request validated through a plain union."""
+
+    messages: list[OpenAIMessage]
+    functions: Optional[list[OpenAIFunction]] = None
+    function_call: Optional[
+        Union[Literal["auto", "none"], dict[Literal["name"], str]]
+    ] = None
+
+
+plain_request_adapter = TypeAdapter(OpenAIRequest)
+
+
+def make_schema(depth: int, width: int) -> dict[str, Any]:
+    """Build a nested parameters schema with every property type.
+
+    Args:
+        depth (int): The nesting depth of the schema.
+        width (int): The number of scalar properties at each level.
+
+    Returns:
+        dict[str, Any]: The schema.
+    """
+    leaves: list[dict[str, Any]] = [
+        {"type": "string", "description": "A string"},
+        {"type": "number", "minimum": 0},
+        {"type": "boolean"},
+        {"type": "null"},
+        {"type": "integer", "enum": ["1", "2"]},
+        {"type": "array", "items": {"type": "string", "enum": ["a", "b"]}},
+    ]
+    schema: dict[str, Any] = {"type": "object", "properties": {}}
+    for level in range(depth + 1):
+        properties = {
+            f"field{index}": leaves[index % len(leaves)] for index in range(width)
+        }
+        if level:
+            properties["child"] = {"type": "array", "items": schema}
+        schema = {"type": "object", "properties": properties, "required": ["field0"]}
+    return schema
+
+
+def make_request(functions: int, depth: int, width: int) -> dict[str, Any]:
+    """Build a request with many large function schemas.
+
+    Args:
+        functions (int): The number of functions.
+        depth (int): The nesting depth of each schema.
+        width (int): The number of scalar properties at each level.
+
+    Returns:
+        dict[str, Any]: The request.
+    """
+    return {
+        "messages": [{"role": "user", "content": "Hello"}],
+        "functions": [
+            {"name": f"function{index}", "parameters": make_schema(depth, width)}
+            for index in range(functions)
+        ],
+    }
+
+
+def main() -> None:
+    """Check both validators agree and print their latency."""
+    cases = {
+        "8 functions, depth 2 x 6": make_request(8, 2, 6),
+        "32 functions, depth 4 x 12": make_request(32, 4, 12),
+        "128 functions, depth 3 x 24": make_request(128, 3, 24),
+    }
+
+    for label, request in cases.items():
+        discriminated = request_adapter.validate_python(request)
+        plain = plain_request_adapter.validate_python(request)
+        # The copies only have the fields that hold functions, and none of the fields added since
+        fields = set(OpenAIRequest.model_fields)
+        if discriminated.model_dump(include=fields) != plain.model_dump():
+            raise RuntimeError(f"The validators disagree on {label}")
+
+        timings = {}
+        for name, adapter in (
+            ("plain", plain_request_adapter),
+            ("discriminated", request_adapter),
+        ):
+            timer = timeit.Timer(partial(adapter.validate_python, request))
+            number, _ = timer.autorange()
+            timings[name] = min(timer.repeat(repeat=5, number=number)) / number
+
+        print(
+            f"{label:<28} plain {timings['plain'] * 1e3:8.3f} ms"
+            f"  discriminated {timings['discriminated'] * 1e3:8.3f} ms"
+            f"  speedup {timings['plain'] / timings['discriminated']:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Benchmark for the memory and first count latency of forked workers.
+
+Workers are forked from a parent process and each counts one prompt, in three modes: every worker loads the
+encoding from a ranks file in the tiktoken format, every worker loads it from a precompiled bundle file, or the
+parent loads it from the bundle before forking. The resident (RSS) and proportional (PSS) memory of each worker are
+read from /proc, so this only runs on Linux. Run with ``python -m benchmarks.worker_memory``.
+
+By default a synthetic encoding the size of cl100k_base is used, so the benchmark runs offline. Pass
+``--encoding cl100k_base`` to bundle the real encoding instead.
+"""
+
+import argparse
+import base64
+import gc
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from multiprocessing.synchronize import Barrier
+from typing import Any, Optional
+
+from openai_token_counter import TokenCounter
+from openai_token_counter.bundle import save_encoding
+from openai_token_counter.registry import ModelSpec
+
+
+TEXT = "The quick brown fox jumps over the lazy dog. " * 20
+
+
+def synthetic_encoding(size: int) -> Any:
+    """Build an encoding with random tokens.
+
+    Args:
+        size (int): The number of tokens of the encoding.
+
+    Returns:
+        Any: The tiktoken encoding.
+    """
+    from tiktoken import Encoding
+
+    generator = random.Random(0)  # noqa: S311
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    letters = b"abcdefghijklmnopqrstuvwxyz "
+    while len(ranks) < size:
+        token = bytes(generator.choices(letters, k=generator.randint(2, 10)))
+        ranks.setdefault(token, len(ranks))
+    return Encoding(
+        "synthetic",
+        pat_str=r" ?\w+| ?[^\s\w]+|\s+",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+def memory() -> tuple[float, float]:
+    """Read the memory of the current process.
+
+    Returns:
+        tuple[float, float]: The RSS and the PSS in MiB.
+
+    Raises:
+        RuntimeError: If /proc is not available.
+    """
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise RuntimeError("This benchmark needs /proc/self/smaps_rollup (Linux)")
+
+    values = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:"):
+                values[fields[0]] = int(fields[1]) / 1024
+    return values["Rss:"], values["Pss:"]
+
+
+def worker(
+    token_counter: TokenCounter,
+    counted: Barrier,
+    measured: Barrier,
+    results: "multiprocessing.Queue[tuple[float, float, float]]",
+) -> None:
+    """Count a prompt and report the latency and the memory once every worker counted.
+
+    Args:
+        token_counter (TokenCounter): The token counter, inherited from the parent.
+        counted (Barrier): Waited on once the prompt is counted.
+        measured (Barrier): Waited on once the memory is read, so every worker is alive while it is read.
+        results (multiprocessing.Queue[tuple[float, float, float]]): The latency in ms, the RSS and the PSS.
+    """
+    start = time.perf_counter()
+    token_counter.string_tokens(TEXT)
+    latency = (time.perf_counter() - start) * 1e3
+    counted.wait()
+    rss, pss = memory()
+    results.put((latency, rss, pss))
+    measured.wait()
+
+
+def run(token_counter: TokenCounter, workers: int) -> list[tuple[float, float, float]]:
+    """Fork workers that count a prompt.
+
+    Args:
+        token_counter (TokenCounter): The token counter the workers inherit.
+        workers (int): The number of workers.
+
+    Returns:
+        list[tuple[float, float, float]]: The latency, RSS and PSS of each worker.
+    """
+    context = multiprocessing.get_context("fork")
+    counted = context.Barrier(workers)
+    measured = context.Barrier(workers)
+    results: "multiprocessing.Queue[tuple[float, float, float]]" = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(token_counter, counted, measured, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def report(label: str, measurements: list[tuple[float, float, float]]) -> None:
+    """Print the median latency and the mean memory of the workers.
+
+    Args:
+        label (str): The mode.
+        measurements (list[tuple[float, float, float]]): The latency, RSS and PSS of each worker.
+    """
+    latencies = [latency for latency, _, _ in measurements]
+    rss = statistics.mean(rss for _, rss, _ in measurements)
+    pss = statistics.mean(pss for _, _, pss in measurements)
+    print(
+        f"{label:<26} first count {statistics.median(latencies):8.1f} ms"
+        f"  RSS {rss:7.1f} MiB  PSS {pss:7.1f} MiB"
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the benchmark and print the latency and memory of the workers in each mode.
+
+    Args:
+        argv (Optional[list[str]]): The command line arguments. Defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--encoding", help="A tiktoken encoding to bundle.")
+    parser.add_argument("--size", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    if args.encoding:
+        from tiktoken import get_encoding
+
+        encoding = get_encoding(args.encoding)
+    else:
+        encoding = synthetic_encoding(args.size)
+    spec = ModelSpec(encoding=encoding.name)
+
+    with tempfile.TemporaryDirectory() as bundle, tempfile.TemporaryDirectory() as text:
+        save_encoding(bundle, encoding)
+        os.link(
+            os.path.join(bundle, f"{encoding.name}.json"),
+            os.path.join(text, f"{encoding.name}.json"),
+        )
+        with open(os.path.join(text, f"{encoding.name}.tiktoken"), "wb") as ranks:
+            for token, rank in encoding._mergeable_ranks.items():
+                ranks.write(base64.b64encode(token) + b" %d\n" % rank)
+        del encoding
+        gc.collect()
+
+        modes = {
+            "tiktoken file per worker": TokenCounter(
+                model_spec=spec, encoding_dir=text
+            ),
+            "bundle per worker": TokenCounter(model_spec=spec, encoding_dir=bundle),
+        }
+        for label, token_counter in modes.items():
+            report(label, run(token_counter, args.workers))
+
+        token_counter = TokenCounter(model_spec=spec, encoding_dir=bundle)
+        token_counter.encoding
+        gc.freeze()
+        report("bundle preloaded", run(token_counter, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -188,6 +188,20 @@ def coverage(session: Session) -> None:
     session.run("coverage", *args)
 
 
+@session(name="import-time", python=default_python_version)
+def import_time(session: Session) -> None:
+    """Measure the cold start time of the package."""
+    session.install(".")
+    session.run("python", "-m", "benchmarks.import_time", *session.posargs)
+
+
+@session(python=default_python_version)
+def benchmarks(session: Session) -> None:
+    """Run the benchmark suite and compare it with the stored baseline."""
+    session.install(".")
+    session.run("python", "-m", "benchmarks.suite", *session.posargs)
+
+
 @session(python=default_python_version)
 def typeguard(session: Session) -> None:
     """Runtime type checking using Typeguard."""
@@ -1,7 +1,112 @@
-from typing import Any, Literal, Optional, Union
+import gc
+import json
+from functools import lru_cache
+from importlib import import_module
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional, Union
 
-from .models import OpenAIRequest
-from .token_counter import TokenCounter
+from .registry import ModelSpec, get_model_spec, register_model
+from .token_counter import TokenCounter, get_token_counter
+
+
+if TYPE_CHECKING:
+    from .async_counter import AsyncTokenCounter
+    from .chunking import TextChunk, chunk_text
+    from .completion import CompletionTokenCounter
+    from .conversation import ConversationTokenCounter
+    from .trim import TrimPolicy, trim_request
+
+
+__all__ = [
+    "AsyncTokenCounter",
+    "CompletionTokenCounter",
+    "ConversationTokenCounter",
+    "ModelSpec",
+    "TextChunk",
+    "TokenCounter",
+    "TrimPolicy",
+    "chunk_text",
+    "get_model_spec",
+    "get_token_counter",
+    "openai_token_counter",
+    "openai_token_counter_async",
+    "openai_token_counter_json",
+    "openai_token_counts",
+    "preload",
+    "register_model",
+    "trim_request",
+]
+
+# The exports that import pydantic, asyncio or regex, which are imported on first access
+_lazy_exports = {
+    "AsyncTokenCounter": ".async_counter",
+    "CompletionTokenCounter": ".completion",
+    "ConversationTokenCounter": ".conversation",
+    "TextChunk": ".chunking",
+    "TrimPolicy": ".trim",
+    "chunk_text": ".chunking",
+    "trim_request": ".trim",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import the exports that are expensive to import on first access.
+
+    Args:
+        name (str): The name of the export.
+
+    Returns:
+        Any: The export.
+
+    Raises:
+        AttributeError: If the package has no such export.
+    """
+    module = _lazy_exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def preload(models: Optional[list[Optional[str]]] = None, freeze: bool = False) -> None:
+    """Import everything the package defers and load the encodings of models.
+
+    Long running servers call this at startup, before forking their workers, so the first count of each worker
+    doesn't import the models or load an encoding, and the workers share the loaded encodings copy-on-write.
+
+    Args:
+        models (Optional[list[Optional[str]]]): The models to load the encodings of. Defaults to the default model.
+        freeze (bool): Move every object allocated so far out of reach of the garbage collector with gc.freeze, so
+            collections in the workers don't write to the pages of the loaded encodings and unshare them.
+    """
+    for name in _lazy_exports:
+        __getattr__(name)
+    import_module(".format", __name__)
+    import_module(".models", __name__)
+
+    for model in models or [None]:
+        get_token_counter(model).encoding
+
+    if freeze:
+        gc.freeze()
+
+
+@lru_cache(maxsize=None)
+def _json_loader() -> Callable[[Union[str, bytes, bytearray]], Any]:
+    """Get the parser for trusted request bodies, imported on first use.
+
+    Returns:
+        Callable[[Union[str, bytes, bytearray]], Any]: orjson.loads if orjson is installed, else json.loads.
+    """
+    try:
+        loads: Callable[[Union[str, bytes, bytearray]], Any] = import_module(
+            "orjson"
+        ).loads
+    except ImportError:
+        loads = json.loads
+    return loads
 
 
 def openai_token_counter(
@@ -11,6 +116,11 @@ def openai_token_counter(
     function_call: Optional[
         Union[dict[Literal["name"], Any], Literal["auto"], Literal["none"]]
     ] = None,
+    validate: bool = True,
+    approximate: bool = False,
+    budget: Optional[int] = None,
+    tools: Optional[list[dict[str, Any]]] = None,
+    tool_choice: Optional[Union[str, dict[str, Any]]] = None,
 ) -> int:
     """Token counter function.
 
@@ -19,17 +129,140 @@ def openai_token_counter(
         model (Optional[str]): The model to use for token counting.
         functions (Optional[list[dict[str, Any]]]): The functions to count tokens for.
         function_call (Optional[dict[str, Any]]): The function call to count tokens for.
+        validate (bool): Whether to validate the messages. Pass False for trusted input to count directly from the
+            dicts, which is faster for long conversations.
+        approximate (bool): Return a calibrated upper bound of the token count computed without encoding the
+            messages.
+        budget (Optional[int]): With approximate, count exactly when the upper bound is over the budget.
+        tools (Optional[list[dict[str, Any]]]): The tools to count tokens for.
+        tool_choice (Optional[Union[str, dict[str, Any]]]): The tool choice to count tokens for.
 
     Returns:
         int: The number of tokens the prompt will use.
     """
-    token_counter = TokenCounter(model=model)
+    token_counter = get_token_counter(model)
+    if not validate:
+        return token_counter.estimate_raw_token_count(
+            messages, functions, function_call, approximate, budget, tools, tool_choice
+        )
+
     return token_counter.estimate_token_count(
-        OpenAIRequest.model_validate(
+        token_counter.validate_request(
+            {
+                "messages": messages,
+                "functions": functions,
+                "function_call": function_call,
+                "tools": tools,
+                "tool_choice": tool_choice,
+            }
+        ),
+        approximate,
+        budget,
+    )
+
+
+def openai_token_counter_json(
+    body: Union[str, bytes, bytearray, memoryview],
+    model: Optional[str] = None,
+    validate: bool = True,
+) -> int:
+    """Token counter function for a raw chat completions request body.
+
+    The body is parsed once, straight into the fields the token counter uses; the other fields of the body, such
+    as ``temperature`` or ``logit_bias``, are skipped by the parser instead of being built into Python objects.
+
+    Args:
+        body (Union[str, bytes, bytearray, memoryview]): The JSON request body.
+        model (Optional[str]): The model to use for token counting if the body doesn't have a ``model`` field.
+        validate (bool): Whether to validate the body. Pass False for trusted input to parse it with orjson, if it
+            is installed, and count directly from the dicts.
+
+    Returns:
+        int: The number of tokens the prompt will use.
+    """
+    if isinstance(body, memoryview):
+        body = body.tobytes()
+
+    if validate:
+        from .models import request_body_adapter
+
+        # The model of the body selects the token counter, so validation is timed before it is known
+        start = perf_counter()
+        request = request_body_adapter.validate_json(body)
+        token_counter = get_token_counter(request.model or model)
+        token_counter.record_phase("validation", start, len(body))
+        return token_counter.estimate_token_count(request)
+
+    record = _json_loader()(body)
+    return get_token_counter(record.get("model") or model).estimate_raw_token_count(
+        record["messages"],
+        record.get("functions"),
+        record.get("function_call"),
+        tools=record.get("tools"),
+        tool_choice=record.get("tool_choice"),
+    )
+
+
+async def openai_token_counter_async(
+    messages: list[dict[str, Any]],
+    model: Optional[str] = None,
+    functions: Optional[list[dict[str, Any]]] = None,
+    function_call: Optional[
+        Union[dict[Literal["name"], Any], Literal["auto"], Literal["none"]]
+    ] = None,
+    tools: Optional[list[dict[str, Any]]] = None,
+    tool_choice: Optional[Union[str, dict[str, Any]]] = None,
+) -> int:
+    """Token counter function for asyncio applications.
+
+    Large prompts are encoded on a thread pool so they don't block the event loop.
+
+    Args:
+        messages (dict[str, Any]): The messages to count tokens for.
+        model (Optional[str]): The model to use for token counting.
+        functions (Optional[list[dict[str, Any]]]): The functions to count tokens for.
+        function_call (Optional[dict[str, Any]]): The function call to count tokens for.
+        tools (Optional[list[dict[str, Any]]]): The tools to count tokens for.
+        tool_choice (Optional[Union[str, dict[str, Any]]]): The tool choice to count tokens for.
+
+    Returns:
+        int: The number of tokens the prompt will use.
+    """
+    token_counter = get_token_counter(model)
+    return await token_counter.estimate_token_count_async(
+        token_counter.validate_request(
             {
                 "messages": messages,
                 "functions": functions,
                 "function_call": function_call,
+                "tools": tools,
+                "tool_choice": tool_choice,
             }
         )
     )
+
+
+def openai_token_counts(
+    requests: list[dict[str, Any]],
+    model: Optional[str] = None,
+    num_threads: int = 8,
+) -> list[int]:
+    """Token counter function for many requests at once.
+
+    Args:
+        requests (list[dict[str, Any]]): The requests to count tokens for. Each request is a dict with the
+            ``messages`` key and optionally the ``functions``, ``function_call``, ``tools`` and ``tool_choice``
+            keys.
+        model (Optional[str]): The model to use for token counting.
+        num_threads (int): The number of threads used to encode the batch.
+
+    Returns:
+        list[int]: The number of tokens each prompt will use, in the order of the requests.
+    """
+    from .models import requests_adapter
+
+    token_counter = get_token_counter(model)
+    start = perf_counter()
+    validated = requests_adapter.validate_python(requests)
+    token_counter.record_phase("validation", start)
+    return token_counter.estimate_token_counts(validated, num_threads=num_threads)
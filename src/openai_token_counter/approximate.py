@@ -0,0 +1,466 @@
+"""Approximate token counts from byte statistics.
+
+Every token of a BPE encoding is at least one byte, so the UTF-8 length of a string is a hard upper bound of its
+token count. A TokenBound tightens it with a linear bound on the number of bytes, the number of spaces, the number of
+transitions between a letter and a digit, and the number of bytes that are not letters, digits or spaces, which is
+where the token count per byte goes up (punctuation, newlines, numbers split in short groups, non-ASCII text). Each
+space and each transition starts a piece of the encoding pattern, and every piece is at least one token, so text made
+of single characters between spaces, like a list of digits, or of alternating letters and digits, like "a1a1", costs
+a token per byte.
+
+The coefficients are fitted per encoding against exact counts, then raised by a safety margin and capped by the byte
+count. The fitted bound is not proven for every string: it holds on the calibration corpus, which includes such
+adversarial text, and only the byte count is a hard bound.
+"""
+import json
+import math
+import random
+import string
+import uuid
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+
+if TYPE_CHECKING:
+    from tiktoken import Encoding
+
+
+# The bytes that are not letters, digits or spaces are counted by deleting these
+_ALNUM = (string.ascii_letters + string.digits + " ").encode()
+
+# Letters and digits are mapped to one byte of each class to count the transitions between them
+_CLASSES = bytes.maketrans(
+    (string.ascii_letters + string.digits).encode(), b"a" * 52 + b"0" * 10
+)
+
+# The relative margin added to the calibrated bounds, for text unlike the calibration corpus
+MARGIN = 0.1
+
+# Alphanumeric samples shorter than this are left to the constant of the bound, as their ratio is noisy
+_MIN_RATIO_BYTES = 32
+
+
+@dataclass(frozen=True)
+class TokenBound:
+    """Upper bound of the token count of a string, calibrated for an encoding.
+
+    The bound of a string of ``size`` UTF-8 bytes, ``spaces`` of which are spaces and ``other`` of which are not
+    letters, digits or spaces, with ``transitions`` letters next to a digit, is ``min(size, ceil((ratio * size +
+    space_ratio * spaces + transition_ratio * transitions + other_ratio * other) * (1 + margin)) + constant)``. Only
+    the byte count is a hard bound, see the module documentation.
+
+    Attributes:
+        ratio (float): The tokens per byte.
+        other_ratio (float): The additional tokens per byte that is not a letter, a digit or a space.
+        constant (int): The additional tokens per string.
+        space_ratio (float): The additional tokens per space.
+        transition_ratio (float): The additional tokens per transition between a letter and a digit.
+        margin (float): The relative margin added to the bound.
+    """
+
+    ratio: float = field(default=1.0)
+    other_ratio: float = field(default=0.0)
+    constant: int = field(default=0)
+    space_ratio: float = field(default=0.0)
+    transition_ratio: float = field(default=0.0)
+    margin: float = field(default=0.0)
+
+    def tokens(self, text: str) -> int:
+        """Get the upper bound of the token count of a string.
+
+        Args:
+            text (str): The string.
+
+        Returns:
+            int: The upper bound.
+        """
+        size, spaces, transitions, other = _statistics(
+            text.encode("utf-8", errors="surrogatepass")
+        )
+        linear = (
+            self.ratio * size
+            + self.space_ratio * spaces
+            + self.transition_ratio * transitions
+            + self.other_ratio * other
+        )
+        return min(size, math.ceil(linear * (1 + self.margin)) + self.constant)
+
+
+def _statistics(data: bytes) -> tuple[int, int, int, int]:
+    """Get the byte statistics of a string used by the bound.
+
+    Args:
+        data (bytes): The UTF-8 bytes of the string.
+
+    Returns:
+        tuple[int, int, int, int]: The number of bytes, spaces, transitions between a letter and a digit, and bytes
+            that are not letters, digits or spaces.
+    """
+    # Neither pair overlaps itself, so counting them finds every transition
+    classes = data.translate(_CLASSES)
+    transitions = classes.count(b"a0") + classes.count(b"0a")
+    return len(data), data.count(b" "), transitions, len(data.translate(None, _ALNUM))
+
+
+def calibrate(
+    encoding: "Encoding", samples: Optional[list[str]] = None, margin: float = MARGIN
+) -> TokenBound:
+    """Fit the bound of an encoding so it is at least the exact token count of every sample.
+
+    Args:
+        encoding (Encoding): The encoding to calibrate.
+        samples (Optional[list[str]]): The strings to calibrate on. Defaults to a synthetic corpus of prose, code,
+            JSON, numbers, identifiers, hashes, UUIDs, CJK text, emoji, and single characters between spaces and
+            newlines.
+        margin (float): The relative margin added to the fitted bound.
+
+    Returns:
+        TokenBound: The calibrated bound.
+    """
+    samples = samples if samples is not None else calibration_corpus()
+    counts = encoding.encode_ordinary_batch(samples)
+    statistics = [
+        (
+            len(tokens),
+            *_statistics(samples[index].encode("utf-8", errors="surrogatepass")),
+        )
+        for index, tokens in enumerate(counts)
+    ]
+
+    # Each coefficient is fitted on the samples that only have the features already fitted and its own
+    ratio = max(
+        (
+            tokens / size
+            for tokens, size, spaces, transitions, other in statistics
+            if not spaces and not transitions and not other and size >= _MIN_RATIO_BYTES
+        ),
+        default=0.0,
+    )
+    transition_ratio = max(
+        (
+            (tokens - ratio * size) / transitions
+            for tokens, size, spaces, transitions, other in statistics
+            if transitions and not spaces and not other and size >= _MIN_RATIO_BYTES
+        ),
+        default=0.0,
+    )
+    transition_ratio = max(transition_ratio, 0.0)
+    space_ratio = max(
+        (
+            (tokens - ratio * size - transition_ratio * transitions) / spaces
+            for tokens, size, spaces, transitions, other in statistics
+            if spaces and not other and size >= _MIN_RATIO_BYTES
+        ),
+        default=0.0,
+    )
+    space_ratio = max(space_ratio, 0.0)
+    other_ratio = max(
+        (
+            (
+                tokens
+                - ratio * size
+                - transition_ratio * transitions
+                - space_ratio * spaces
+            )
+            / other
+            for tokens, size, spaces, transitions, other in statistics
+            if other and size >= _MIN_RATIO_BYTES
+        ),
+        default=0.0,
+    )
+    other_ratio = max(other_ratio, 0.0)
+    constant = max(
+        (
+            math.ceil(
+                tokens
+                - ratio * size
+                - transition_ratio * transitions
+                - space_ratio * spaces
+                - other_ratio * other
+                - 1e-9
+            )
+            for tokens, size, spaces, transitions, other in statistics
+        ),
+        default=0,
+    )
+
+    return TokenBound(
+        ratio, other_ratio, max(constant, 0), space_ratio, transition_ratio, margin
+    )
+
+
+# The bound of each encoding calibrated on the default corpus, shared by the token counters of the process
+_bounds: dict[str, TokenBound] = {}
+_bounds_lock = Lock()
+
+
+def get_token_bound(encoding: "Encoding") -> TokenBound:
+    """Get the bound of an encoding, calibrated on the default corpus on first use.
+
+    Args:
+        encoding (Encoding): The encoding.
+
+    Returns:
+        TokenBound: The calibrated bound.
+    """
+    bound = _bounds.get(encoding.name)
+    if bound is None:
+        with _bounds_lock:
+            bound = _bounds.get(encoding.name)
+            if bound is None:
+                bound = _bounds[encoding.name] = calibrate(encoding)
+
+    return bound
+
+
+_WORDS = (
+    "the of and to in is you that it he was for on are as with his they at be this have from or one had by word "
+    "but not what all were we when your can said there use an each which she do how their if will up other about "
+    "out many then them these so some her would make like him into time has look two more write go see number no "
+    "way could people my than first water been call who oil its now find long down day did get come made may part "
+    "token counter request message function assistant system user model content schema parameter encoding budget"
+).split()
+
+
+def calibration_corpus(seed: int = 0) -> list[str]:
+    """Build the default calibration corpus.
+
+    Args:
+        seed (int): The seed of the generator, so the corpus is the same on every run.
+
+    Returns:
+        list[str]: Short and long samples of each kind of text.
+    """
+    generator = random.Random(seed)  # noqa: S311
+    kinds = [_prose, _letters, _identifier, _number, _code, _json, _cjk, _emoji]
+    kinds += [_punctuation, _hex, _uuid]
+    # Text made of one character pieces, where every byte is a token
+    kinds += [_spaced, _matrix, _alternating]
+
+    samples = [
+        kind(generator, size)
+        for kind in kinds
+        for size in (1, 2, 3, 5, 8, 13, 40, 100, 400)
+        for _ in range(4)
+    ]
+
+    # Mixed samples, where the kinds of text meet at their boundaries
+    for _ in range(64):
+        samples.append(
+            " ".join(
+                generator.choice(kinds)(generator, generator.randint(1, 20))
+                for _ in range(generator.randint(2, 12))
+            )
+        )
+
+    return samples
+
+
+def _prose(generator: random.Random, size: int) -> str:
+    """Generate a sentence.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of words.
+
+    Returns:
+        str: The sentence.
+    """
+    return " ".join(generator.choice(_WORDS) for _ in range(size)).capitalize() + "."
+
+
+def _identifier(generator: random.Random, size: int) -> str:
+    """Generate a random identifier, like a hash or a key.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters.
+
+    Returns:
+        str: The identifier.
+    """
+    return "".join(generator.choices(string.ascii_letters + string.digits, k=size))
+
+
+def _letters(generator: random.Random, size: int) -> str:
+    """Generate random letters, like a base64 blob without digits.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of letters.
+
+    Returns:
+        str: The letters.
+    """
+    return "".join(generator.choices(string.ascii_letters, k=size))
+
+
+def _hex(generator: random.Random, size: int) -> str:
+    """Generate a lowercase hexadecimal string, like a hash.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters.
+
+    Returns:
+        str: The hexadecimal string.
+    """
+    return "".join(generator.choices("0123456789abcdef", k=size))
+
+
+def _uuid(generator: random.Random, size: int) -> str:
+    """Generate UUIDs, one per line.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of UUIDs.
+
+    Returns:
+        str: The UUIDs.
+    """
+    return "\n".join(
+        str(uuid.UUID(int=generator.getrandbits(128), version=4)) for _ in range(size)
+    )
+
+
+def _number(generator: random.Random, size: int) -> str:
+    """Generate a random number.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of digits.
+
+    Returns:
+        str: The number.
+    """
+    return "".join(generator.choices(string.digits, k=size))
+
+
+def _code(generator: random.Random, size: int) -> str:
+    """Generate lines of code.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of lines.
+
+    Returns:
+        str: The code.
+    """
+    return "\n".join(
+        f"    {_identifier(generator, 6)}_{generator.choice(_WORDS)} = "
+        f"self.{generator.choice(_WORDS)}({_number(generator, 3)}, {_identifier(generator, 4)!r})"
+        f"  # {_prose(generator, 3)}"
+        for _ in range(size)
+    )
+
+
+def _json(generator: random.Random, size: int) -> str:
+    """Generate a JSON object.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of keys.
+
+    Returns:
+        str: The JSON object.
+    """
+    return json.dumps(
+        {
+            generator.choice(_WORDS): [
+                int(_number(generator, 4)),
+                _identifier(generator, 8),
+                None,
+            ]
+            for _ in range(size)
+        }
+    )
+
+
+def _cjk(generator: random.Random, size: int) -> str:
+    """Generate CJK text.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters.
+
+    Returns:
+        str: The text.
+    """
+    return "".join(chr(generator.randint(0x4E00, 0x9FFF)) for _ in range(size))
+
+
+def _emoji(generator: random.Random, size: int) -> str:
+    """Generate emoji.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of emoji.
+
+    Returns:
+        str: The emoji.
+    """
+    return "".join(chr(generator.randint(0x1F300, 0x1FAFF)) for _ in range(size))
+
+
+def _punctuation(generator: random.Random, size: int) -> str:
+    """Generate punctuation.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters.
+
+    Returns:
+        str: The punctuation.
+    """
+    return "".join(generator.choices(string.punctuation, k=size))
+
+
+def _spaced(generator: random.Random, size: int) -> str:
+    """Generate single letters and digits between spaces, like a list of digits or a bitstring.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters between the spaces.
+
+    Returns:
+        str: The text.
+    """
+    alphabet = generator.choice([string.digits, "01", string.ascii_letters])
+    return " ".join(generator.choices(alphabet, k=size))
+
+
+def _matrix(generator: random.Random, size: int) -> str:
+    """Generate a matrix of single digits, with a row per line.
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of entries.
+
+    Returns:
+        str: The matrix.
+    """
+    digits = generator.choices(string.digits, k=size)
+    columns = generator.randint(2, 16)
+    return "\n".join(
+        " ".join(digits[start : start + columns]) for start in range(0, size, columns)
+    )
+
+
+def _alternating(generator: random.Random, size: int) -> str:
+    """Generate alternating letters and digits, like "a1a1" or "x7k2".
+
+    Args:
+        generator (random.Random): The random generator.
+        size (int): The number of characters.
+
+    Returns:
+        str: The text.
+    """
+    if generator.random() < 0.5:
+        pair = generator.choice(string.ascii_letters) + generator.choice(string.digits)
+        return (pair * size)[:size]
+    return "".join(
+        generator.choice(string.digits if index % 2 else string.ascii_letters)
+        for index in range(size)
+    )
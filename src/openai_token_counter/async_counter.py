@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from .models import OpenAIRequest
+from .token_counter import TokenCounter, _request_functions, get_token_counter
+
+
+# A large request and the future of its token count
+_Prompt = tuple[OpenAIRequest, asyncio.Future[int]]
+
+
+@dataclass
+class _PendingBatch:
+    """The large prompts of an event loop waiting to be counted together."""
+
+    prompts: list[_Prompt] = field(default_factory=list)
+    flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+class AsyncTokenCounter:
+    """Token counter for asyncio applications that encodes large prompts off the event loop.
+
+    Small prompts are counted inline, since handing them to a thread costs more than counting them. Large prompts,
+    and prompts with functions or a streamed content, which formatting the functions or reading the content would
+    block on, are split and counted together in a single job on the thread pool when they arrive within a short
+    window; tiktoken releases the GIL while encoding, so the event loop keeps running in the meantime. Each event
+    loop batches its own prompts, so a counter can be shared by the event loops of several threads, or of
+    successive asyncio.run calls.
+
+    Attributes:
+        token_counter (TokenCounter): The token counter used to count the prompts.
+        executor (Optional[Executor]): The thread pool that encodes the prompts. Defaults to the event loop's
+            default executor.
+        inline_max_length (int): Prompts with fewer characters than this are counted inline.
+        batch_window (float): The time in seconds to wait for other prompts before counting a batch.
+        max_batch_size (int): The number of prompts that triggers counting a batch without waiting.
+    """
+
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        executor: Optional[Executor] = None,
+        inline_max_length: int = 4096,
+        batch_window: float = 0.001,
+        max_batch_size: int = 64,
+    ) -> None:
+        """Create an async token counter.
+
+        Args:
+            token_counter (Optional[TokenCounter]): The token counter to use. Defaults to the shared counter for
+                the cl100k_base encoding.
+            executor (Optional[Executor]): The thread pool that encodes the prompts. Defaults to the event loop's
+                default executor.
+            inline_max_length (int): Prompts with fewer characters than this are counted inline.
+            batch_window (float): The time in seconds to wait for other prompts before counting a batch.
+            max_batch_size (int): The number of prompts that triggers counting a batch without waiting.
+        """
+        self.token_counter = token_counter or get_token_counter()
+        self.executor = executor
+        self.inline_max_length = inline_max_length
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        # The batch of each event loop, dropped with its loop
+        self._pending: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, _PendingBatch
+        ] = weakref.WeakKeyDictionary()
+        self._pending_lock = threading.Lock()
+        # Keep a reference to the running batches so they are not garbage collected
+        self._batches: set[asyncio.Task[None]] = set()
+
+    async def estimate_token_count(self, request: OpenAIRequest) -> int:
+        """Estimate the number of tokens a prompt will use.
+
+        Args:
+            request (OpenAIRequest): The request to estimate the token count for.
+
+        Returns:
+            int: An estimate for the number of tokens the prompt will use, identical to
+            TokenCounter.estimate_token_count.
+        """
+        if self._is_inline(request):
+            strings, tokens = self.token_counter._request_parts(request)
+            return tokens + sum(self.token_counter.string_tokens(s) for s in strings)
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending_batch(loop)
+        future: asyncio.Future[int] = loop.create_future()
+        pending.prompts.append((request, future))
+
+        if len(pending.prompts) >= self.max_batch_size:
+            self._flush(loop, pending)
+        elif pending.flush_handle is None:
+            pending.flush_handle = loop.call_later(
+                self.batch_window, self._flush, loop, pending
+            )
+
+        return await future
+
+    def _is_inline(self, request: OpenAIRequest) -> bool:
+        """Check whether a request is cheap enough to count on the event loop.
+
+        Args:
+            request (OpenAIRequest): The request.
+
+        Returns:
+            bool: Whether the request has no functions, no streamed content, and fewer characters of text than
+                inline_max_length.
+        """
+        if _request_functions(request):
+            return False
+
+        length = 0
+        for message in request.messages:
+            content = message.content
+            if isinstance(content, str):
+                length += len(content)
+            elif isinstance(content, list):
+                length += sum(len(part.text) for part in content if part.type == "text")
+            elif content is not None:
+                return False
+            if message.function_call:
+                length += len(message.function_call.arguments)
+            for tool_call in message.tool_calls or ():
+                length += len(tool_call.function.arguments)
+        return length < self.inline_max_length
+
+    def _count_requests(
+        self, requests: list[OpenAIRequest]
+    ) -> list[Union[int, Exception]]:
+        """Split requests and count them together, on the thread pool.
+
+        Each request is split once, since a streamed content is consumed by splitting it. If counting the requests
+        together fails, each request is counted on its own so a single invalid request only fails its own count.
+
+        Args:
+            requests (list[OpenAIRequest]): The requests.
+
+        Returns:
+            list[Union[int, Exception]]: The token count of each request, or the error counting it.
+        """
+        token_counter = self.token_counter
+        split: list[Union[tuple[list[str], int], Exception]] = []
+        for request in requests:
+            try:
+                split.append(token_counter._request_parts(request))
+            except Exception as err:
+                split.append(err)
+
+        try:
+            counts = iter(
+                token_counter._count_parts(
+                    [parts for parts in split if not isinstance(parts, Exception)], 1
+                )
+            )
+            return [
+                parts if isinstance(parts, Exception) else next(counts)
+                for parts in split
+            ]
+        except Exception:
+            results: list[Union[int, Exception]] = []
+            for parts in split:
+                if isinstance(parts, Exception):
+                    results.append(parts)
+                    continue
+                try:
+                    results.extend(token_counter._count_parts([parts], 1))
+                except Exception as err:
+                    results.append(err)
+            return results
+
+    def _pending_batch(self, loop: asyncio.AbstractEventLoop) -> _PendingBatch:
+        """Get the batch of an event loop, and drop the batches of the closed loops.
+
+        A loop closed before its batch was flushed, such as after a cancelled count, leaves a batch whose timer will
+        never fire.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The running event loop.
+
+        Returns:
+            _PendingBatch: The batch of the loop.
+        """
+        with self._pending_lock:
+            for closed in [other for other in self._pending if other.is_closed()]:
+                del self._pending[closed]
+            return self._pending.setdefault(loop, _PendingBatch())
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, pending: _PendingBatch) -> None:
+        """Count the pending prompts of an event loop in a single job on the thread pool.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The event loop.
+            pending (_PendingBatch): The batch of the loop.
+        """
+        if pending.flush_handle is not None:
+            pending.flush_handle.cancel()
+            pending.flush_handle = None
+
+        batch, pending.prompts = pending.prompts, []
+        if batch:
+            task = loop.create_task(self._count_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _count_batch(self, batch: list[_Prompt]) -> None:
+        """Count a batch of prompts on the thread pool and resolve their futures.
+
+        Args:
+            batch (list[_Prompt]): The requests and their futures.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self._count_requests, [request for request, _ in batch]
+            )
+        except Exception as err:
+            results = [err] * len(batch)
+
+        for index, (_, future) in enumerate(batch):
+            result = results[index]
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
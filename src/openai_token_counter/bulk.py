@@ -0,0 +1,325 @@
+"""Bulk token counting of chat requests logged in JSONL files.
+
+Each line of the input files is a chat completion request body, with the ``messages`` key and optionally the
+``model``, ``functions``, ``function_call``, ``tools`` and ``tool_choice`` keys. The counts are written as one JSON
+object per line, in the order of the input, and the totals are printed when every file has been counted.
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Iterator, Optional
+
+from .token_counter import get_token_counter
+
+
+@dataclass
+class BulkState:
+    """The progress and totals of a bulk count, saved as a checkpoint after each chunk.
+
+    Attributes:
+        paths (list[str]): The input files.
+        file_index (int): The index of the file being counted.
+        offset (int): The byte offset in the file of the first line that has not been counted.
+        line (int): The line number of the first line that has not been counted.
+        output_size (int): The size of the output file once the counted lines have been written.
+        records (int): The number of records counted.
+        errors (int): The number of records that couldn't be counted.
+        prompt_tokens (int): The total prompt tokens of the records.
+        model_tokens (dict[str, int]): The total prompt tokens of the records per model.
+    """
+
+    paths: list[str]
+    file_index: int = field(default=0)
+    offset: int = field(default=0)
+    line: int = field(default=1)
+    output_size: int = field(default=0)
+    records: int = field(default=0)
+    errors: int = field(default=0)
+    prompt_tokens: int = field(default=0)
+    model_tokens: dict[str, int] = field(default_factory=dict)
+
+
+def count_files(
+    paths: list[str],
+    output: str,
+    model: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+    checkpoint: Optional[str] = None,
+    validate: bool = True,
+) -> BulkState:
+    """Count the prompt tokens of every request in JSONL files on a process pool.
+
+    The files are read in chunks and at most two chunks per worker are in flight, so memory stays bounded
+    regardless of the size of the files. Each worker resolves the encoding of a model once and reuses it for
+    every chunk.
+
+    Args:
+        paths (list[str]): The JSONL files to count.
+        output (str): The JSONL file the per record counts are written to.
+        model (Optional[str]): The model of the records that don't have one.
+        workers (Optional[int]): The number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): The number of records sent to a worker at once.
+        checkpoint (Optional[str]): A file the progress is saved to after each chunk. If it exists, counting
+            resumes from it.
+        validate (bool): Whether to validate the requests. Pass False for trusted logs to count faster.
+
+    Returns:
+        BulkState: The totals of the count.
+
+    Raises:
+        ValueError: If the checkpoint was saved for other input files.
+    """
+    state = _load_state(checkpoint) if checkpoint else None
+    if state is None:
+        state = BulkState(paths=list(paths))
+    elif state.paths != list(paths):
+        raise ValueError(f"The checkpoint {checkpoint} was saved for other files")
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+
+    with open(output, "ab") as output_file, ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(model,)
+    ) as pool:
+        # Drop the lines written after the last checkpoint, they are counted again
+        output_file.truncate(state.output_size)
+        in_flight: deque[tuple[Future[list[dict[str, Any]]], int, int, int]] = deque()
+
+        for file_index in range(state.file_index, len(paths)):
+            resuming = file_index == state.file_index
+            with open(paths[file_index], "rb") as input_file:
+                for chunk, offset, line in _read_chunks(
+                    input_file,
+                    state.offset if resuming else 0,
+                    state.line if resuming else 1,
+                    chunk_size,
+                ):
+                    future = pool.submit(
+                        _count_chunk, paths[file_index], chunk, model, validate
+                    )
+                    in_flight.append((future, file_index, offset, line))
+                    while len(in_flight) >= max_in_flight:
+                        _write_chunk(
+                            in_flight.popleft(), state, output_file, checkpoint
+                        )
+
+        while in_flight:
+            _write_chunk(in_flight.popleft(), state, output_file, checkpoint)
+
+    return state
+
+
+def _read_chunks(
+    input_file: BinaryIO, offset: int, line: int, chunk_size: int
+) -> Iterator[tuple[list[tuple[int, bytes]], int, int]]:
+    """Read the lines of a file in chunks.
+
+    Args:
+        input_file (BinaryIO): The file to read.
+        offset (int): The byte offset to start reading from.
+        line (int): The line number at the offset.
+        chunk_size (int): The number of non empty lines in a chunk.
+
+    Yields:
+        tuple[list[tuple[int, bytes]], int, int]: The line numbers and contents of the chunk, and the byte offset
+        and line number after it.
+    """
+    input_file.seek(offset)
+    chunk: list[tuple[int, bytes]] = []
+
+    while data := input_file.readline():
+        if data.strip():
+            chunk.append((line, data))
+        line += 1
+        if len(chunk) >= chunk_size:
+            yield chunk, input_file.tell(), line
+            chunk = []
+
+    if chunk:
+        yield chunk, input_file.tell(), line
+
+
+def _init_worker(model: Optional[str]) -> None:
+    """Resolve the encoding of the default model once when a worker starts.
+
+    Args:
+        model (Optional[str]): The default model.
+    """
+    get_token_counter(model).encoding
+
+
+def _count_chunk(
+    path: str, chunk: list[tuple[int, bytes]], model: Optional[str], validate: bool
+) -> list[dict[str, Any]]:
+    """Count the prompt tokens of a chunk of records, in a worker process.
+
+    Args:
+        path (str): The file the records come from.
+        chunk (list[tuple[int, bytes]]): The line numbers and contents of the records.
+        model (Optional[str]): The model of the records that don't have one.
+        validate (bool): Whether to validate the requests.
+
+    Returns:
+        list[dict[str, Any]]: The count, or the error, of each record.
+    """
+    results: list[dict[str, Any]] = []
+
+    for line, data in chunk:
+        result: dict[str, Any] = {"path": path, "line": line}
+        try:
+            record = json.loads(data)
+            result["id"] = record.get("id")
+            result["model"] = record.get("model") or model
+            token_counter = get_token_counter(result["model"])
+            if validate:
+                tokens = token_counter.estimate_token_count(
+                    token_counter.validate_request(
+                        {
+                            "messages": record["messages"],
+                            "functions": record.get("functions"),
+                            "function_call": record.get("function_call"),
+                            "tools": record.get("tools"),
+                            "tool_choice": record.get("tool_choice"),
+                        }
+                    )
+                )
+            else:
+                tokens = token_counter.estimate_raw_token_count(
+                    record["messages"],
+                    record.get("functions"),
+                    record.get("function_call"),
+                    tools=record.get("tools"),
+                    tool_choice=record.get("tool_choice"),
+                )
+            result["prompt_tokens"] = tokens
+        except Exception as err:
+            result["error"] = f"{type(err).__name__}: {err}"
+        results.append(result)
+
+    return results
+
+
+def _write_chunk(
+    chunk: tuple[Future[list[dict[str, Any]]], int, int, int],
+    state: BulkState,
+    output_file: BinaryIO,
+    checkpoint: Optional[str],
+) -> None:
+    """Write the counts of a chunk, update the totals and save the checkpoint.
+
+    Args:
+        chunk (tuple[Future[list[dict[str, Any]]], int, int, int]): The pending counts of the chunk, and the file
+            index, byte offset and line number after it.
+        state (BulkState): The progress and totals of the count.
+        output_file (BinaryIO): The file the counts are written to.
+        checkpoint (Optional[str]): The file the progress is saved to.
+    """
+    future, file_index, offset, line = chunk
+    results = future.result()
+
+    for result in results:
+        state.records += 1
+        if "error" in result:
+            state.errors += 1
+            continue
+        state.prompt_tokens += result["prompt_tokens"]
+        model = result["model"] or "default"
+        state.model_tokens[model] = (
+            state.model_tokens.get(model, 0) + result["prompt_tokens"]
+        )
+
+    output_file.write(
+        b"".join(json.dumps(result).encode() + b"\n" for result in results)
+    )
+    output_file.flush()
+
+    state.file_index = file_index
+    state.offset = offset
+    state.line = line
+    state.output_size = output_file.tell()
+    if checkpoint:
+        _save_state(checkpoint, state)
+
+
+def _load_state(checkpoint: str) -> Optional[BulkState]:
+    """Load the progress of a bulk count from a checkpoint.
+
+    Args:
+        checkpoint (str): The checkpoint file.
+
+    Returns:
+        Optional[BulkState]: The saved progress, or None if there's no checkpoint.
+    """
+    if not os.path.exists(checkpoint):
+        return None
+
+    with open(checkpoint) as checkpoint_file:
+        return BulkState(**json.load(checkpoint_file))
+
+
+def _save_state(checkpoint: str, state: BulkState) -> None:
+    """Atomically save the progress of a bulk count to a checkpoint.
+
+    Args:
+        checkpoint (str): The checkpoint file.
+        state (BulkState): The progress to save.
+    """
+    temporary = f"{checkpoint}.tmp"
+    with open(temporary, "w") as checkpoint_file:
+        json.dump(asdict(state), checkpoint_file)
+    os.replace(temporary, checkpoint)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Count the prompt tokens of JSONL request logs from the command line.
+
+    Args:
+        argv (Optional[list[str]]): The command line arguments. Defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(
+        description="Count the prompt tokens of chat requests logged in JSONL files."
+    )
+    parser.add_argument("paths", nargs="+", help="The JSONL files to count.")
+    parser.add_argument(
+        "-o", "--output", required=True, help="The JSONL file for the counts."
+    )
+    parser.add_argument("--model", help="The model of the records without one.")
+    parser.add_argument("--workers", type=int, help="The number of processes.")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", help="Save progress to and resume from here.")
+    parser.add_argument(
+        "--no-validate",
+        dest="validate",
+        action="store_false",
+        help="Don't validate the requests, for trusted logs.",
+    )
+    args = parser.parse_args(argv)
+
+    state = count_files(
+        args.paths,
+        args.output,
+        model=args.model,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint=args.checkpoint,
+        validate=args.validate,
+    )
+    print(
+        json.dumps(
+            {
+                "records": state.records,
+                "errors": state.errors,
+                "prompt_tokens": state.prompt_tokens,
+                "model_tokens": state.model_tokens,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
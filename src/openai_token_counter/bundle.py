@@ -0,0 +1,190 @@
+"""Offline encoding bundles.
+
+A bundle is a directory with two files per encoding: ``<name>.json`` holds the split pattern and the special tokens,
+and ``<name>.bpe`` holds the BPE ranks in a precompiled binary layout that is read through a memory map. The ranks
+can also be given as a ``<name>.tiktoken`` file, in the format tiktoken downloads, when there is no ``.bpe`` file.
+
+Create a bundle on a machine with network access with ``python -m openai_token_counter.bundle DIRECTORY NAME...``.
+"""
+import argparse
+import base64
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+
+if TYPE_CHECKING:
+    from tiktoken import Encoding
+
+
+# The magic number of a precompiled ranks file, followed by the number of ranks
+_MAGIC = b"OTCBPE\x01\x00"
+_HEADER = struct.Struct("<8sI")
+
+# The encodings loaded from each bundle, shared by every token counter of the process
+_encodings: dict[tuple[str, str], "Encoding"] = {}
+_encodings_lock = Lock()
+
+
+def load_encoding(directory: str, name: str) -> "Encoding":
+    """Load an encoding from a bundle, without network access.
+
+    Each encoding is loaded once per process and shared by the token counters. Loading it before forking worker
+    processes lets the workers share it copy-on-write.
+
+    Args:
+        directory (str): The bundle directory.
+        name (str): The name of the encoding.
+
+    Returns:
+        Encoding: The encoding.
+
+    Raises:
+        FileNotFoundError: If the bundle has no ranks for the encoding.
+    """
+    key = (os.path.abspath(directory), name)
+    encoding = _encodings.get(key)
+    if encoding is not None:
+        return encoding
+
+    with _encodings_lock:
+        encoding = _encodings.get(key)
+        if encoding is not None:
+            return encoding
+
+        from tiktoken import Encoding
+
+        path = os.path.join(directory, name)
+        with open(f"{path}.json") as metadata_file:
+            metadata = json.load(metadata_file)
+
+        if os.path.exists(f"{path}.bpe"):
+            mergeable_ranks = _read_ranks(f"{path}.bpe")
+        elif os.path.exists(f"{path}.tiktoken"):
+            mergeable_ranks = _read_tiktoken_ranks(f"{path}.tiktoken")
+        else:
+            raise FileNotFoundError(f"The bundle {directory} has no ranks for {name}")
+
+        encoding = Encoding(
+            name,
+            pat_str=metadata["pat_str"],
+            mergeable_ranks=mergeable_ranks,
+            special_tokens=metadata["special_tokens"],
+        )
+        _encodings[key] = encoding
+
+    return encoding
+
+
+def save_encoding(directory: str, encoding: "Encoding") -> None:
+    """Save an encoding to a bundle.
+
+    Args:
+        directory (str): The bundle directory, created if it doesn't exist.
+        encoding (Encoding): The encoding to save.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, encoding.name)
+
+    # tiktoken doesn't expose the definition of an encoding other than through these attributes
+    with open(f"{path}.json", "w") as metadata_file:
+        json.dump(
+            {
+                "pat_str": encoding._pat_str,
+                "special_tokens": encoding._special_tokens,
+            },
+            metadata_file,
+        )
+
+    tokens = sorted(encoding._mergeable_ranks.items(), key=lambda item: item[1])
+    ranks = array("I", (rank for _, rank in tokens))
+    lengths = array("H", (len(token) for token, _ in tokens))
+    if sys.byteorder == "big":
+        ranks.byteswap()
+        lengths.byteswap()
+
+    temporary = f"{path}.bpe.tmp"
+    with open(temporary, "wb") as ranks_file:
+        ranks_file.write(_HEADER.pack(_MAGIC, len(tokens)))
+        ranks_file.write(ranks.tobytes())
+        ranks_file.write(lengths.tobytes())
+        ranks_file.write(b"".join(token for token, _ in tokens))
+    os.replace(temporary, f"{path}.bpe")
+
+
+def _read_ranks(path: str) -> dict[bytes, int]:
+    """Read the ranks of a precompiled ranks file through a memory map.
+
+    Args:
+        path (str): The ranks file.
+
+    Returns:
+        dict[bytes, int]: The rank of each token.
+
+    Raises:
+        ValueError: If the file is not a precompiled ranks file.
+    """
+    with open(path, "rb") as ranks_file, mmap.mmap(
+        ranks_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        magic, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a precompiled ranks file")
+
+        ranks = array("I")
+        ranks.frombytes(data[_HEADER.size : _HEADER.size + 4 * count])
+        lengths = array("H")
+        lengths.frombytes(data[_HEADER.size + 4 * count : _HEADER.size + 6 * count])
+        if sys.byteorder == "big":
+            ranks.byteswap()
+            lengths.byteswap()
+
+        offsets = list(accumulate(lengths, initial=_HEADER.size + 6 * count))
+        return {data[offsets[i] : offsets[i + 1]]: ranks[i] for i in range(count)}
+
+
+def _read_tiktoken_ranks(path: str) -> dict[bytes, int]:
+    """Read the ranks of a file in the format tiktoken downloads.
+
+    Args:
+        path (str): The ranks file, with a base64 token and its rank on each line.
+
+    Returns:
+        dict[bytes, int]: The rank of each token.
+    """
+    mergeable_ranks: dict[bytes, int] = {}
+    with open(path, "rb") as ranks_file:
+        for line in ranks_file:
+            if line.strip():
+                token, rank = line.split()
+                mergeable_ranks[base64.b64decode(token)] = int(rank)
+    return mergeable_ranks
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Save tiktoken encodings to a bundle from the command line.
+
+    Args:
+        argv (Optional[list[str]]): The command line arguments. Defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(
+        description="Save tiktoken encodings to a bundle for offline use."
+    )
+    parser.add_argument("directory", help="The bundle directory.")
+    parser.add_argument("names", nargs="+", help="The encodings, e.g. cl100k_base.")
+    args = parser.parse_args(argv)
+
+    from tiktoken import get_encoding
+
+    for name in args.names:
+        save_encoding(args.directory, get_encoding(name))
+
+
+if __name__ == "__main__":
+    main()
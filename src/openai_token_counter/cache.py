@@ -0,0 +1,474 @@
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock, local
+from typing import TYPE_CHECKING, Generic, NamedTuple, Optional, TypeVar, cast
+
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+# Strings shorter than this are encoded faster than they are looked up in an SQLite cache, see benchmarks.string_cache
+SQLITE_MIN_LENGTH = 4096
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a cache."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(Generic[K, V]):
+    """A thread-safe, bounded cache that evicts the least recently used entries.
+
+    Attributes:
+        maxsize (int): The maximum number of entries. A size of 0 disables the cache.
+        hits (int): The number of lookups that found an entry.
+        misses (int): The number of lookups that did not find an entry.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """Create an empty cache.
+
+        Args:
+            maxsize (int): The maximum number of entries. A size of 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        """Get an entry and mark it as recently used.
+
+        Args:
+            key (K): The key of the entry.
+
+        Returns:
+            Optional[V]: The value of the entry, or None if it is not cached.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """Add an entry, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (K): The key of the entry.
+            value (V): The value of the entry.
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def setdefault(self, key: K, value: V) -> V:
+        """Get an entry and mark it as recently used, adding it first if it is not cached.
+
+        Args:
+            key (K): The key of the entry.
+            value (V): The value to add if the key is not cached.
+
+        Returns:
+            V: The value of the entry, which is the given value if it was added or if the cache is disabled.
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+
+            self.misses += 1
+            if self.maxsize > 0:
+                self._entries[key] = value
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return value
+
+    def pop(self, key: K) -> Optional[V]:
+        """Remove an entry.
+
+        Args:
+            key (K): The key of the entry.
+
+        Returns:
+            Optional[V]: The value of the removed entry, or None if it was not cached.
+        """
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Get the statistics of the cache.
+
+        Returns:
+            CacheInfo: The hits, misses, maximum size and current size of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+def fingerprint(data: bytes) -> str:
+    """Get a stable fingerprint of some data, to be used as a cache key.
+
+    Args:
+        data (bytes): The data to fingerprint.
+
+    Returns:
+        str: The hex digest of the data.
+    """
+    return blake2b(data, digest_size=16).hexdigest()
+
+
+class TokenCacheInfo(NamedTuple):
+    """Statistics of a token count cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_size: int
+
+
+class TokenCountCache(ABC):
+    """Cache of token counts, keyed by the fingerprint of an encoding and a content.
+
+    Subclasses store the entries, and evict the least recently used ones when their total size in bytes goes over
+    the maximum size.
+
+    Attributes:
+        max_size (int): The maximum total size of the entries in bytes.
+        min_length (int): Strings shorter than this are not cached, even if the token counter would cache them,
+            since a lookup in the storage costs more than encoding them.
+        hits (int): The number of lookups that found an entry.
+        misses (int): The number of lookups that did not find an entry.
+        evictions (int): The number of entries evicted to make room for new ones.
+    """
+
+    def __init__(self, max_size: int, min_length: int = 0) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_size (int): The maximum total size of the entries in bytes.
+            min_length (int): The length of the shortest strings to cache.
+        """
+        self.max_size = max_size
+        self.min_length = min_length
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = Lock()
+
+    def get(self, key: str) -> Optional[int]:
+        """Get a token count and mark it as recently used.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+
+        Returns:
+            Optional[int]: The token count, or None if it is not cached.
+        """
+        tokens = self._get(key)
+        with self._stats_lock:
+            if tokens is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return tokens
+
+    def put(self, key: str, tokens: int) -> None:
+        """Add a token count, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+            tokens (int): The token count.
+        """
+        evicted = self._put(key, tokens)
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def info(self) -> TokenCacheInfo:
+        """Get the statistics of the cache.
+
+        Returns:
+            TokenCacheInfo: The hits, misses, evictions, entries, size and maximum size of the cache.
+        """
+        entries, size = self._usage()
+        return TokenCacheInfo(
+            self.hits, self.misses, self.evictions, entries, size, self.max_size
+        )
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all the entries."""
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[int]:
+        """Get a token count from the storage and mark it as recently used.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+        """
+
+    @abstractmethod
+    def _put(self, key: str, tokens: int) -> int:
+        """Add a token count to the storage.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+            tokens (int): The token count.
+        """
+
+    @abstractmethod
+    def _usage(self) -> tuple[int, int]:
+        """Get the number of entries and their total size in bytes."""
+
+
+class MemoryTokenCountCache(TokenCountCache):
+    """Token count cache in the memory of the process."""
+
+    def __init__(self, max_size: int = 16 * 1024 * 1024) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_size (int): The maximum total size of the entries in bytes.
+        """
+        super().__init__(max_size)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def clear(self) -> None:
+        """Remove all the entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _get(self, key: str) -> Optional[int]:
+        """Get a token count and mark it as recently used.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+
+        Returns:
+            Optional[int]: The token count, or None if it is not cached.
+        """
+        with self._lock:
+            tokens = self._entries.get(key)
+            if tokens is not None:
+                self._entries.move_to_end(key)
+            return tokens
+
+    def _put(self, key: str, tokens: int) -> int:
+        """Add a token count, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+            tokens (int): The token count.
+
+        Returns:
+            int: The number of evicted entries.
+        """
+        evicted = 0
+        with self._lock:
+            if key not in self._entries:
+                self._size += _memory_entry_size(key, tokens)
+            self._entries[key] = tokens
+            self._entries.move_to_end(key)
+
+            while self._size > self.max_size and self._entries:
+                evicted_key, evicted_tokens = self._entries.popitem(last=False)
+                self._size -= _memory_entry_size(evicted_key, evicted_tokens)
+                evicted += 1
+
+        return evicted
+
+    def _usage(self) -> tuple[int, int]:
+        """Get the number of entries and their total size in bytes.
+
+        Returns:
+            tuple[int, int]: The number of entries and their total size.
+        """
+        with self._lock:
+            return len(self._entries), self._size
+
+
+def _memory_entry_size(key: str, tokens: int) -> int:
+    """Get the size in bytes of an in memory cache entry.
+
+    Args:
+        key (str): The key of the entry.
+        tokens (int): The token count of the entry.
+
+    Returns:
+        int: The size of the key and the token count objects.
+    """
+    return sys.getsizeof(key) + sys.getsizeof(tokens)
+
+
+class SQLiteTokenCountCache(TokenCountCache):
+    """Token count cache in an SQLite file, which can be shared by the processes of a host.
+
+    Each process and thread opens its own connection, so the cache can be created before forking workers.
+    The statistics count the lookups of the current process only. Marking an entry as used is a write, which
+    takes the lock of the file, so it is done at most once per touch_interval and the order of eviction is only
+    that precise.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 256 * 1024 * 1024,
+        min_length: int = SQLITE_MIN_LENGTH,
+        touch_interval: float = 60.0,
+    ) -> None:
+        """Open or create a cache file.
+
+        Args:
+            path (str): The path of the SQLite file.
+            max_size (int): The maximum total size of the entries in bytes.
+            min_length (int): The length of the shortest strings to cache.
+            touch_interval (float): The least number of seconds between two updates of the last use of an entry.
+        """
+        super().__init__(max_size, min_length)
+        self.path = path
+        self.touch_interval = touch_interval
+        self._local = local()
+
+        connection = self._connection()
+        with connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY, tokens INTEGER NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+                CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER, size INTEGER);
+                INSERT OR IGNORE INTO usage VALUES (0, 0, 0);
+                CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                    UPDATE usage SET entries = entries + 1, size = size + new.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                    UPDATE usage SET entries = entries - 1, size = size - old.size;
+                END;
+                """
+            )
+
+    def clear(self) -> None:
+        """Remove all the entries."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM entries")
+
+    def _connection(self) -> "sqlite3.Connection":
+        """Get the connection of the current process and thread.
+
+        Returns:
+            sqlite3.Connection: The connection to the cache file.
+        """
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            import sqlite3
+
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = pid
+        return cast("sqlite3.Connection", self._local.connection)
+
+    def _get(self, key: str) -> Optional[int]:
+        """Get a token count and mark it as recently used.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+
+        Returns:
+            Optional[int]: The token count, or None if it is not cached.
+        """
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT tokens, used FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        now = time.time_ns()
+        if now - row[1] >= self.touch_interval * 1e9:
+            with connection:
+                connection.execute(
+                    "UPDATE entries SET used = ? WHERE key = ?", (now, key)
+                )
+        return int(row[0])
+
+    def _put(self, key: str, tokens: int) -> int:
+        """Add a token count, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The fingerprint of the encoding and the content.
+            tokens (int): The token count.
+
+        Returns:
+            int: The number of evicted entries.
+        """
+        # A key identifies the content, so an existing entry always has the same token count
+        size = len(key) + 8
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)",
+                (key, tokens, size, time.time_ns()),
+            )
+            [excess] = connection.execute(
+                "SELECT size - ? FROM usage", (self.max_size,)
+            ).fetchone()
+            if excess <= 0:
+                return 0
+
+            cursor = connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used LIMIT ?)",
+                (-(-excess // size),),
+            )
+            return cursor.rowcount
+
+    def _usage(self) -> tuple[int, int]:
+        """Get the number of entries and their total size in bytes.
+
+        Returns:
+            tuple[int, int]: The number of entries and their total size.
+        """
+        entries, size = (
+            self._connection().execute("SELECT entries, size FROM usage").fetchone()
+        )
+        return int(entries), int(size)
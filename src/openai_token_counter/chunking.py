@@ -0,0 +1,284 @@
+"""Token-aware chunking of large texts.
+
+Like a streamed completion, a text is read a window at a time and split into the pieces of the encoding pattern, and
+every piece but the last ones of the window is final, so the text is never held or encoded whole. A chunk is made of
+whole pieces, and the token count of a text is the sum of the token counts of its pieces, so the count of a chunk is
+the sum of the counts of its pieces and equal to the count of its text. The exception is a run of whitespace at the end
+of a chunk: the pattern splits whitespace differently before the end of a text than before the text that followed it
+in the document, so the run is counted again as the end of the chunk. A piece with more tokens than a chunk, such as
+a long run of whitespace or a blob without spaces, is cut at character boundaries into parts counted on their own,
+and every part, and the piece after the last one, starts a chunk.
+"""
+import codecs
+import mmap
+import os
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import accumulate
+from typing import NamedTuple, Optional, Union
+
+import regex
+from tiktoken import Encoding
+
+from .completion import TAIL_PIECES
+from .token_counter import TokenCounter, get_token_counter
+
+
+# The number of characters of a string, or bytes of a file, split into pieces at a time
+WINDOW_SIZE = 1 << 16
+# The most pieces whose token count is kept while chunking a text
+PIECE_CACHE_SIZE = 1 << 16
+
+Source = Union[str, "os.PathLike[str]", mmap.mmap]
+
+
+class TextChunk(NamedTuple):
+    """A chunk of a text.
+
+    Attributes:
+        text (str): The text of the chunk, starting with the overlap with the previous chunk.
+        token_count (int): The token count of the text.
+    """
+
+    text: str
+    token_count: int
+
+
+def chunk_text(
+    source: Source,
+    max_tokens: int,
+    overlap: int = 0,
+    token_counter: Optional[TokenCounter] = None,
+    window_size: int = WINDOW_SIZE,
+) -> Iterator[TextChunk]:
+    """Split a text into chunks of at most a number of tokens.
+
+    The memory used is bounded by the size of a chunk and of a window, whatever the size of the text. Files are
+    memory-mapped and decoded as UTF-8.
+
+    Args:
+        source (Source): The text, the path of a text file, or a memory-mapped text file, read from its start.
+        max_tokens (int): The most tokens of a chunk.
+        overlap (int): The most tokens at the end of a chunk repeated at the start of the next one. The overlap is
+            made of whole pieces, so it can be shorter.
+        token_counter (Optional[TokenCounter]): The token counter whose encoding is used. Defaults to the shared
+            counter for the cl100k_base encoding.
+        window_size (int): The number of characters of a string, or bytes of a file, read at a time. A piece longer
+            than a window is final once it is read, so its count and the count of its chunk can differ by a token
+            from a count of the whole text.
+
+    Yields:
+        TextChunk: The chunks of the text, in order, with their token count.
+
+    Raises:
+        ValueError: If max_tokens is not positive, or the overlap is not smaller than max_tokens.
+    """
+    if max_tokens < 1:
+        raise ValueError(f"max_tokens must be positive, got {max_tokens}")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError(f"overlap must be in [0, {max_tokens}), got {overlap}")
+
+    encoding = (token_counter or get_token_counter()).encoding
+    pattern = regex.compile(encoding._pat_str)
+
+    pieces = _pieces(_windows(source, window_size), pattern, window_size)
+
+    units: deque[tuple[str, int]] = deque()
+    tokens = 0
+    # Whether the chunk has units after the overlap with the previous chunk
+    fresh = False
+    for unit, count, start in _units(pieces, max_tokens, encoding):
+        if start or tokens + count > max_tokens:
+            if fresh:
+                yield _chunk(units, tokens, encoding)
+                fresh = False
+            while units and (start or tokens > overlap or tokens + count > max_tokens):
+                tokens -= units.popleft()[1]
+
+        units.append((unit, count))
+        tokens += count
+        fresh = True
+
+    if fresh:
+        yield _chunk(units, tokens, encoding)
+
+
+def _chunk(
+    units: Iterable[tuple[str, int]], tokens: int, encoding: Encoding
+) -> TextChunk:
+    """Join the units of a chunk, and count the run of whitespace at its end as the end of a text.
+
+    Args:
+        units (Iterable[tuple[str, int]]): The pieces and parts of the chunk and their token count in the document.
+        tokens (int): The token count of the units.
+        encoding (Encoding): The encoding.
+
+    Returns:
+        TextChunk: The chunk with the token count of its text.
+    """
+    texts = [text for text, _ in units]
+    counts = [count for _, count in units]
+
+    # The whitespace pieces before the end of a text are merged, where the last space before a word is split off
+    end = len(texts)
+    while end and texts[end - 1].isspace():
+        end -= 1
+    if end < len(texts):
+        tokens += len(encoding.encode_ordinary("".join(texts[end:]))) - sum(
+            counts[end:]
+        )
+
+    return TextChunk("".join(texts), tokens)
+
+
+def _units(
+    pieces: Iterable[str], max_tokens: int, encoding: Encoding
+) -> Iterator[tuple[str, int, bool]]:
+    """Count the pieces of a text, and cut the pieces with more tokens than a chunk into parts.
+
+    Args:
+        pieces (Iterable[str]): The pieces of the text.
+        max_tokens (int): The most tokens of a chunk.
+        encoding (Encoding): The encoding.
+
+    Yields:
+        tuple[str, int, bool]: The pieces and the parts of the cut pieces, their token count, and whether they start a
+            chunk. A part, and the piece after a cut piece, start a chunk since a part joined with the text around it
+            would be split differently.
+    """
+    encode_piece = encoding._encode_single_piece
+    # The token count of the pieces already seen, since the words of a text repeat
+    counts: dict[str, int] = {}
+    # Whether the previous piece was cut
+    cut = False
+
+    for piece in pieces:
+        count = counts.get(piece)
+        if count is None:
+            count = len(encode_piece(piece))
+            if len(counts) < PIECE_CACHE_SIZE:
+                counts[piece] = count
+
+        if count <= max_tokens:
+            yield piece, count, cut
+            cut = False
+        else:
+            for part, part_count in _parts(piece, max_tokens, encoding):
+                yield part, part_count, True
+            cut = True
+
+
+def _windows(source: Source, window_size: int) -> Iterator[str]:
+    """Read a text a window at a time.
+
+    Args:
+        source (Source): The text, the path of a text file, or a memory-mapped text file.
+        window_size (int): The number of characters of a string, or bytes of a file, read at a time.
+
+    Yields:
+        str: The windows of the text.
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), window_size):
+            yield source[start : start + window_size]
+        return
+
+    if isinstance(source, mmap.mmap):
+        yield from _mmap_windows(source, window_size)
+        return
+
+    with open(source, "rb") as file:
+        # An empty file can't be mapped
+        if not os.fstat(file.fileno()).st_size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from _mmap_windows(mapped, window_size)
+
+
+def _mmap_windows(mapped: mmap.mmap, window_size: int) -> Iterator[str]:
+    """Decode a memory-mapped UTF-8 file a window at a time.
+
+    Args:
+        mapped (mmap.mmap): The file.
+        window_size (int): The number of bytes decoded at a time.
+
+    Yields:
+        str: The windows of the text, whose characters may be cut between two windows of bytes.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(mapped), window_size):
+        yield decoder.decode(mapped[start : start + window_size])
+    yield decoder.decode(b"", final=True)
+
+
+def _pieces(
+    windows: Iterable[str], pattern: "regex.Pattern[str]", window_size: int
+) -> Iterator[str]:
+    """Split the windows of a text into the pieces of the encoding pattern.
+
+    Args:
+        windows (Iterable[str]): The windows of the text.
+        pattern (regex.Pattern[str]): The pattern of the encoding.
+        window_size (int): The longest a piece can be kept pending.
+
+    Yields:
+        str: The pieces of the text.
+    """
+    tail = ""
+    for window in windows:
+        pieces = pattern.findall(tail + window)
+        if not pieces:
+            continue
+        final, pending = pieces[:-TAIL_PIECES], pieces[-TAIL_PIECES:]
+        # The tail is bounded by making the pieces longer than a window final
+        if len(pending[-1]) > window_size:
+            final, pending = pieces, []
+        elif len(pending[0]) > window_size:
+            final, pending = pieces[:-1], pending[-1:]
+        tail = "".join(pending)
+        yield from final
+
+    yield from pattern.findall(tail)
+
+
+def _parts(
+    piece: str, max_tokens: int, encoding: Encoding
+) -> Iterator[tuple[str, int]]:
+    """Cut a piece into parts of at most a number of tokens.
+
+    Args:
+        piece (str): The piece, with more tokens than max_tokens.
+        max_tokens (int): The most tokens of a part, unless it is a single character.
+        encoding (Encoding): The encoding.
+
+    Yields:
+        tuple[str, int]: The parts of the piece and their token count.
+    """
+    tokens = encoding._encode_single_piece(piece)
+
+    # The piece is cut after the last whole character of every max_tokens tokens, and the parts are counted again
+    data = piece.encode("utf-8")
+    ends = list(
+        accumulate(len(encoding.decode_single_token_bytes(token)) for token in tokens)
+    )
+    start = 0
+    while start < len(data):
+        index = bisect_right(ends, start)
+        end = ends[min(index + max_tokens, len(ends)) - 1]
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        if end <= start:
+            end = start + 1
+            while end < len(data) and data[end] & 0xC0 == 0x80:
+                end += 1
+
+        part = data[start:end].decode("utf-8")
+        count = len(encoding.encode_ordinary(part))
+        # Counted alone, the part can take more tokens than it did in the piece
+        while count > max_tokens and len(part) > 1:
+            part = part[:-1]
+            count = len(encoding.encode_ordinary(part))
+
+        yield part, count
+        start += len(part.encode("utf-8"))
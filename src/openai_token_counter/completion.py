@@ -0,0 +1,159 @@
+"""Token counts of streamed chat completions.
+
+tiktoken splits a text into pieces with the pattern of the encoding, and encodes every piece on its own, so the
+token count of a text is the sum of the token counts of its pieces. Appending text to a stream can only change how
+its last pieces are split: a word, a number or a run of whitespace can continue, and a space before a word joins it.
+So every piece but the last ones is final, and is counted once. Only the last pieces are kept, and are split again
+with the next delta.
+
+A long run of a single piece, such as a word without spaces or a blob of CJK text, would be encoded again with every
+delta. BPE merges are local, so once the last piece is longer than MAX_PENDING_LENGTH, its tokens but the ones of
+its last PENDING_KEEP_BYTES bytes are made final, and only its end is kept pending. A merge across the cut is rare,
+and makes the count differ by a token from a count of the whole string.
+"""
+from collections.abc import Hashable, Mapping
+from typing import Any, Optional
+
+import regex
+
+from .token_counter import TokenCounter, get_token_counter
+
+
+# The number of pieces at the end of a stream that the next delta can still change
+TAIL_PIECES = 2
+# The longest a piece at the end of a stream is kept pending whole, in characters
+MAX_PENDING_LENGTH = 256
+# The bytes at the end of a long piece whose tokens are kept pending
+PENDING_KEEP_BYTES = 64
+
+
+class CompletionTokenCounter:
+    """Token counter for a chat completion streamed as server-sent events.
+
+    The chunks are added as they arrive, and the token count is kept up to date without encoding the completion
+    again. The content, the function call and every tool call of every choice are counted as separate strings, like
+    the strings of the prompt.
+
+    Attributes:
+        token_counter (TokenCounter): The token counter whose encoding is used.
+    """
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None) -> None:
+        """Create a counter for a completion.
+
+        Args:
+            token_counter (Optional[TokenCounter]): The token counter of the model of the completion. Defaults to
+                the shared counter for the cl100k_base encoding.
+        """
+        self.token_counter = token_counter or get_token_counter()
+        encoding = self.token_counter.encoding
+        self._pattern = regex.compile(encoding._pat_str)
+        self._encode_piece = encoding._encode_single_piece
+        self._token_bytes = encoding.decode_single_token_bytes
+
+        # The unfinished pieces of each string and their token count
+        self._tails: dict[Hashable, tuple[str, int]] = {}
+        self._token_count = 0
+
+    @property
+    def token_count(self) -> int:
+        """The token count of the completion streamed so far.
+
+        Returns:
+            int: The token count, equal to the count of the complete strings when the stream ends.
+        """
+        return self._token_count
+
+    def add_chunk(self, chunk: Mapping[str, Any]) -> int:
+        """Add a chunk of the stream.
+
+        Args:
+            chunk (Mapping[str, Any]): The parsed JSON data of a server-sent event, with its choices.
+
+        Returns:
+            int: The token count of the completion streamed so far.
+        """
+        for choice in chunk.get("choices") or ():
+            self.add_delta(choice.get("delta") or {}, choice.get("index", 0))
+        return self._token_count
+
+    def add_delta(self, delta: Mapping[str, Any], choice: int = 0) -> int:
+        """Add the delta of a choice.
+
+        Args:
+            delta (Mapping[str, Any]): The delta, with content, function_call or tool_calls fragments.
+            choice (int): The index of the choice.
+
+        Returns:
+            int: The token count of the completion streamed so far.
+        """
+        content = delta.get("content")
+        if content:
+            self.add_text(content, (choice, "content"))
+
+        function_call = delta.get("function_call")
+        if function_call:
+            for field in ("name", "arguments"):
+                if function_call.get(field):
+                    self.add_text(
+                        function_call[field], (choice, "function_call", field)
+                    )
+
+        for tool_call in delta.get("tool_calls") or ():
+            function = tool_call.get("function") or {}
+            for field in ("name", "arguments"):
+                if function.get(field):
+                    key = (choice, "tool_calls", tool_call.get("index", 0), field)
+                    self.add_text(function[field], key)
+
+        return self._token_count
+
+    def add_text(self, text: str, key: Hashable = "content") -> int:
+        """Add a fragment of text to a string of the completion.
+
+        Args:
+            text (str): The fragment.
+            key (Hashable): The string the fragment belongs to. Each string is split and counted on its own.
+
+        Returns:
+            int: The token count of the completion streamed so far.
+        """
+        tail, tail_tokens = self._tails.get(key, ("", 0))
+        pieces = self._pattern.findall(tail + text)
+
+        final, pending = pieces[:-TAIL_PIECES], pieces[-TAIL_PIECES:]
+        final_tokens = 0
+        # The tail is bounded by making the long pieces final, but for the end of the last one
+        if pending and len(pending[-1]) > MAX_PENDING_LENGTH:
+            final_tokens, end = self._cut(pending[-1])
+            final, pending = pieces[:-1], [end]
+        elif pending and len(pending[0]) > MAX_PENDING_LENGTH:
+            final, pending = pieces[:-1], pending[-1:]
+        final_tokens += sum(len(self._encode_piece(piece)) for piece in final)
+        pending_tokens = sum(len(self._encode_piece(piece)) for piece in pending)
+
+        self._tails[key] = ("".join(pending), pending_tokens)
+        self._token_count += final_tokens + pending_tokens - tail_tokens
+        return self._token_count
+
+    def _cut(self, piece: str) -> tuple[int, str]:
+        """Cut the end of a long piece off its start, at a token boundary.
+
+        Args:
+            piece (str): The piece.
+
+        Returns:
+            tuple[int, str]: The token count of the start of the piece, and its end, of at least PENDING_KEEP_BYTES
+                bytes and starting at a character boundary.
+        """
+        data = piece.encode("utf-8", errors="surrogatepass")
+        tokens = self._encode_piece(data)
+        start = len(data)
+        count = len(tokens)
+        while count and (
+            len(data) - start < PENDING_KEEP_BYTES
+            or (start < len(data) and data[start] & 0xC0 == 0x80)
+        ):
+            count -= 1
+            start -= len(self._token_bytes(tokens[count]))
+        return count, data[start:].decode("utf-8", errors="surrogatepass")
@@ -0,0 +1,203 @@
+from bisect import bisect_left, insort
+from typing import Any, Literal, Mapping, Optional, Union
+
+from .models import OpenAIFunction, OpenAIMessage
+from .token_counter import TokenCounter, _reject_streamed_content, get_token_counter
+
+
+class ConversationTokenCounter:
+    """Token counter for a conversation that is updated one message at a time.
+
+    The token count of each message is kept, so every update only encodes the messages it adds or replaces,
+    and the running total always matches a full count of the conversation with TokenCounter.estimate_token_count.
+
+    Attributes:
+        token_counter (TokenCounter): The token counter used to count the messages.
+    """
+
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        messages: Optional[list[OpenAIMessage]] = None,
+        functions: Optional[list[OpenAIFunction]] = None,
+        function_call: Optional[Union[str, Mapping[Literal["name"], Any]]] = None,
+    ) -> None:
+        """Create a conversation token counter.
+
+        Args:
+            token_counter (Optional[TokenCounter]): The token counter to use. Defaults to the shared counter for
+                the cl100k_base encoding.
+            messages (Optional[list[OpenAIMessage]]): The initial messages of the conversation.
+            functions (Optional[list[OpenAIFunction]]): The functions of the conversation.
+            function_call (Optional[Union[str, Mapping[Literal["name"], Any]]]): The function call of the
+                conversation.
+        """
+        self.token_counter = token_counter or get_token_counter()
+
+        self._messages: list[OpenAIMessage] = []
+        self._tokens: list[int] = []
+        # The token count of each message with the system message padding, computed when it is needed
+        self._padded_tokens: list[Optional[int]] = []
+        self._messages_tokens = 0
+        self._system_indices: list[int] = []
+
+        self._functions_tokens = (
+            self.token_counter.estimate_tokens_in_functions(functions)
+            if functions
+            else None
+        )
+        self._overhead: dict[bool, int] = {}
+        for has_system in (False, True):
+            strings, tokens = self.token_counter._request_overhead_parts(
+                self._functions_tokens, function_call, has_system
+            )
+            self._overhead[has_system] = tokens + sum(
+                self.token_counter.string_tokens(string) for string in strings
+            )
+
+        self.extend(messages or [])
+
+    @property
+    def messages(self) -> list[OpenAIMessage]:
+        """The messages of the conversation.
+
+        Returns:
+            list[OpenAIMessage]: A copy of the list of messages.
+        """
+        return list(self._messages)
+
+    @property
+    def token_count(self) -> int:
+        """The number of tokens a prompt with the conversation will use.
+
+        Returns:
+            int: The estimated token count, equal to a full count with TokenCounter.estimate_token_count.
+        """
+        tokens = self._messages_tokens + self._overhead[bool(self._system_indices)]
+
+        if self._functions_tokens is not None and self._system_indices:
+            index = self._system_indices[0]
+            padded_tokens = self._padded_tokens[index]
+            if padded_tokens is None:
+                padded_tokens = self.token_counter.estimate_tokens_in_messages(
+                    self._messages[index], pad=True
+                )
+                self._padded_tokens[index] = padded_tokens
+            tokens += padded_tokens - self._tokens[index]
+
+        return tokens
+
+    def message_tokens(self, index: int) -> int:
+        """Get the token count of a single message, without the system message padding.
+
+        Args:
+            index (int): The index of the message.
+
+        Returns:
+            int: The token count of the message.
+        """
+        return self._tokens[index]
+
+    def __len__(self) -> int:
+        """Get the number of messages in the conversation.
+
+        Returns:
+            int: The number of messages.
+        """
+        return len(self._messages)
+
+    def append(self, message: OpenAIMessage) -> int:
+        """Add a message at the end of the conversation.
+
+        Args:
+            message (OpenAIMessage): The message to add.
+
+        Returns:
+            int: The token count of the conversation after the update.
+        """
+        _reject_streamed_content([message], "counted in a conversation")
+        tokens = self.token_counter.estimate_tokens_in_messages(message)
+        if message.role == "system":
+            self._system_indices.append(len(self._messages))
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self._padded_tokens.append(None)
+        self._messages_tokens += tokens
+        return self.token_count
+
+    def extend(self, messages: list[OpenAIMessage]) -> int:
+        """Add messages at the end of the conversation.
+
+        Args:
+            messages (list[OpenAIMessage]): The messages to add.
+
+        Returns:
+            int: The token count of the conversation after the update.
+        """
+        for message in messages:
+            self.append(message)
+        return self.token_count
+
+    def pop(self, index: int = -1) -> OpenAIMessage:
+        """Remove a message from the conversation.
+
+        Args:
+            index (int): The index of the message to remove. Defaults to the last message.
+
+        Returns:
+            OpenAIMessage: The removed message.
+        """
+        index = range(len(self._messages))[index]
+        message = self._messages.pop(index)
+        self._messages_tokens -= self._tokens.pop(index)
+        del self._padded_tokens[index]
+
+        if message.role == "system":
+            del self._system_indices[bisect_left(self._system_indices, index)]
+        position = bisect_left(self._system_indices, index)
+        for system_position in range(position, len(self._system_indices)):
+            self._system_indices[system_position] -= 1
+
+        return message
+
+    def replace(self, index: int, message: OpenAIMessage) -> int:
+        """Replace a message of the conversation.
+
+        Args:
+            index (int): The index of the message to replace.
+            message (OpenAIMessage): The new message.
+
+        Returns:
+            int: The token count of the conversation after the update.
+        """
+        _reject_streamed_content([message], "counted in a conversation")
+        index = range(len(self._messages))[index]
+        tokens = self.token_counter.estimate_tokens_in_messages(message)
+
+        if self._messages[index].role == "system":
+            del self._system_indices[bisect_left(self._system_indices, index)]
+        if message.role == "system":
+            insort(self._system_indices, index)
+
+        self._messages[index] = message
+        self._messages_tokens += tokens - self._tokens[index]
+        self._tokens[index] = tokens
+        self._padded_tokens[index] = None
+        return self.token_count
+
+    def truncate(self, length: int) -> int:
+        """Keep only the first messages of the conversation.
+
+        Args:
+            length (int): The number of messages to keep.
+
+        Returns:
+            int: The token count of the conversation after the update.
+        """
+        length = max(length, 0)
+        self._messages_tokens -= sum(self._tokens[length:])
+        del self._messages[length:]
+        del self._tokens[length:]
+        del self._padded_tokens[length:]
+        del self._system_indices[bisect_left(self._system_indices, length) :]
+        return self.token_count
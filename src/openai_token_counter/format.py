@@ -1,3 +1,5 @@
+from typing import Callable
+
 from openai_token_counter.models import (
     ArrayProp,
     BoolProp,
@@ -13,35 +15,37 @@ from openai_token_counter.models import (
 def format_function_definitions(functions: list[OpenAIFunction]) -> str:
     """Format the function definitions to a string.
 
+    The definitions are written to a single buffer in one pass, so nested objects are not copied again
+    at every level of nesting.
+
     Args:
         functions (list[OpenAIFunction]): The list of functions to format.
 
     Returns:
         str: The formatted string.
     """
-    lines = ["namespace functions {", ""]
+    buffer: list[str] = ["namespace functions {\n\n"]
+    write = buffer.append
 
     for f in functions:
         if f.description:
-            lines.append(f"// {f.description}")
+            write(f"// {f.description}\n")
 
         parameters = f.parameters
         properties = parameters.properties if parameters else {}
 
-        if properties is None:
-            lines.append(f"type {f.name} = () => any;")
-        elif len(properties) == 0:
-            lines.append(f"type {f.name} = () => any;")
+        if not properties:
+            write(f"type {f.name} = () => any;\n")
 
         else:
-            lines.append(f"type {f.name} = (_: " + "{")
-            lines.append(format_object_properties(f.parameters, 0))
-            lines.append("}) => any;")
+            write(f"type {f.name} = (_: " + "{\n")
+            write_object_properties(write, f.parameters, 0)
+            write("\n}) => any;\n")
 
-        lines.append("")
+        write("\n")
 
-    lines.append("} // namespace functions")
-    return "\n".join(lines)
+    write("} // namespace functions")
+    return "".join(buffer)
 
 
 def format_object_properties(obj: ObjectProp, indent: int) -> str:
@@ -54,55 +58,89 @@ def format_object_properties(obj: ObjectProp, indent: int) -> str:
     Returns:
         str: The formatted string.
     """
-    if obj.properties is None:
-        return ""
+    buffer: list[str] = []
+    write_object_properties(buffer.append, obj, indent)
+    return "".join(buffer)
+
+
+def format_type(param: PropItem, indent: int) -> str:
+    """Format the type to a string.
+
+    Args:
+        param (PropItem): The parameter to format.
+        indent (int): The indentation level.
+
+    Returns:
+        str: The formatted string.
+    """
+    buffer: list[str] = []
+    write_type(buffer.append, param, indent)
+    return "".join(buffer)
+
 
-    lines = []
+def write_object_properties(
+    write: Callable[[str], None], obj: ObjectProp, indent: int
+) -> None:
+    """Write the object properties to a buffer.
 
-    required_params = obj.required or []
+    Args:
+        write (Callable[[str], None]): The function that appends to the buffer.
+        obj (ObjectProp): The object to format.
+        indent (int): The indentation level.
+    """
+    if obj.properties is None:
+        return
+
+    prefix = " " * indent
+    required_params = set(obj.required or [])
+    separator = ""
 
     for name, param in obj.properties.items():
         if param.description and indent < 2:
-            lines.append(f"// {param.description}")
-
-        if name in required_params:
-            lines.append(f"{name}: {format_type(param, indent)},")
-        else:
-            lines.append(f"{name}?: {format_type(param, indent)},")
+            write(f"{separator}{prefix}// {param.description}")
+            separator = "\n"
 
-    return "\n".join([(" " * indent + line) for line in lines])
+        question = "" if name in required_params else "?"
+        write(f"{separator}{prefix}{name}{question}: ")
+        write_type(write, param, indent)
+        write(",")
+        separator = "\n"
 
 
-def format_type(param: PropItem, indent: int) -> str:
-    """Format the type to a string.
+def write_type(write: Callable[[str], None], param: PropItem, indent: int) -> None:
+    """Write the type to a buffer.
 
     Args:
+        write (Callable[[str], None]): The function that appends to the buffer.
         param (PropItem): The parameter to format.
         indent (int): The indentation level.
-
-    Returns:
-        str: The formatted string.
     """
     if isinstance(param, StringProp):
         if param.enum:
-            return " | ".join(f'"{v}"' for v in param.enum)  # noqa: B907
-        return "string"
+            write(" | ".join(f'"{v}"' for v in param.enum))  # noqa: B907
+        else:
+            write("string")
 
-    if isinstance(param, NumberProp):
+    elif isinstance(param, NumberProp):
         if param.enum:
-            return " | ".join(str(v) for v in param.enum)
-        return "number"
+            write(" | ".join(str(v) for v in param.enum))
+        else:
+            write("number")
 
-    if isinstance(param, BoolProp):
-        return "boolean"
+    elif isinstance(param, BoolProp):
+        write("boolean")
 
-    if isinstance(param, NullProp):
-        return "null"
+    elif isinstance(param, NullProp):
+        write("null")
 
-    if isinstance(param, ArrayProp):
+    elif isinstance(param, ArrayProp):
         if param.items:
-            return f"{format_type(param.items, indent)}[]"
-        return "any[]"
+            write_type(write, param.items, indent)
+            write("[]")
+        else:
+            write("any[]")
 
-    if isinstance(param, ObjectProp):
-        return "{\n" + format_object_properties(param, indent + 2) + "\n}"
+    elif isinstance(param, ObjectProp):
+        write("{\n")
+        write_object_properties(write, param, indent + 2)
+        write("\n}")
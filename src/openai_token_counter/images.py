@@ -0,0 +1,216 @@
+"""Token counts of the image parts of messages.
+
+The token count of an image depends on its size and detail. A low detail image costs a fixed number of tokens. A
+high or auto detail image is scaled to fit in a 2048 x 2048 square, then down so its shortest side is at most 768,
+and costs a fixed number of tokens plus a number per 512 x 512 tile it covers.
+
+The size of a base64 data URL image is read from its PNG, JPEG, GIF or WebP header. Base64 maps every 3 bytes to 4
+characters, so the header bytes are decoded from the characters that cover them, without decoding the image. Images
+given by an http URL, or whose header can't be read, are counted as the largest image the tiling allows.
+"""
+import base64
+import binascii
+import math
+import struct
+from typing import Callable, Optional
+
+from .registry import ModelSpec
+
+
+# The most tiles an image can cover after scaling, for an image whose size is unknown
+MAX_TILES = 8
+
+# A JPEG image has its size in a start of frame segment, which comes after segments of metadata
+# The markers C4, C8 and CC in the range are the Huffman table, the reserved and the arithmetic coding segments
+_JPEG_START_OF_FRAME = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# The JPEG markers that are not followed by a segment length
+_JPEG_STANDALONE = {0x01, *range(0xD0, 0xD9)}
+# The number of JPEG segments skipped looking for the size before giving up
+_JPEG_MAX_SEGMENTS = 256
+
+
+def image_tokens(
+    width: Optional[int], height: Optional[int], detail: Optional[str], spec: ModelSpec
+) -> int:
+    """Get the token count of an image.
+
+    Args:
+        width (Optional[int]): The width of the image, or None if it is unknown.
+        height (Optional[int]): The height of the image, or None if it is unknown.
+        detail (Optional[str]): The detail of the image part, "low", "high" or "auto". Defaults to "auto", which is
+            counted as "high".
+        spec (ModelSpec): The spec of the model, with the token cost of the images.
+
+    Returns:
+        int: The token count.
+    """
+    if detail == "low":
+        return spec.image_base_tokens
+
+    if not width or not height:
+        return spec.image_base_tokens + MAX_TILES * spec.image_tile_tokens
+
+    if width > 2048 or height > 2048:
+        aspect_ratio = width / height
+        if aspect_ratio > 1:
+            width, height = 2048, int(2048 / aspect_ratio)
+        else:
+            width, height = int(2048 * aspect_ratio), 2048
+
+    if width >= height and height > 768:
+        width, height = int((768 / height) * width), 768
+    elif height > width and width > 768:
+        width, height = 768, int((768 / width) * height)
+
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return spec.image_base_tokens + tiles * spec.image_tile_tokens
+
+
+def image_url_size(url: str) -> Optional[tuple[int, int]]:
+    """Get the size of the image of a base64 data URL from its header.
+
+    Args:
+        url (str): The URL of the image.
+
+    Returns:
+        Optional[tuple[int, int]]: The width and the height, or None if the URL is not a base64 data URL of a PNG,
+            JPEG, GIF or WebP image.
+    """
+    if not url.startswith("data:"):
+        return None
+
+    # The payload is read in place, since slicing it off would copy the whole image
+    comma = url.find(",", 0, 256)
+    if comma < 0 or not url.endswith(";base64", 0, comma):
+        return None
+
+    return image_size(_base64_reader(url, comma + 1))
+
+
+def image_size(read: Callable[[int, int], bytes]) -> Optional[tuple[int, int]]:
+    """Get the size of an image from its header.
+
+    Args:
+        read (Callable[[int, int], bytes]): Reads the bytes of the image at an offset and of a size, or fewer if the
+            image ends before.
+
+    Returns:
+        Optional[tuple[int, int]]: The width and the height, or None if the image is not a PNG, JPEG, GIF or WebP
+            image.
+    """
+    head = read(0, 30)
+
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR" and len(head) >= 24:
+        width, height = struct.unpack_from(">II", head, 16)
+        return width, height
+
+    if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        width, height = struct.unpack_from("<HH", head, 6)
+        return width, height
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_size(head)
+
+    if head[:2] == b"\xff\xd8":
+        return _jpeg_size(read)
+
+    return None
+
+
+def _webp_size(head: bytes) -> Optional[tuple[int, int]]:
+    """Get the size of a WebP image from its first chunk.
+
+    Args:
+        head (bytes): The first 30 bytes of the image.
+
+    Returns:
+        Optional[tuple[int, int]]: The width and the height, or None if the chunk is unknown or cut.
+    """
+    chunk = head[12:16]
+
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+
+    if len(head) < 30:
+        return None
+
+    if chunk == b"VP8 ":
+        width, height = struct.unpack_from("<HH", head, 26)
+        return width & 0x3FFF, height & 0x3FFF
+
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+
+    return None
+
+
+def _jpeg_size(read: Callable[[int, int], bytes]) -> Optional[tuple[int, int]]:
+    """Get the size of a JPEG image from its start of frame segment.
+
+    Only the marker and the length of each segment before it are read, so the metadata is skipped.
+
+    Args:
+        read (Callable[[int, int], bytes]): Reads the bytes of the image at an offset and of a size.
+
+    Returns:
+        Optional[tuple[int, int]]: The width and the height, or None if there is no start of frame segment.
+    """
+    offset = 2
+    for _ in range(_JPEG_MAX_SEGMENTS):
+        segment = read(offset, 9)
+        if len(segment) < 4 or segment[0] != 0xFF:
+            return None
+
+        marker = segment[1]
+        if marker == 0xFF:  # Fill byte before a marker
+            offset += 1
+        elif marker in _JPEG_STANDALONE:
+            offset += 2
+        elif marker in _JPEG_START_OF_FRAME:
+            if len(segment) < 9:
+                return None
+            height, width = struct.unpack_from(">HH", segment, 5)
+            return width, height
+        else:
+            offset += 2 + int.from_bytes(segment[2:4], "big")
+
+    return None
+
+
+def _base64_reader(text: str, start: int) -> Callable[[int, int], bytes]:
+    """Read the bytes of a base64 payload without decoding the rest of it.
+
+    Args:
+        text (str): The text with the base64 payload, without line breaks, up to its end.
+        start (int): The index of the payload in the text.
+
+    Returns:
+        Callable[[int, int], bytes]: Decodes the bytes at an offset and of a size, fewer at the end of the payload,
+            and none if the characters that cover them are not valid base64.
+    """
+
+    def read(offset: int, size: int) -> bytes:
+        """Decode the bytes of the payload at an offset.
+
+        Args:
+            offset (int): The offset of the bytes.
+            size (int): The number of bytes.
+
+        Returns:
+            bytes: The bytes.
+        """
+        first = start + offset // 3 * 4
+        chunk = text[first : start - (-(offset + size) // 3) * 4]
+        # The last group of the payload is padded when it is cut, a lone character can't be decoded
+        chunk = chunk[: len(chunk) - (len(chunk) % 4 == 1)]
+        try:
+            data = base64.b64decode(chunk + "=" * (-len(chunk) % 4), validate=True)
+        except binascii.Error:
+            return b""
+
+        return data[offset % 3 : offset % 3 + size]
+
+    return read
@@ -0,0 +1,107 @@
+"""Timings of the phases of a token count.
+
+A TokenCounter with ``metrics`` set reports each phase of its counts as a PhaseEvent: validating the request into
+the models, formatting the function definitions and encoding the strings. ``metrics`` is either a callback taking
+the event, or a MetricsSink with a ``record`` method, such as the PhaseMetrics aggregator. When it is not set, the
+phases are not timed at all.
+"""
+from threading import Lock
+from typing import Callable, Literal, NamedTuple, Protocol, Union
+
+
+Phase = Literal["validation", "formatting", "encoding"]
+
+
+class PhaseEvent(NamedTuple):
+    """A phase of a token count.
+
+    Attributes:
+        phase (Phase): The phase.
+        seconds (float): The time the phase took.
+        size (int): The characters encoded or formatted, or the bytes of the JSON body validated. 0 when
+            validating Python objects.
+        tokens (int): The tokens encoded. 0 for the other phases.
+    """
+
+    phase: Phase
+    seconds: float
+    size: int
+    tokens: int
+
+
+class MetricsSink(Protocol):
+    """A receiver of the phases of the token counts, such as an adapter to a metrics library."""
+
+    def record(self, event: PhaseEvent) -> None:
+        """Receive a phase of a token count.
+
+        Args:
+            event (PhaseEvent): The phase.
+        """
+
+
+Metrics = Union[MetricsSink, Callable[[PhaseEvent], None]]
+
+
+def emit(metrics: Metrics, event: PhaseEvent) -> None:
+    """Send a phase to a callback or a sink.
+
+    Args:
+        metrics (Metrics): The callback or the sink.
+        event (PhaseEvent): The phase.
+    """
+    record = getattr(metrics, "record", None)
+    if record is not None:
+        record(event)
+    else:
+        metrics(event)  # type: ignore[operator]
+
+
+class PhaseStats(NamedTuple):
+    """The totals of a phase."""
+
+    calls: int
+    seconds: float
+    size: int
+    tokens: int
+
+
+class PhaseMetrics:
+    """A thread-safe sink that sums the phases of the token counts.
+
+    ``token_counter.metrics = PhaseMetrics()`` then ``token_counter.metrics.summary()``.
+    """
+
+    def __init__(self) -> None:
+        """Create an aggregator with no phases recorded."""
+        self._totals: dict[str, PhaseStats] = {}
+        self._lock = Lock()
+
+    def record(self, event: PhaseEvent) -> None:
+        """Add a phase to the totals.
+
+        Args:
+            event (PhaseEvent): The phase.
+        """
+        with self._lock:
+            calls, seconds, size, tokens = self._totals.get(event.phase, (0, 0.0, 0, 0))
+            self._totals[event.phase] = PhaseStats(
+                calls + 1,
+                seconds + event.seconds,
+                size + event.size,
+                tokens + event.tokens,
+            )
+
+    def summary(self) -> dict[str, PhaseStats]:
+        """Get the totals of each phase recorded so far.
+
+        Returns:
+            dict[str, PhaseStats]: The totals, by phase.
+        """
+        with self._lock:
+            return dict(self._totals)
+
+    def reset(self) -> None:
+        """Forget the phases recorded so far."""
+        with self._lock:
+            self._totals.clear()
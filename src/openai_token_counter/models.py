@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Literal, Optional, Union
+from collections.abc import Iterator
+from typing import Annotated, Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, InstanceOf, TypeAdapter
 
 
 class StringProp(BaseModel):
@@ -54,7 +55,12 @@ class ObjectProp(BaseModel):
     properties: Optional[dict[str, PropItem]] = None
 
 
-PropItem = Union[StringProp, NumberProp, BoolProp, NullProp, ArrayProp, ObjectProp]
+# Discriminated on the type field, so each property is validated against a single model
+# instead of trying every member of the union
+PropItem = Annotated[
+    Union[StringProp, NumberProp, BoolProp, NullProp, ArrayProp, ObjectProp],
+    Field(discriminator="type"),
+]
 
 
 class OpenAIFunctionParameters(ObjectProp):
@@ -76,13 +82,68 @@ class OpenAIFunctionCall(BaseModel):
     arguments: str  # Json string
 
 
+class OpenAITool(BaseModel):
+    """This is the tool object for the OpenAI request, which wraps a function."""
+
+    type: Literal["function"] = "function"
+    function: OpenAIFunction
+
+
+class OpenAIToolCall(BaseModel):
+    """This is the tool call object that is used in assistant messages."""
+
+    id: Optional[str] = None
+    type: Literal["function"] = "function"
+    function: OpenAIFunctionCall
+
+
+class OpenAIToolChoice(BaseModel):
+    """This is the tool choice object that forces a call to the named function."""
+
+    type: Literal["function"] = "function"
+    function: dict[Literal["name"], str]
+
+
+class OpenAITextPart(BaseModel):
+    """This is the text part of a message content."""
+
+    type: Literal["text"]
+    text: str
+
+
+class OpenAIImageURL(BaseModel):
+    """This is the image of an image part, as an http URL or a base64 data URL."""
+
+    url: str
+    detail: Optional[Literal["auto", "low", "high"]] = None
+
+
+class OpenAIImagePart(BaseModel):
+    """This is the image part of a message content."""
+
+    type: Literal["image_url"]
+    image_url: OpenAIImageURL
+
+
+ContentPart = Annotated[
+    Union[OpenAITextPart, OpenAIImagePart], Field(discriminator="type")
+]
+
+
 class OpenAIMessage(BaseModel):
     """This is the message object for the OpenAI API."""
 
     role: str
-    content: Optional[str] = None  # Optional in case of] function response
+    # Optional in case of function response, and a list of parts for multimodal messages. An iterator of text chunks
+    # or a text file is counted as it is read, and can only be counted once. It is matched before the list, whose
+    # validation would consume it
+    content: Optional[Union[str, InstanceOf[Iterator[str]], list[ContentPart]]] = Field(
+        default=None, union_mode="left_to_right"
+    )
     name: Optional[str] = None
     function_call: Optional[OpenAIFunctionCall] = None
+    tool_calls: Optional[list[OpenAIToolCall]] = None
+    tool_call_id: Optional[str] = None  # The call a tool message responds to
 
 
 class OpenAIRequest(BaseModel):
@@ -99,3 +160,22 @@ class OpenAIRequest(BaseModel):
     function_call: Optional[
         Union[Literal["auto", "none"], dict[Literal["name"], str]]
     ] = None
+
+    # The tools API equivalents of functions and function_call, counted the same way
+    tools: Optional[list[OpenAITool]] = None
+    tool_choice: Optional[
+        Union[Literal["auto", "none", "required"], OpenAIToolChoice]
+    ] = None
+
+
+class OpenAIRequestBody(OpenAIRequest):
+    """This is the request body of the chat completions endpoint, with the fields the token counter uses."""
+
+    model: Optional[str] = None
+
+
+# Validators built once at import, for validating lists without a model around them
+request_adapter: TypeAdapter[OpenAIRequest] = TypeAdapter(OpenAIRequest)
+request_body_adapter: TypeAdapter[OpenAIRequestBody] = TypeAdapter(OpenAIRequestBody)
+requests_adapter: TypeAdapter[list[OpenAIRequest]] = TypeAdapter(list[OpenAIRequest])
+functions_adapter: TypeAdapter[list[OpenAIFunction]] = TypeAdapter(list[OpenAIFunction])
@@ -0,0 +1,170 @@
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from .cache import LRUCache
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """The encoding, context window and token overheads of a model.
+
+    Attributes:
+        encoding (str): The name of the tiktoken encoding of the model.
+        context_window (Optional[int]): The number of tokens of the prompt and the completion together, if known.
+        tokens_per_message (int): The tokens added for every message.
+        tokens_per_name (int): The tokens added for a message with a name.
+        tokens_per_function_call (int): The tokens added for a message with a function call.
+        tokens_per_tool_call (int): The tokens added for each tool call of a message.
+        function_role_tokens (int): The tokens added for a message with the function role.
+        tool_role_tokens (int): The tokens added for a message with the tool role.
+        reply_tokens (int): The tokens that prime the reply of the assistant.
+        functions_tokens (int): The tokens added to the formatted function definitions.
+        functions_system_tokens (int): The tokens added when there are functions and a system message.
+        function_call_none_tokens (int): The tokens added when function_call is "none".
+        function_call_name_tokens (int): The tokens added to the name when function_call names a function.
+        image_base_tokens (int): The tokens of a low detail image, and of a high detail image before its tiles.
+        image_tile_tokens (int): The tokens of each 512 x 512 tile of a high detail image.
+    """
+
+    encoding: str = field(default="cl100k_base")
+    context_window: Optional[int] = field(default=None)
+    tokens_per_message: int = field(default=3)
+    tokens_per_name: int = field(default=1)
+    tokens_per_function_call: int = field(default=3)
+    tokens_per_tool_call: int = field(default=3)
+    function_role_tokens: int = field(default=-2)
+    tool_role_tokens: int = field(default=-2)
+    reply_tokens: int = field(default=3)
+    functions_tokens: int = field(default=9)
+    functions_system_tokens: int = field(default=-4)
+    function_call_none_tokens: int = field(default=1)
+    function_call_name_tokens: int = field(default=4)
+    image_base_tokens: int = field(default=85)
+    image_tile_tokens: int = field(default=170)
+
+
+DEFAULT_MODEL_SPEC = ModelSpec()
+
+_O200K = ModelSpec(encoding="o200k_base", context_window=128000)
+_O200K_MINI = replace(_O200K, image_base_tokens=2833, image_tile_tokens=5667)
+
+# The built in models, looked up by exact name
+_models: dict[str, ModelSpec] = {
+    "gpt-4.1": replace(_O200K, context_window=1047576),
+    "gpt-4o": _O200K,
+    "gpt-4o-mini": _O200K_MINI,
+    "gpt-4-turbo": ModelSpec(context_window=128000),
+    "gpt-4-turbo-preview": ModelSpec(context_window=128000),
+    "gpt-4-1106-preview": ModelSpec(context_window=128000),
+    "gpt-4-0125-preview": ModelSpec(context_window=128000),
+    "gpt-4-vision-preview": ModelSpec(context_window=128000),
+    "gpt-4-32k": ModelSpec(context_window=32768),
+    "gpt-4": ModelSpec(context_window=8192),
+    "gpt-3.5-turbo": ModelSpec(context_window=16385),
+    "gpt-3.5-turbo-0301": ModelSpec(
+        context_window=4096, tokens_per_message=4, tokens_per_name=-1
+    ),
+    "gpt-3.5-turbo-0613": ModelSpec(context_window=4096),
+    "gpt-3.5-turbo-16k": ModelSpec(context_window=16385),
+}
+
+# The built in model families, looked up by the longest prefix of the name
+_model_prefixes: dict[str, ModelSpec] = {
+    "gpt-4.1-": replace(_O200K, context_window=1047576),
+    "gpt-4o-": _O200K,
+    "gpt-4o-mini-": _O200K_MINI,
+    "chatgpt-4o-": _O200K,
+    "gpt-4-turbo-": ModelSpec(context_window=128000),
+    "gpt-4-32k-": ModelSpec(context_window=32768),
+    "gpt-4-": ModelSpec(context_window=8192),
+    "gpt-3.5-turbo-": ModelSpec(context_window=16385),
+    "ft:gpt-4o-mini": _O200K_MINI,
+    "ft:gpt-4o": _O200K,
+    "ft:gpt-4": ModelSpec(context_window=8192),
+    "ft:gpt-3.5-turbo-0613": ModelSpec(context_window=4096),
+    "ft:gpt-3.5-turbo": ModelSpec(context_window=16385),
+}
+
+# The most model names whose spec is kept
+RESOLVED_CACHE_SIZE = 1024
+
+# The spec of the model names looked up recently, so a name is only resolved once. Unknown models are kept with the
+# default spec, and since their names can come from untrusted requests the cache is bounded.
+_resolved: LRUCache[str, ModelSpec] = LRUCache(RESOLVED_CACHE_SIZE)
+
+
+def register_model(name: str, spec: ModelSpec, prefix: bool = False) -> None:
+    """Register a model, or override a built in one.
+
+    The shared token counters are recreated by get_token_counter, so the spec applies to the counts made after
+    registering it. Counters created directly with TokenCounter keep the spec they resolved.
+
+    Args:
+        name (str): The model name, or the prefix of the model names.
+        spec (ModelSpec): The spec of the model.
+        prefix (bool): Whether the spec applies to every model name starting with the name.
+    """
+    if prefix:
+        _model_prefixes[name] = spec
+    else:
+        _models[name] = spec
+    _resolved.clear()
+
+    from .token_counter import _token_counters
+
+    _token_counters.clear()
+
+
+def get_model_spec(model: Optional[str] = None) -> ModelSpec:
+    """Get the spec of a model.
+
+    The model is looked up by exact name, then by the longest registered prefix, then in the models known to
+    tiktoken. Unknown models get the default spec, with the cl100k_base encoding and no context window.
+
+    Args:
+        model (Optional[str]): The model name. Defaults to the default spec.
+
+    Returns:
+        ModelSpec: The spec of the model.
+    """
+    if not model:
+        return DEFAULT_MODEL_SPEC
+
+    spec = _resolved.get(model)
+    if spec is None:
+        spec = _resolved.setdefault(model, _resolve_model_spec(model))
+
+    return spec
+
+
+def _resolve_model_spec(model: str) -> ModelSpec:
+    """Look up the spec of a model in the registered and the tiktoken models.
+
+    Args:
+        model (str): The model name.
+
+    Returns:
+        ModelSpec: The spec of the model.
+    """
+    spec = _models.get(model)
+    if spec is not None:
+        return spec
+
+    prefixes = [prefix for prefix in _model_prefixes if model.startswith(prefix)]
+    if prefixes:
+        return _model_prefixes[max(prefixes, key=len)]
+
+    from tiktoken.model import MODEL_PREFIX_TO_ENCODING, MODEL_TO_ENCODING
+
+    encoding = MODEL_TO_ENCODING.get(model) or next(
+        (
+            encoding
+            for prefix, encoding in MODEL_PREFIX_TO_ENCODING.items()
+            if model.startswith(prefix)
+        ),
+        None,
+    )
+    if encoding is not None:
+        return ModelSpec(encoding=encoding)
+
+    return DEFAULT_MODEL_SPEC
@@ -1,12 +1,62 @@
-from copy import deepcopy
+from __future__ import annotations
+
+import io
+import json
+import os
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
-from typing import Optional
+from functools import cached_property, partial
+from importlib.util import find_spec
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Literal, Mapping, NamedTuple, Optional, Union
+
+from .approximate import TokenBound, get_token_bound
+from .cache import LRUCache, TokenCountCache, fingerprint
+from .images import image_tokens, image_url_size
+from .instrumentation import Metrics, Phase, PhaseEvent, emit
+from .registry import DEFAULT_MODEL_SPEC, ModelSpec, get_model_spec
+
+
+# tiktoken and the models are imported on first use, so importing the package stays cheap
+if TYPE_CHECKING:
+    from tiktoken import Encoding
+
+    from .async_counter import AsyncTokenCounter
+    from .models import OpenAIFunction, OpenAIMessage, OpenAIRequest, OpenAIToolChoice
+
+
+# Strings shorter than this are encoded inline by the batch counter instead of on the thread pool
+BATCH_INLINE_MAX_LENGTH = 1024
+
+# Strings at least this long are counted without materialising their tokens as a Python list
+COUNT_ONLY_MIN_LENGTH = 1024
+
+# The most strings shorter than string_cache_min_length whose token count a counter keeps, since the role names,
+# system prompts and tool results of requests repeat
+SHORT_STRING_CACHE_SIZE = 4096
+
+# Text files given as message content are read this many characters at a time
+STREAM_READ_SIZE = 1 << 16
 
-from tiktoken import encoding_for_model, get_encoding
+# The environment variable with the default encoding bundle directory
+ENCODING_DIR_ENV = "OPENAI_TOKEN_COUNTER_ENCODING_DIR"
 
-from openai_token_counter.format import format_function_definitions
 
-from .models import OpenAIFunction, OpenAIMessage, OpenAIRequest
+class MessageFields(NamedTuple):
+    """The fields of a message that count towards the token usage."""
+
+    role: Optional[str]
+    # A string, or an iterator of text chunks or a text file that is counted as it is read
+    content: Optional[Union[str, Iterator[str]]]
+    name: Optional[str]
+    # The name and arguments of the function call, if the message has one
+    function_call: Optional[tuple[Optional[str], Optional[str]]]
+    # The name and arguments of each tool call of the message
+    tool_calls: tuple[tuple[Optional[str], Optional[str]], ...] = ()
+    # The text parts of a content given as a list of parts, in which case content is None
+    texts: tuple[str, ...] = ()
+    # The width, height and detail of each image part, with the size None when it is unknown
+    images: tuple[tuple[Optional[int], Optional[int], Optional[str]], ...] = ()
 
 
 @dataclass
@@ -15,56 +65,338 @@ class TokenCounter:
 
     Attributes:
         model (Optional[str]): The model to use for token counting.
+        model_spec (Optional[ModelSpec]): The encoding, context window and token overheads to count with.
+            Defaults to the spec registered for the model.
+        encoding_dir (Optional[str]): A bundle directory to load the encoding from without network access, see
+            openai_token_counter.bundle. Defaults to the OPENAI_TOKEN_COUNTER_ENCODING_DIR environment variable,
+            and to tiktoken's download cache if it is not set.
+        count_only (bool): Count long strings from a native token buffer instead of a list of tokens.
+            Requires numpy, and falls back to the list of tokens when it is not installed.
+        function_cache_size (int): The number of function lists whose token count is cached. 0 disables the cache.
+        string_cache (Optional[TokenCountCache]): A cache of the token counts of strings, keyed by the fingerprint
+            of the encoding and the string, for strings that are repeated across requests.
+        string_cache_min_length (int): Strings shorter than this are not looked up in the string cache, since
+            encoding them costs less than fingerprinting them. The min_length of the cache applies too, and is higher
+            for a shared cache. The counts of the first SHORT_STRING_CACHE_SIZE of them are kept by the counter,
+            unless metrics are set.
+        token_bound (Optional[TokenBound]): The bound used by the approximate counts. Defaults to the bound of the
+            encoding calibrated on the default corpus.
+        metrics (Optional[Metrics]): A callback or a sink that receives the time, size and tokens of each
+            validation, formatting and encoding phase, see openai_token_counter.instrumentation. Defaults to no
+            instrumentation, where the phases are not timed.
     """
 
     model: Optional[str] = field(default=None)
+    model_spec: Optional[ModelSpec] = field(default=None)
+    encoding_dir: Optional[str] = field(
+        default_factory=lambda: os.environ.get(ENCODING_DIR_ENV)
+    )
+    count_only: bool = field(default=True)
+    function_cache_size: int = field(default=128)
+    string_cache: Optional[TokenCountCache] = field(default=None)
+    string_cache_min_length: int = field(default=256)
+    token_bound: Optional[TokenBound] = field(default=None)
+    metrics: Optional[Metrics] = field(default=None)
+
+    @cached_property
+    def spec(self) -> ModelSpec:
+        """The spec of the model, resolved once on first use.
+
+        Returns:
+            ModelSpec: The model_spec attribute, or the spec registered for the model.
+        """
+        return self.model_spec or get_model_spec(self.model)
+
+    @cached_property
+    def encoding(self) -> Encoding:
+        """The tiktoken encoding for the model, resolved once on first use.
+
+        Returns:
+            Encoding: The encoding used for token counting.
+        """
+        if self.encoding_dir:
+            from .bundle import load_encoding
+
+            return load_encoding(self.encoding_dir, self.spec.encoding)
+
+        from tiktoken import get_encoding
+
+        return get_encoding(self.spec.encoding)
+
+    @cached_property
+    def _short_counts(self) -> dict[str, int]:
+        """The token counts of the short strings counted first, keyed by the string.
+
+        Returns:
+            dict[str, int]: The token counts, which string_tokens looks up before anything else.
+        """
+        return {}
+
+    @cached_property
+    def function_cache(self) -> LRUCache[str, int]:
+        """The token counts of function lists, keyed by the fingerprint of their schemas.
+
+        Returns:
+            LRUCache[str, int]: The function definitions cache.
+        """
+        return LRUCache(self.function_cache_size)
+
+    def clear_function_cache(self) -> None:
+        """Invalidate all the cached function definitions token counts."""
+        self.function_cache.clear()
+
+    def validate_request(self, data: Mapping[str, Any]) -> OpenAIRequest:
+        """Validate a request dict into the request model, reporting the validation phase to the metrics.
+
+        Args:
+            data (Mapping[str, Any]): The request, with the messages, functions and function_call keys.
+
+        Returns:
+            OpenAIRequest: The validated request.
+        """
+        from .models import request_adapter
+
+        if self.metrics is None:
+            return request_adapter.validate_python(data)
+
+        start = perf_counter()
+        request = request_adapter.validate_python(data)
+        self.record_phase("validation", start)
+        return request
 
-    def estimate_token_count(self, request: OpenAIRequest) -> int:
+    def record_phase(
+        self, phase: Phase, start: float, size: int = 0, tokens: int = 0
+    ) -> None:
+        """Report a phase that started at a time to the metrics, if they are set.
+
+        Args:
+            phase (Phase): The phase.
+            start (float): The time.perf_counter value when the phase started.
+            size (int): The characters or bytes processed by the phase.
+            tokens (int): The tokens encoded by the phase.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            emit(metrics, PhaseEvent(phase, perf_counter() - start, size, tokens))
+
+    @cached_property
+    def _count_only_available(self) -> bool:
+        """Whether long strings can be counted without building a list of tokens.
+
+        Returns:
+            bool: True if the count-only path is enabled and supported.
+        """
+        return (
+            self.count_only
+            and hasattr(self.encoding, "encode_to_numpy")
+            and find_spec("numpy") is not None
+        )
+
+    @cached_property
+    def _token_bound(self) -> TokenBound:
+        """The bound used by the approximate counts, calibrated on first use.
+
+        Returns:
+            TokenBound: The token_bound attribute, or the bound calibrated for the encoding.
+        """
+        return self.token_bound or get_token_bound(self.encoding)
+
+    def estimate_token_count(
+        self,
+        request: OpenAIRequest,
+        approximate: bool = False,
+        budget: Optional[int] = None,
+    ) -> int:
         """Estimate the number of tokens a prompt will use.
 
         Args:
             request (OpenAIRequest): The request to estimate the token count for.
+            approximate (bool): Return an upper bound of the token count computed from byte statistics of the
+                strings, without encoding them. The bound is calibrated rather than proven, see TokenBound. The
+                message and function overheads are the same as the exact count.
+            budget (Optional[int]): With approximate, the token count is computed exactly when the upper bound is
+                over the budget, so the result is exact whenever it can decide whether the prompt fits.
 
         Returns:
             int: An estimate for the number of tokens the prompt will use.
         """
-        messages = request.messages
-        functions = request.functions
-        function_call = request.function_call
+        strings, tokens = self._request_parts(request)
+        return self._sum_parts(strings, tokens, approximate, budget)
 
-        padded_system = False
-        tokens = 0
+    def _sum_parts(
+        self, strings: list[str], tokens: int, approximate: bool, budget: Optional[int]
+    ) -> int:
+        """Sum the token counts of the strings and the fixed token overhead of a request.
 
-        for message in messages:
-            message_copy = deepcopy(message)
-            if message_copy.role == "system" and functions and not padded_system:
-                if message_copy.content:
-                    message_copy.content += "\n"
-                padded_system = True
-            tokens += self.estimate_tokens_in_messages(message_copy)
+        Args:
+            strings (list[str]): The strings of the request.
+            tokens (int): The fixed token overhead of the request.
+            approximate (bool): Sum the upper bounds of the token counts of the strings instead of encoding them.
+            budget (Optional[int]): With approximate, encode the strings when the upper bound is over the budget.
 
-        # Each completion (vs message) seems to carry a 3-token overhead
-        tokens += 3
+        Returns:
+            int: The token count of the request.
+        """
+        if approximate:
+            bound = self._token_bound
+            upper_bound = tokens + sum(bound.tokens(string) for string in strings)
+            if budget is None or upper_bound <= budget:
+                return upper_bound
 
-        # If there are functions, add the function definitions as they count towards token usage
-        if functions:
-            tokens += self.estimate_tokens_in_functions(functions)
+        return tokens + sum(self.string_tokens(string) for string in strings)
 
-        # If there's a system message _and_ functions are present, subtract four tokens
-        if functions and any(message.role == "system" for message in messages):
-            tokens -= 4
+    def remaining_completion_tokens(self, request: OpenAIRequest) -> int:
+        """Get the number of tokens left for the completion in the context window of the model.
 
-        # If function_call is 'none', add one token.
-        # If it's a OpenAIFunctionCall object, add 4 + the number of tokens in the function name.
-        # If it's undefined or 'auto', don't add anything.
-        if function_call and function_call != "auto":
-            if function_call == "none":
-                tokens += 1
+        Args:
+            request (OpenAIRequest): The request to estimate the token count for.
 
-            elif isinstance(function_call, dict) and "name" in function_call:
-                tokens += self.string_tokens(function_call["name"]) + 4
+        Returns:
+            int: The context window minus the token count of the prompt, negative if the prompt doesn't fit.
 
-        return tokens
+        Raises:
+            ValueError: If the context window of the model is unknown.
+        """
+        context_window = self.spec.context_window
+        if context_window is None:
+            raise ValueError(f"The context window of the model {self.model} is unknown")
+
+        return context_window - self.estimate_token_count(request)
+
+    @cached_property
+    def async_counter(self) -> AsyncTokenCounter:
+        """The async token counter used by estimate_token_count_async.
+
+        Assign an AsyncTokenCounter to configure its thread pool and batching.
+
+        Returns:
+            AsyncTokenCounter: The async token counter, created with the default options on first use.
+        """
+        from .async_counter import AsyncTokenCounter
+
+        return AsyncTokenCounter(self)
+
+    async def estimate_token_count_async(self, request: OpenAIRequest) -> int:
+        """Estimate the number of tokens a prompt will use without blocking the event loop on large prompts.
+
+        Args:
+            request (OpenAIRequest): The request to estimate the token count for.
+
+        Returns:
+            int: An estimate for the number of tokens the prompt will use.
+        """
+        return await self.async_counter.estimate_token_count(request)
+
+    def estimate_raw_token_count(
+        self,
+        messages: list[dict[str, Any]],
+        functions: Optional[list[dict[str, Any]]] = None,
+        function_call: Optional[Union[str, Mapping[Literal["name"], Any]]] = None,
+        approximate: bool = False,
+        budget: Optional[int] = None,
+        tools: Optional[list[dict[str, Any]]] = None,
+        tool_choice: Optional[Union[str, Mapping[str, Any]]] = None,
+    ) -> int:
+        """Estimate the number of tokens a prompt will use, reading the messages directly from plain dicts.
+
+        The messages are trusted and are not validated, which makes this cheaper than building an OpenAIRequest
+        for long conversations. The functions are only validated when their token count is not cached yet.
+
+        Args:
+            messages (list[dict[str, Any]]): The messages of the request.
+            functions (Optional[list[dict[str, Any]]]): The functions of the request.
+            function_call (Optional[Union[str, Mapping[Literal["name"], Any]]]): The function call of the request.
+            approximate (bool): Return an upper bound of the token count, see estimate_token_count.
+            budget (Optional[int]): With approximate, count exactly when the upper bound is over the budget.
+            tools (Optional[list[dict[str, Any]]]): The tools of the request, counted as their functions.
+            tool_choice (Optional[Union[str, Mapping[str, Any]]]): The tool choice of the request, counted as the
+                equivalent function call.
+
+        Returns:
+            int: An estimate for the number of tokens the prompt will use.
+        """
+        if tools:
+            functions = (functions or []) + [tool["function"] for tool in tools]
+        strings, tokens = self._conversation_parts(
+            [_raw_message_fields(message) for message in messages],
+            self._estimate_tokens_in_raw_functions(functions) if functions else None,
+            _tool_choice_function_call(function_call, tool_choice),
+        )
+        return self._sum_parts(strings, tokens, approximate, budget)
+
+    def estimate_token_counts(
+        self, requests: list[OpenAIRequest], num_threads: int = 8
+    ) -> list[int]:
+        """Estimate the number of tokens for many prompts at once.
+
+        All the strings of all the requests are deduplicated, and the long ones are encoded in a single
+        ``encode_batch`` call, which runs on native threads. The results are identical to calling
+        ``estimate_token_count`` on each request.
+
+        Args:
+            requests (list[OpenAIRequest]): The requests to estimate the token count for.
+            num_threads (int): The number of threads tiktoken uses to encode the batch.
+
+        Returns:
+            list[int]: An estimate of the tokens each prompt will use, in the order of the requests.
+        """
+        return self._count_parts(
+            [self._request_parts(request) for request in requests], num_threads
+        )
+
+    def _count_parts(
+        self, request_parts: list[tuple[list[str], int]], num_threads: int
+    ) -> list[int]:
+        """Count the tokens of many requests split into their strings and fixed token overhead.
+
+        Args:
+            request_parts (list[tuple[list[str], int]]): The strings and fixed token overhead of each request.
+            num_threads (int): The number of threads tiktoken uses to encode the long strings. With a single
+                thread, every string is encoded in the calling thread.
+
+        Returns:
+            list[int]: The token count of each request.
+        """
+        string_tokens: dict[str, int] = {}
+        for strings, _ in request_parts:
+            string_tokens.update(dict.fromkeys(strings, 0))
+
+        # Handing a string to the thread pool costs more than encoding it when it is short,
+        # so only the long strings go through encode_batch.
+        long_strings = []
+        for string in string_tokens:
+            if num_threads <= 1 or len(string) < BATCH_INLINE_MAX_LENGTH:
+                string_tokens[string] = self.string_tokens(string)
+                continue
+
+            key = self._string_cache_key(string)
+            if key is not None and self.string_cache is not None:
+                cached = self.string_cache.get(key)
+                if cached is not None:
+                    string_tokens[string] = cached
+                    continue
+            long_strings.append(string)
+
+        if long_strings:
+            start = perf_counter()
+            encoded = self.encoding.encode_batch(long_strings, num_threads=num_threads)
+            self.record_phase(
+                "encoding",
+                start,
+                sum(len(string) for string in long_strings),
+                sum(len(tokens) for tokens in encoded),
+            )
+            for index, tokens in enumerate(encoded):
+                string = long_strings[index]
+                string_tokens[string] = len(tokens)
+                key = self._string_cache_key(string)
+                if key is not None and self.string_cache is not None:
+                    self.string_cache.put(key, len(tokens))
+
+        return [
+            tokens + sum(string_tokens[string] for string in strings)
+            for strings, tokens in request_parts
+        ]
 
     def string_tokens(self, string: str) -> int:
         """Get the token count for a string.
@@ -75,48 +407,228 @@ class TokenCounter:
         Returns:
             int: The token count.
         """
-        if self.model:
-            encoding = encoding_for_model(self.model)
-        else:
-            encoding = get_encoding("cl100k_base")
+        tokens = self._short_counts.get(string)
+        if tokens is not None:
+            return tokens
+
+        key = self._string_cache_key(string)
+        if self.string_cache is None or key is None:
+            tokens = self._encode_count(string)
+            if (
+                self.metrics is None
+                and len(string) < self.string_cache_min_length
+                and len(self._short_counts) < SHORT_STRING_CACHE_SIZE
+            ):
+                self._short_counts[string] = tokens
+            return tokens
+
+        tokens = self.string_cache.get(key)
+        if tokens is None:
+            tokens = self._encode_count(string)
+            self.string_cache.put(key, tokens)
+        return tokens
+
+    def stream_tokens(self, stream: Iterator[str], pad: bool = False) -> int:
+        """Get the token count for a text given a chunk at a time, without holding it whole.
+
+        Only the last pieces of the text read so far, whose split into tokens can still change with the next chunk,
+        are kept and encoded again with it, so the count is the same as the count of the whole text. Only the end of
+        a piece longer than completion.MAX_PENDING_LENGTH is kept, so a long run of a single piece costs the same
+        in small chunks as in large ones, and its count can rarely differ by a token.
+
+        Args:
+            stream (Iterator[str]): The chunks of the text, or a text file, which is read in blocks.
+            pad (bool): Whether to append a newline to the text if it is not empty, as done for the first system
+                message when functions are present.
+
+        Returns:
+            int: The token count.
+        """
+        from .completion import CompletionTokenCounter
+
+        if isinstance(stream, io.TextIOBase):
+            stream = iter(partial(stream.read, STREAM_READ_SIZE), "")
+
+        start = perf_counter()
+        counter = CompletionTokenCounter(self)
+        size = 0
+        for chunk in stream:
+            counter.add_text(chunk)
+            size += len(chunk)
+        if pad and size:
+            counter.add_text("\n")
+
+        if self.metrics is not None:
+            self.record_phase("encoding", start, size, counter.token_count)
+        return counter.token_count
+
+    def _encode_count(self, string: str) -> int:
+        """Encode a string and count its tokens.
+
+        Args:
+            string (str): The string to count.
+
+        Returns:
+            int: The token count.
+        """
+        if self.metrics is None:
+            return self._encode_length(string)
 
-        return len(encoding.encode(string))
+        start = perf_counter()
+        tokens = self._encode_length(string)
+        self.record_phase("encoding", start, len(string), tokens)
+        return tokens
 
-    def estimate_tokens_in_messages(self, message: OpenAIMessage) -> int:
+    def _encode_length(self, string: str) -> int:
+        """Encode a string and count its tokens, from a native token buffer if the string is long.
+
+        Args:
+            string (str): The string to count.
+
+        Returns:
+            int: The token count.
+        """
+        if len(string) >= COUNT_ONLY_MIN_LENGTH and self._count_only_available:
+            try:
+                return len(self.encoding.encode_to_numpy(string))
+            except UnicodeEncodeError:
+                # Unlike encode, encode_to_numpy doesn't replace the lone surrogates of a string
+                pass
+
+        return len(self.encoding.encode(string))
+
+    def _string_cache_key(self, string: str) -> Optional[str]:
+        """Get the key of a string in the string cache.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            Optional[str]: The fingerprint of the encoding and the string, or None if the string is not cached.
+        """
+        if self.string_cache is None or len(string) < max(
+            self.string_cache_min_length, self.string_cache.min_length
+        ):
+            return None
+
+        return fingerprint(
+            self.encoding.name.encode()
+            + b"\0"
+            + string.encode("utf-8", errors="surrogatepass")
+        )
+
+    def estimate_tokens_in_messages(
+        self, message: OpenAIMessage, pad: bool = False
+    ) -> int:
         """Estimate token count for a single message.
 
         Args:
             message (OpenAIMessage): The message to estimate the token count for.
+            pad (bool): Whether to append a newline to the content, as done for the first system message
+                when functions are present.
 
         Returns:
             int: The estimated token count.
         """
-        tokens = 0
+        strings, tokens = self._message_parts(_message_fields(message), pad=pad)
+        return tokens + sum(self.string_tokens(string) for string in strings)
 
-        if message.role:
-            tokens += self.string_tokens(message.role)
+    def truncate_string(self, string: str, max_tokens: int) -> str:
+        """Truncate a string to at most a number of tokens, cutting it at a token boundary.
 
-        if message.content:
-            tokens += self.string_tokens(message.content)
+        A character whose bytes are split across the cut is dropped, so the result is always a valid prefix
+        of the string.
 
-        if message.name:
-            tokens += self.string_tokens(message.name) + 1  # +1 for the name
+        Args:
+            string (str): The string to truncate.
+            max_tokens (int): The maximum number of tokens of the truncated string.
 
-        if message.function_call:
-            if message.function_call.name:
-                tokens += self.string_tokens(message.function_call.name)
+        Returns:
+            str: The truncated string, or the string itself if it already fits.
 
-            if message.function_call.arguments:
-                tokens += self.string_tokens(message.function_call.arguments)
+        Raises:
+            ValueError: If max_tokens is negative.
+        """
+        if max_tokens < 0:
+            raise ValueError(f"max_tokens must not be negative, got {max_tokens}")
 
-            tokens += 3  # Additional tokens for function call
+        tokens = self.encoding.encode(string)
+        if len(tokens) <= max_tokens:
+            return string
 
-        tokens += 3  # Add three per message
+        keep = max_tokens
+        while True:
+            truncated = self._decode_prefix(tokens, keep)
+            # Encoding a prefix on its own can rarely merge differently at the cut, so the result is verified
+            excess = self.string_tokens(truncated) - max_tokens
+            if excess <= 0:
+                return truncated
+            keep -= excess
 
-        if message.role == "function":
-            tokens -= 2  # Subtract 2 if role is "function"
+    def truncate_message(
+        self, message: OpenAIMessage, max_tokens: int, pad: bool = False
+    ) -> OpenAIMessage:
+        """Truncate the content of a message so the whole message fits in a number of tokens.
 
-        return tokens
+        The fixed tokens of the message (role, name, function call and the per message overhead) are taken into
+        account, and the content is cut at a token boundary.
+
+        Args:
+            message (OpenAIMessage): The message to truncate.
+            max_tokens (int): The maximum token count of the truncated message.
+            pad (bool): Whether the message is padded, as done for the first system message when functions are
+                present.
+
+        Returns:
+            OpenAIMessage: The truncated message, or the message itself if it already fits.
+
+        Raises:
+            ValueError: If the message can't fit even with an empty content, if its content is a list of parts
+                and it doesn't fit, or if its content is an iterator or a file, which counting would consume.
+        """
+        empty = message.model_copy(update={"content": None})
+        fixed_tokens = self.estimate_tokens_in_messages(empty)
+        if fixed_tokens > max_tokens:
+            raise ValueError(
+                f"The message needs {fixed_tokens} tokens without content, more than {max_tokens}"
+            )
+
+        if not message.content:
+            return message
+
+        _reject_streamed_content([message], "truncated")
+
+        if not isinstance(message.content, str):
+            if self.estimate_tokens_in_messages(message, pad=pad) > max_tokens:
+                raise ValueError("Only a content given as a string can be truncated")
+            return message
+
+        tokens = self.encoding.encode(message.content)
+        if not pad and fixed_tokens + len(tokens) <= max_tokens:
+            return message
+
+        keep = max_tokens - fixed_tokens
+        while True:
+            truncated = message.model_copy(
+                update={"content": self._decode_prefix(tokens, keep) or None}
+            )
+            excess = self.estimate_tokens_in_messages(truncated, pad=pad) - max_tokens
+            if excess <= 0:
+                return message if keep >= len(tokens) else truncated
+            keep -= excess
+
+    def _decode_prefix(self, tokens: list[int], length: int) -> str:
+        """Decode the first tokens of a list, dropping a character cut in the middle.
+
+        Args:
+            tokens (list[int]): The tokens.
+            length (int): The number of tokens to decode.
+
+        Returns:
+            str: The decoded prefix.
+        """
+        data = self.encoding.decode_bytes(tokens[: max(length, 0)])
+        return data.decode("utf-8", errors="ignore")
 
     def estimate_tokens_in_functions(self, function: list[OpenAIFunction]) -> int:
         """Estimate token count for the functions.
@@ -130,7 +642,414 @@ class TokenCounter:
         Returns:
             int: The estimated token count.
         """
-        prompt_definition = format_function_definitions(function)
+        from .models import functions_adapter
+
+        key = fingerprint(functions_adapter.dump_json(function))
+        tokens = self.function_cache.get(key)
+        if tokens is None:
+            tokens = self._format_and_count_functions(function)
+            self.function_cache.put(key, tokens)
+
+        return tokens
+
+    def _estimate_tokens_in_raw_functions(self, functions: list[dict[str, Any]]) -> int:
+        """Estimate token count for functions given as plain dicts, validating them only on a cache miss.
+
+        Args:
+            functions (list[dict[str, Any]]): The functions to estimate the token count for.
+
+        Returns:
+            int: The estimated token count.
+        """
+        # The keys are not sorted since the order of the properties changes the formatted definitions
+        key = fingerprint(json.dumps(functions).encode())
+        tokens = self.function_cache.get(key)
+        if tokens is None:
+            from .models import functions_adapter
+
+            start = perf_counter()
+            validated = functions_adapter.validate_python(functions)
+            self.record_phase("validation", start)
+            tokens = self._format_and_count_functions(validated)
+            self.function_cache.put(key, tokens)
+
+        return tokens
+
+    def _format_and_count_functions(self, functions: list[OpenAIFunction]) -> int:
+        """Format the function definitions and count their tokens.
+
+        Args:
+            functions (list[OpenAIFunction]): The functions to count.
+
+        Returns:
+            int: The token count.
+        """
+        from .format import format_function_definitions
+
+        start = perf_counter()
+        prompt_definition = format_function_definitions(functions)
+        self.record_phase("formatting", start, len(prompt_definition))
         tokens = self.string_tokens(prompt_definition)
-        tokens += 9  # Additional tokens for function definition
+        tokens += (
+            self.spec.functions_tokens
+        )  # Additional tokens for function definition
         return tokens
+
+    def _request_parts(self, request: OpenAIRequest) -> tuple[list[str], int]:
+        """Split a request into the strings to encode and the fixed token overhead.
+
+        The token count of the request is the overhead plus the token count of each of the strings.
+
+        Args:
+            request (OpenAIRequest): The request to split.
+
+        Returns:
+            tuple[list[str], int]: The strings to encode and the fixed token overhead.
+        """
+        functions = _request_functions(request)
+        return self._conversation_parts(
+            [_message_fields(message) for message in request.messages],
+            self.estimate_tokens_in_functions(functions) if functions else None,
+            _tool_choice_function_call(request.function_call, request.tool_choice),
+        )
+
+    def _conversation_parts(
+        self,
+        messages: list[MessageFields],
+        functions_tokens: Optional[int],
+        function_call: Optional[Union[str, Mapping[Literal["name"], Any]]],
+    ) -> tuple[list[str], int]:
+        """Split the fields of a request into the strings to encode and the fixed token overhead.
+
+        Args:
+            messages (list[MessageFields]): The fields of each message of the request.
+            functions_tokens (Optional[int]): The token count of the functions of the request, or None if it has
+                no functions.
+            function_call (Optional[Union[str, Mapping[Literal["name"], Any]]]): The function call of the request.
+
+        Returns:
+            tuple[list[str], int]: The strings to encode and the fixed token overhead.
+        """
+        padded_system = False
+        strings: list[str] = []
+        tokens = 0
+
+        for message in messages:
+            pad = (
+                message.role == "system"
+                and functions_tokens is not None
+                and not padded_system
+            )
+            if pad:
+                padded_system = True
+            message_strings, message_tokens = self._message_parts(message, pad=pad)
+            strings += message_strings
+            tokens += message_tokens
+
+        overhead_strings, overhead_tokens = self._request_overhead_parts(
+            functions_tokens, function_call, padded_system
+        )
+        strings += overhead_strings
+        tokens += overhead_tokens
+
+        return strings, tokens
+
+    def _request_overhead_parts(
+        self,
+        functions_tokens: Optional[int],
+        function_call: Optional[Union[str, Mapping[Literal["name"], Any]]],
+        has_system: bool,
+    ) -> tuple[list[str], int]:
+        """Get the strings to encode and the fixed token overhead of a request, excluding its messages.
+
+        Args:
+            functions_tokens (Optional[int]): The token count of the functions of the request, or None if it has
+                no functions.
+            function_call (Optional[Union[str, Mapping[Literal["name"], Any]]]): The function call of the request.
+            has_system (bool): Whether the request has a system message.
+
+        Returns:
+            tuple[list[str], int]: The strings to encode and the fixed token overhead.
+        """
+        spec = self.spec
+        strings: list[str] = []
+
+        # Each completion (vs message) seems to carry a 3-token overhead
+        tokens = spec.reply_tokens
+
+        # If there are functions, add the function definitions as they count towards token usage
+        if functions_tokens is not None:
+            tokens += functions_tokens
+
+        # If there's a system message _and_ functions are present, subtract four tokens
+        if functions_tokens is not None and has_system:
+            tokens += spec.functions_system_tokens
+
+        # If function_call is 'none', add one token.
+        # If it's a OpenAIFunctionCall object, add 4 + the number of tokens in the function name.
+        # If it's undefined or 'auto', don't add anything.
+        if function_call and function_call != "auto":
+            if function_call == "none":
+                tokens += spec.function_call_none_tokens
+
+            elif isinstance(function_call, dict) and "name" in function_call:
+                strings.append(function_call["name"])
+                tokens += spec.function_call_name_tokens
+
+        return strings, tokens
+
+    def _message_parts(
+        self, message: MessageFields, pad: bool = False
+    ) -> tuple[list[str], int]:
+        """Split a message into the strings to encode and the fixed token overhead.
+
+        Args:
+            message (MessageFields): The fields of the message to split.
+            pad (bool): Whether to append a newline to the content, as done for the first system message
+                when functions are present.
+
+        Returns:
+            tuple[list[str], int]: The strings to encode and the fixed token overhead.
+        """
+        spec = self.spec
+        strings: list[str] = []
+        tokens = 0
+
+        if message.role:
+            strings.append(message.role)
+
+        strings += _content_strings(message, pad)
+        if message.content is not None and not isinstance(message.content, str):
+            tokens += self.stream_tokens(message.content, pad)
+        for width, height, detail in message.images:
+            tokens += image_tokens(width, height, detail, spec)
+
+        if message.name:
+            strings.append(message.name)
+            tokens += spec.tokens_per_name  # +1 for the name
+
+        # The name and the arguments of each call, when they are not empty
+        if message.function_call:
+            strings += [part for part in message.function_call if part]
+            tokens += (
+                spec.tokens_per_function_call
+            )  # Additional tokens for function call
+
+        # Parallel tool calls are counted like a function call each
+        for tool_call in message.tool_calls:
+            strings += [part for part in tool_call if part]
+            tokens += spec.tokens_per_tool_call
+
+        tokens += spec.tokens_per_message  # Add three per message
+
+        if message.role == "function":
+            tokens += spec.function_role_tokens  # Subtract 2 if role is "function"
+
+        elif message.role == "tool":
+            tokens += spec.tool_role_tokens
+
+        return strings, tokens
+
+
+def _message_fields(message: OpenAIMessage) -> MessageFields:
+    """Get the fields of a message model that count towards the token usage.
+
+    Args:
+        message (OpenAIMessage): The message.
+
+    Returns:
+        MessageFields: The fields of the message.
+    """
+    function_call = message.function_call
+    content = message.content
+    texts: list[str] = []
+    images = []
+    if isinstance(content, list):
+        for part in content:
+            if part.type == "text":
+                texts.append(part.text)
+            else:
+                images.append(_image_fields(part.image_url.url, part.image_url.detail))
+        content = None
+
+    return MessageFields(
+        message.role,
+        content,
+        message.name,
+        (function_call.name, function_call.arguments) if function_call else None,
+        tuple(
+            (tool_call.function.name, tool_call.function.arguments)
+            for tool_call in message.tool_calls or ()
+        ),
+        tuple(texts),
+        tuple(images),
+    )
+
+
+def _raw_message_fields(message: dict[str, Any]) -> MessageFields:
+    """Get the fields of a plain dict message that count towards the token usage.
+
+    Args:
+        message (dict[str, Any]): The message.
+
+    Returns:
+        MessageFields: The fields of the message.
+    """
+    function_call = message.get("function_call")
+    content = message.get("content")
+    texts: list[str] = []
+    images = []
+    if isinstance(content, list):
+        for part in content:
+            if part.get("type") == "text":
+                texts.append(part["text"])
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]
+                images.append(_image_fields(image_url["url"], image_url.get("detail")))
+        content = None
+
+    return MessageFields(
+        message.get("role"),
+        content,
+        message.get("name"),
+        (
+            (function_call.get("name"), function_call.get("arguments"))
+            if function_call
+            else None
+        ),
+        tuple(
+            (tool_call["function"].get("name"), tool_call["function"].get("arguments"))
+            for tool_call in message.get("tool_calls") or ()
+        ),
+        tuple(texts),
+        tuple(images),
+    )
+
+
+def _image_fields(
+    url: str, detail: Optional[str]
+) -> tuple[Optional[int], Optional[int], Optional[str]]:
+    """Get the fields of an image part that count towards the token usage.
+
+    Args:
+        url (str): The URL of the image.
+        detail (Optional[str]): The detail of the image.
+
+    Returns:
+        tuple[Optional[int], Optional[int], Optional[str]]: The width and height, read from the header of a data
+            URL image and None otherwise, and the detail. The size of a low detail image is not read.
+    """
+    size = None if detail == "low" else image_url_size(url)
+    return (size[0], size[1], detail) if size else (None, None, detail)
+
+
+def _content_strings(message: MessageFields, pad: bool) -> list[str]:
+    """Get the strings of the content of a message, given as a string or as text parts.
+
+    Args:
+        message (MessageFields): The fields of the message.
+        pad (bool): Whether to append a newline to the content, as done for the first system message when functions
+            are present.
+
+    Returns:
+        list[str]: The strings of the content, with the last one padded.
+    """
+    if isinstance(message.content, str):
+        strings = [message.content] if message.content else []
+    else:
+        strings = [text for text in message.texts if text]
+    if pad and strings:
+        strings[-1] += "\n"
+    return strings
+
+
+def _reject_streamed_content(messages: Iterable[OpenAIMessage], action: str) -> None:
+    """Check that the contents of messages can be counted more than once.
+
+    Args:
+        messages (Iterable[OpenAIMessage]): The messages.
+        action (str): What is done with the messages, for the error message.
+
+    Raises:
+        ValueError: If a content is an iterator or a file, which counting consumes.
+    """
+    for message in messages:
+        if message.content is not None and not isinstance(message.content, (str, list)):
+            raise ValueError(
+                f"A content given as an iterator or a file can't be {action}"
+            )
+
+
+def _request_functions(request: OpenAIRequest) -> Optional[list[OpenAIFunction]]:
+    """Get the functions of a request, including the functions of its tools.
+
+    The tools are formatted and cached as the functions they wrap, so a request with tools costs the same as the
+    request with the equivalent functions.
+
+    Args:
+        request (OpenAIRequest): The request.
+
+    Returns:
+        Optional[list[OpenAIFunction]]: The functions, or None if the request has neither functions nor tools.
+    """
+    if not request.tools:
+        return request.functions
+
+    return (request.functions or []) + [tool.function for tool in request.tools]
+
+
+def _tool_choice_function_call(
+    function_call: Optional[Union[str, Mapping[Literal["name"], Any]]],
+    tool_choice: Optional[Union[str, Mapping[str, Any], OpenAIToolChoice]],
+) -> Optional[Union[str, Mapping[Literal["name"], Any]]]:
+    """Get the function call equivalent to the tool choice of a request.
+
+    Args:
+        function_call (Optional[Union[str, Mapping[Literal["name"], Any]]]): The function call of the request,
+            which takes precedence over the tool choice.
+        tool_choice (Optional[Union[str, Mapping[str, Any], OpenAIToolChoice]]): The tool choice of the request,
+            as a model or a plain dict.
+
+    Returns:
+        Optional[Union[str, Mapping[Literal["name"], Any]]]: The function call. "required" is counted as "auto".
+    """
+    if function_call is not None or tool_choice is None:
+        return function_call
+
+    if isinstance(tool_choice, str):
+        return "none" if tool_choice == "none" else "auto"
+
+    function = (
+        tool_choice.get("function")
+        if isinstance(tool_choice, Mapping)
+        else tool_choice.function
+    )
+    return {"name": function["name"]} if function else None
+
+
+# The most model names whose shared token counter is kept
+SHARED_COUNTERS_SIZE = 64
+
+_token_counters: LRUCache[Optional[str], TokenCounter] = LRUCache(SHARED_COUNTERS_SIZE)
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Get the shared token counter for a model.
+
+    Counters are created once per model and kept until a model is registered, so the spec and the
+    encoding are only resolved on the first call for each model. The most recently used counters are kept, and
+    unknown models share the counter of the default spec, so model names taken from requests can't grow them.
+
+    Args:
+        model (Optional[str]): The model to use for token counting.
+
+    Returns:
+        TokenCounter: The shared token counter for the model.
+    """
+    token_counter = _token_counters.get(model)
+    if token_counter is None:
+        if model and get_model_spec(model) is DEFAULT_MODEL_SPEC:
+            return get_token_counter()
+        token_counter = _token_counters.setdefault(model, TokenCounter(model=model))
+
+    return token_counter
@@ -0,0 +1,225 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .conversation import ConversationTokenCounter
+from .models import OpenAIRequest
+from .token_counter import (
+    TokenCounter,
+    _reject_streamed_content,
+    _request_functions,
+    _tool_choice_function_call,
+    get_token_counter,
+)
+
+
+@dataclass
+class TrimPolicy:
+    """Policy for trimming a request to a token budget.
+
+    Messages that are not kept by the policy are dropped oldest first.
+
+    Attributes:
+        keep_system (bool): Never drop system messages.
+        keep_last (int): Never drop the last messages of the conversation.
+        truncate_longest (bool): If the request doesn't fit after dropping every message that may be dropped,
+            truncate the content of the longest remaining messages.
+    """
+
+    keep_system: bool = field(default=True)
+    keep_last: int = field(default=1)
+    truncate_longest: bool = field(default=False)
+
+
+def trim_request(
+    request: OpenAIRequest,
+    budget: int,
+    policy: Optional[TrimPolicy] = None,
+    token_counter: Optional[TokenCounter] = None,
+) -> OpenAIRequest:
+    """Trim a request to the largest request that fits a token budget.
+
+    Every message is counted once, and the token count of each candidate is computed from suffix sums of these
+    counts, so trimming doesn't re-encode the conversation for every dropped message.
+
+    Args:
+        request (OpenAIRequest): The request to trim.
+        budget (int): The maximum number of tokens of the trimmed request.
+        policy (Optional[TrimPolicy]): The trimming policy. Defaults to keeping the system messages and the last
+            message.
+        token_counter (Optional[TokenCounter]): The token counter to use. Defaults to the shared counter for the
+            cl100k_base encoding.
+
+    Returns:
+        OpenAIRequest: The trimmed request, which is the request itself if it already fits.
+
+    Raises:
+        ValueError: If the request can't fit the budget under the policy, or if the content of a message is an
+            iterator or a file, which counting would consume.
+    """
+    policy = policy or TrimPolicy()
+    token_counter = token_counter or get_token_counter()
+    messages = request.messages
+    _reject_streamed_content(messages, "trimmed")
+    functions = _request_functions(request)
+    functions_tokens = (
+        token_counter.estimate_tokens_in_functions(functions) if functions else None
+    )
+    function_call = _tool_choice_function_call(
+        request.function_call, request.tool_choice
+    )
+
+    overhead: dict[bool, int] = {}
+    for has_system in (False, True):
+        strings, tokens = token_counter._request_overhead_parts(
+            functions_tokens, function_call, has_system
+        )
+        overhead[has_system] = tokens + sum(
+            token_counter.string_tokens(string) for string in strings
+        )
+
+    message_tokens = [
+        token_counter.estimate_tokens_in_messages(message) for message in messages
+    ]
+    padding: dict[int, int] = {}
+
+    def padding_tokens(index: Optional[int]) -> int:
+        """Get the tokens added by padding the first system message.
+
+        Args:
+            index (Optional[int]): The index of the first system message, if any.
+
+        Returns:
+            int: The difference between the padded and the unpadded token count of the message.
+        """
+        if index is None or functions_tokens is None:
+            return 0
+        if index not in padding:
+            padding[index] = (
+                token_counter.estimate_tokens_in_messages(messages[index], pad=True)
+                - message_tokens[index]
+            )
+        return padding[index]
+
+    first_kept = len(messages) - max(policy.keep_last, 0)
+    pinned = [
+        (policy.keep_system and message.role == "system") or index >= first_kept
+        for index, message in enumerate(messages)
+    ]
+    pinned_tokens = sum(
+        tokens for index, tokens in enumerate(message_tokens) if pinned[index]
+    )
+    pinned_system = next(
+        (
+            index
+            for index, message in enumerate(messages)
+            if pinned[index] and message.role == "system"
+        ),
+        None,
+    )
+    droppable = [index for index, is_pinned in enumerate(pinned) if not is_pinned]
+
+    # The token count and the first system message of the droppable messages that are kept
+    # when the first `dropped` droppable messages are dropped
+    suffix_tokens = [0] * (len(droppable) + 1)
+    suffix_system: list[Optional[int]] = [None] * (len(droppable) + 1)
+    for dropped in reversed(range(len(droppable))):
+        index = droppable[dropped]
+        suffix_tokens[dropped] = suffix_tokens[dropped + 1] + message_tokens[index]
+        suffix_system[dropped] = (
+            index if messages[index].role == "system" else suffix_system[dropped + 1]
+        )
+
+    for dropped in range(len(droppable) + 1):
+        systems = [
+            index
+            for index in (pinned_system, suffix_system[dropped])
+            if index is not None
+        ]
+        first_system = min(systems) if systems else None
+        tokens = (
+            pinned_tokens
+            + suffix_tokens[dropped]
+            + overhead[first_system is not None]
+            + padding_tokens(first_system)
+        )
+        if tokens <= budget:
+            if dropped == 0:
+                return request
+
+            kept = set(droppable[dropped:])
+            return request.model_copy(
+                update={
+                    "messages": [
+                        message
+                        for index, message in enumerate(messages)
+                        if pinned[index] or index in kept
+                    ]
+                }
+            )
+
+    if policy.truncate_longest:
+        return _truncate_longest(
+            request.model_copy(
+                update={
+                    "messages": [
+                        message
+                        for index, message in enumerate(messages)
+                        if pinned[index]
+                    ]
+                }
+            ),
+            budget,
+            token_counter,
+        )
+
+    raise ValueError(f"The request can't fit in {budget} tokens under the policy")
+
+
+def _truncate_longest(
+    request: OpenAIRequest, budget: int, token_counter: TokenCounter
+) -> OpenAIRequest:
+    """Truncate the content of the longest messages of a request until it fits a token budget.
+
+    Args:
+        request (OpenAIRequest): The request to truncate.
+        budget (int): The maximum number of tokens of the truncated request.
+        token_counter (TokenCounter): The token counter to use.
+
+    Returns:
+        OpenAIRequest: The truncated request.
+
+    Raises:
+        ValueError: If the request can't fit the budget even with empty contents.
+    """
+    conversation = ConversationTokenCounter(
+        token_counter,
+        request.messages,
+        _request_functions(request),
+        _tool_choice_function_call(request.function_call, request.tool_choice),
+    )
+
+    while conversation.token_count > budget:
+        messages = conversation.messages
+        # Content given as a list of parts, with images, is not truncated
+        candidates = [
+            index
+            for index, message in enumerate(messages)
+            if message.content and isinstance(message.content, str)
+        ]
+        if not candidates:
+            raise ValueError(f"The request can't fit in {budget} tokens")
+
+        index = max(candidates, key=conversation.message_tokens)
+        message = messages[index]
+        fixed_tokens = token_counter.estimate_tokens_in_messages(
+            message.model_copy(update={"content": None})
+        )
+        max_tokens = conversation.message_tokens(index) - (
+            conversation.token_count - budget
+        )
+        conversation.replace(
+            index,
+            token_counter.truncate_message(message, max(max_tokens, fixed_tokens)),
+        )
+
+    return request.model_copy(update={"messages": conversation.messages})
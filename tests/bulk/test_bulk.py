@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from openai_token_counter import bulk, openai_token_counter
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def write_logs(path: Path, count: int) -> list[dict[str, Any]]:
+    """Write synthetic request logs.
+
+    Args:
+        path (Path): The JSONL file to write.
+        count (int): The number of records.
+
+    Returns:
+        list[dict[str, Any]]: The records.
+    """
+    records = []
+    for index in range(count):
+        test_case = test_cases_raw[index % len(test_cases_raw)]
+        records.append(
+            {
+                "id": f"{path.stem}-{index}",
+                "messages": test_case["messages"],
+                "functions": test_case.get("functions"),
+                "function_call": test_case.get("function_call"),
+            }
+        )
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return records
+
+
+def test_count_files_resumes_from_checkpoint(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that an interrupted bulk count resumes from its checkpoint with the same results."""
+    records = write_logs(tmp_path / "a.jsonl", 50) + write_logs(
+        tmp_path / "b.jsonl", 30
+    )
+    paths = [str(tmp_path / "a.jsonl"), str(tmp_path / "b.jsonl")]
+    output = tmp_path / "counts.jsonl"
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    save_state = bulk._save_state
+    saves = 0
+
+    def interrupted_save_state(checkpoint: str, state: bulk.BulkState) -> None:
+        nonlocal saves
+        saves += 1
+        if saves == 4:
+            raise KeyboardInterrupt
+        save_state(checkpoint, state)
+
+    monkeypatch.setattr(bulk, "_save_state", interrupted_save_state)
+    with pytest.raises(KeyboardInterrupt):
+        bulk.count_files(
+            paths, str(output), MODEL, workers=2, chunk_size=7, checkpoint=checkpoint
+        )
+
+    state = bulk.count_files(
+        paths, str(output), MODEL, workers=2, chunk_size=7, checkpoint=checkpoint
+    )
+
+    expected = [
+        openai_token_counter(
+            record["messages"], MODEL, record["functions"], record["function_call"]
+        )
+        for record in records
+    ]
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [result["id"] for result in results] == [record["id"] for record in records]
+    assert [result["prompt_tokens"] for result in results] == expected
+    assert state.records == len(records)
+    assert state.errors == 0
+    assert state.prompt_tokens == sum(expected)
+    assert state.model_tokens == {MODEL: sum(expected)}
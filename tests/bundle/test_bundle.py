@@ -0,0 +1,67 @@
+import base64
+import json
+from pathlib import Path
+
+import pytest
+
+from openai_token_counter import TokenCounter, get_token_counter
+from openai_token_counter.bundle import load_encoding, main, save_encoding
+from openai_token_counter.models import OpenAIRequest
+
+
+MODEL = "gpt-3.5-turbo"
+TEXT = "Hello world, this is the encoding bundle test 😀 with some numbers 12345."
+
+
+def test_bundle_round_trip(tmp_path: Path) -> None:
+    """Test that an encoding loaded from a bundle encodes like the original."""
+    encoding = get_token_counter(MODEL).encoding
+    save_encoding(str(tmp_path), encoding)
+
+    loaded = load_encoding(str(tmp_path), encoding.name)
+
+    assert loaded.name == encoding.name
+    assert loaded._mergeable_ranks == encoding._mergeable_ranks
+    assert loaded.encode(TEXT) == encoding.encode(TEXT)
+    assert load_encoding(str(tmp_path), encoding.name) is loaded
+
+
+def test_token_counter_encoding_dir(tmp_path: Path) -> None:
+    """Test that a token counter with a bundle directory counts like the shared counter."""
+    main([str(tmp_path), get_token_counter(MODEL).spec.encoding])
+    request = OpenAIRequest.model_validate(
+        {"messages": [{"role": "user", "content": TEXT}]}
+    )
+
+    token_counter = TokenCounter(model=MODEL, encoding_dir=str(tmp_path))
+
+    assert token_counter.estimate_token_count(request) == get_token_counter(
+        MODEL
+    ).estimate_token_count(request)
+
+
+def test_tiktoken_ranks_file(tmp_path: Path) -> None:
+    """Test that the ranks are read from a tiktoken file when there is no precompiled file."""
+    encoding = get_token_counter(MODEL).encoding
+    save_encoding(str(tmp_path), encoding)
+    (tmp_path / f"{encoding.name}.bpe").unlink()
+    (tmp_path / f"{encoding.name}.tiktoken").write_bytes(
+        b"".join(
+            base64.b64encode(token) + b" " + str(rank).encode() + b"\n"
+            for token, rank in encoding._mergeable_ranks.items()
+        )
+    )
+
+    assert load_encoding(str(tmp_path), encoding.name).encode(TEXT) == encoding.encode(
+        TEXT
+    )
+
+
+def test_missing_ranks(tmp_path: Path) -> None:
+    """Test that a bundle without ranks for an encoding is reported."""
+    (tmp_path / "missing.json").write_text(
+        json.dumps({"pat_str": r"\S+", "special_tokens": {}})
+    )
+
+    with pytest.raises(FileNotFoundError):
+        load_encoding(str(tmp_path), "missing")
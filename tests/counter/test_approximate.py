@@ -0,0 +1,108 @@
+import random
+import string
+import uuid
+from typing import Any
+
+from openai_token_counter import get_token_counter, openai_token_counter
+from openai_token_counter.approximate import TokenBound, calibrate, calibration_corpus
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_approximate_is_upper_bound() -> None:
+    """Test that the approximate count is at least the exact count."""
+    for test_case in test_cases_raw:
+        args: dict[str, Any] = {
+            "messages": test_case["messages"],
+            "model": MODEL,
+            "functions": test_case.get("functions"),
+            "function_call": test_case.get("function_call"),
+        }
+        exact = openai_token_counter(**args)
+
+        assert openai_token_counter(**args, approximate=True) >= exact
+        assert openai_token_counter(**args, approximate=True, validate=False) >= exact
+
+
+def test_approximate_budget() -> None:
+    """Test that the count is exact when the upper bound is over the budget."""
+    messages = [{"role": "user", "content": "Hello world, how are you doing today?"}]
+    exact = openai_token_counter(messages, MODEL)
+    upper_bound = openai_token_counter(messages, MODEL, approximate=True)
+
+    assert (
+        openai_token_counter(messages, MODEL, approximate=True, budget=upper_bound)
+        == upper_bound
+    )
+    assert (
+        openai_token_counter(messages, MODEL, approximate=True, budget=upper_bound - 1)
+        == exact
+    )
+
+
+def test_calibrate_bounds_samples() -> None:
+    """Test that a calibrated bound is at least the token count of every sample."""
+    encoding = get_token_counter(MODEL).encoding
+    samples = calibration_corpus(seed=1)
+
+    bound = calibrate(encoding, samples)
+
+    for sample in samples:
+        assert bound.tokens(sample) >= len(encoding.encode_ordinary(sample))
+
+
+def test_bound_of_one_character_pieces() -> None:
+    """Test that the bound holds on text where every byte is a token, outside of the calibration corpus."""
+    encoding = get_token_counter(MODEL).encoding
+    bound = get_token_counter(MODEL)._token_bound
+    generator = random.Random(2)  # noqa: S311
+
+    for size in (50, 1000, 5000):
+        samples = [
+            " ".join(generator.choices("0123456789", k=size)),
+            " ".join(generator.choices("01", k=size)),
+            " ".join(generator.choices(string.ascii_letters, k=size)),
+            "\n".join(" ".join(generator.choices("01", k=3)) for _ in range(size)),
+        ]
+        for sample in samples:
+            assert bound.tokens(sample) >= len(encoding.encode_ordinary(sample))
+
+
+def test_bound_of_hashes_and_identifiers() -> None:
+    """Test that the bound holds on hashes, UUIDs and alternating letters and digits, outside of the corpus."""
+    encoding = get_token_counter(MODEL).encoding
+    bound = get_token_counter(MODEL)._token_bound
+    generator = random.Random(3)  # noqa: S311
+
+    for size in (50, 1000, 5000):
+        samples = [
+            "a1" * (size // 2),
+            "".join(generator.choices("0123456789abcdef", k=size)),
+            "".join(
+                generator.choice(string.digits if index % 2 else string.ascii_letters)
+                for index in range(size)
+            ),
+            "\n".join(
+                str(uuid.UUID(int=generator.getrandbits(128), version=4))
+                for _ in range(size // 36)
+            ),
+        ]
+        for sample in samples:
+            assert bound.tokens(sample) >= len(encoding.encode_ordinary(sample))
+
+    # The bound of a request over the budget doesn't let it through
+    messages = [{"role": "user", "content": "a1" * 1000}]
+    exact = openai_token_counter(messages, MODEL)
+    assert (
+        openai_token_counter(messages, MODEL, approximate=True, budget=exact - 1)
+        == exact
+    )
+
+
+def test_bound_is_capped_by_bytes() -> None:
+    """Test that the bound is never more than the number of bytes."""
+    assert TokenBound(ratio=10.0, constant=5).tokens("abc") == 3
+    assert TokenBound(ratio=10.0, constant=5).tokens("é") == 2
+    assert TokenBound().tokens("") == 0
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from openai_token_counter import (
+    AsyncTokenCounter,
+    get_token_counter,
+    openai_token_counter,
+    openai_token_counter_async,
+)
+from openai_token_counter.models import OpenAIFunction, OpenAIMessage, OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_openai_token_counter_async() -> None:
+    """Test that the async token counter function matches the token counter function."""
+
+    async def count_all() -> list[int]:
+        return await asyncio.gather(
+            *(
+                openai_token_counter_async(
+                    messages=test_case["messages"],
+                    model=MODEL,
+                    functions=test_case.get("functions"),
+                    function_call=test_case.get("function_call"),
+                )
+                for test_case in test_cases_raw
+            )
+        )
+
+    assert asyncio.run(count_all()) == [
+        openai_token_counter(
+            messages=test_case["messages"],
+            model=MODEL,
+            functions=test_case.get("functions"),
+            function_call=test_case.get("function_call"),
+        )
+        for test_case in test_cases_raw
+    ]
+
+
+def test_async_token_counter_batches_large_prompts() -> None:
+    """Test that large prompts are counted off the event loop in batches, with the same results."""
+    token_counter = get_token_counter(MODEL)
+    requests = [
+        OpenAIRequest(
+            messages=[
+                OpenAIMessage(role="system", content="You are a helpful assistant."),
+                OpenAIMessage(
+                    role="user", content=f"Document {index}: " + "text " * 50
+                ),
+            ]
+        )
+        for index in range(20)
+    ]
+    requests.append(
+        OpenAIRequest(
+            messages=[OpenAIMessage(role="user", content="<|endoftext|>" * 20)]
+        )
+    )
+
+    async def count_all() -> list[object]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async_counter = AsyncTokenCounter(
+                token_counter, executor, inline_max_length=100, max_batch_size=8
+            )
+            return await asyncio.gather(
+                *(async_counter.estimate_token_count(request) for request in requests),
+                return_exceptions=True,
+            )
+
+    results = asyncio.run(count_all())
+
+    assert results[:-1] == [
+        token_counter.estimate_token_count(request) for request in requests[:-1]
+    ]
+    assert isinstance(results[-1], ValueError)
+    with pytest.raises(ValueError):
+        token_counter.estimate_token_count(requests[-1])
+
+
+def test_async_token_counter_event_loops() -> None:
+    """Test that a count cancelled on a closed loop, and counts on the loops of other threads, don't interfere."""
+    token_counter = get_token_counter(MODEL)
+    async_counter = AsyncTokenCounter(token_counter, inline_max_length=10)
+    request = OpenAIRequest(messages=[OpenAIMessage(role="user", content="text " * 50)])
+    expected = token_counter.estimate_token_count(request)
+
+    async def cancel() -> None:
+        task = asyncio.ensure_future(async_counter.estimate_token_count(request))
+        await asyncio.sleep(0)
+        task.cancel()
+
+    async def count() -> int:
+        return await asyncio.wait_for(async_counter.estimate_token_count(request), 5)
+
+    # The batch of the closed loop is never flushed, and must not hold back the next loop
+    asyncio.run(cancel())
+    assert asyncio.run(count()) == expected
+
+    async def count_many() -> list[int]:
+        return await asyncio.gather(*(count() for _ in range(50)))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: asyncio.run(count_many()), range(8)))
+    assert results == [[expected] * 50] * 8
+
+
+def test_async_token_counter_splits_off_the_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that requests with functions or streamed content are split on the thread pool, and short ones inline."""
+    token_counter = TokenCounter(model=MODEL)
+    threads: list[int] = []
+    request_parts = token_counter._request_parts
+
+    def record_thread(request: OpenAIRequest) -> Any:
+        threads.append(threading.get_ident())
+        return request_parts(request)
+
+    monkeypatch.setattr(token_counter, "_request_parts", record_thread)
+
+    function = OpenAIFunction.model_validate(
+        {
+            "name": "get_weather",
+            "description": "Get the weather of a city.",
+            "parameters": {
+                "type": "object",
+                "properties": {"city": {"type": "string"}},
+            },
+        }
+    )
+    short = OpenAIRequest(messages=[OpenAIMessage(role="user", content="Hello!")])
+    with_functions = OpenAIRequest(
+        messages=[OpenAIMessage(role="user", content="Weather in Paris?")],
+        functions=[function],
+    )
+    streamed_text = "Streamed document text. " * 20
+
+    def streamed() -> OpenAIRequest:
+        return OpenAIRequest(
+            messages=[
+                OpenAIMessage(
+                    role="tool",
+                    content=iter(
+                        streamed_text[start : start + 7]
+                        for start in range(0, len(streamed_text), 7)
+                    ),
+                )
+            ]
+        )
+
+    expected = [
+        TokenCounter(model=MODEL).estimate_token_count(request)
+        for request in (short, with_functions, streamed())
+    ]
+
+    async def count(request: OpenAIRequest) -> tuple[int, list[int]]:
+        del threads[:]
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            async_counter = AsyncTokenCounter(token_counter, executor)
+            return await async_counter.estimate_token_count(request), list(threads)
+
+    loop_thread = threading.get_ident()
+    tokens, split_on = asyncio.run(count(short))
+    assert tokens == expected[0]
+    assert split_on == [loop_thread]
+    for index, request in ((1, with_functions), (2, streamed())):
+        tokens, split_on = asyncio.run(count(request))
+        assert tokens == expected[index]
+        assert len(split_on) == 1 and split_on[0] != loop_thread
@@ -0,0 +1,103 @@
+import mmap
+import random
+from pathlib import Path
+
+import pytest
+import regex
+
+from openai_token_counter import chunk_text
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_chunks_are_counted_exactly() -> None:
+    """Test that every chunk fits and is counted like its text, and that the chunks without overlap are the text."""
+    token_counter = TokenCounter(model=MODEL)
+    # Fragments where the split of the text changes at the boundaries, and long pieces that are cut into parts
+    alphabet = ["a", "b", "H", " ", "  ", "\n", "\r\n", "'", "s", "t", "re", "1", "2"]
+    alphabet += ["!", "?", "é", "中", "\t", " the", "don", "/", "_", "😀"]
+    alphabet += ["x" * 40, " " * 30]
+    pattern = token_counter.encoding._pat_str
+    generator = random.Random(0)  # noqa: S311
+
+    for _ in range(1500):
+        text = "".join(generator.choices(alphabet, k=generator.randint(0, 60)))
+        max_tokens = generator.randint(1, 12)
+        overlap = generator.randint(0, max_tokens - 1)
+        # Pieces longer than a window can be counted off by a token, and runs of spaces chain into long pieces
+        longest = max(map(len, regex.findall(pattern, text)), default=0)
+        window_size = max(generator.randint(41, 90), longest + 1)
+        chunks = list(chunk_text(text, max_tokens, overlap, token_counter, window_size))
+
+        for chunk in chunks:
+            assert chunk.token_count == len(
+                token_counter.encoding.encode_ordinary(chunk.text)
+            )
+            # A single character can take more tokens than a chunk
+            assert chunk.token_count <= max_tokens or len(chunk.text) == 1
+        if not overlap:
+            assert "".join(chunk.text for chunk in chunks) == text
+
+
+def test_chunk_ending_in_whitespace() -> None:
+    """Test that the whitespace at the end of a chunk is counted as the end of its text."""
+    token_counter = TokenCounter(model=MODEL)
+
+    # The spaces are two pieces before the digit, and a single piece at the end of the chunk
+    for text in ["a  2", "a  \n\n  2", "word   (x)"]:
+        for max_tokens in range(1, 6):
+            for chunk in chunk_text(text, max_tokens, token_counter=token_counter):
+                assert chunk.token_count == len(
+                    token_counter.encoding.encode_ordinary(chunk.text)
+                )
+
+
+def test_chunk_after_a_cut_piece() -> None:
+    """Test that the last part of a cut piece is not joined with the following pieces."""
+    token_counter = TokenCounter(model=MODEL)
+
+    # The last part of "!!'" would join "sa" into a contraction
+    for text in ["!!'sa1", "!!'sa1 !!'tb"]:
+        for max_tokens in range(1, 4):
+            chunks = list(chunk_text(text, max_tokens, token_counter=token_counter))
+            for chunk in chunks:
+                assert chunk.token_count == len(
+                    token_counter.encoding.encode_ordinary(chunk.text)
+                )
+                assert chunk.token_count <= max_tokens or len(chunk.text) == 1
+            assert "".join(chunk.text for chunk in chunks) == text
+
+
+def test_sources(tmp_path: Path) -> None:
+    """Test that a string, a file path and a memory-mapped file give the same chunks."""
+    token_counter = TokenCounter(model=MODEL)
+    generator = random.Random(1)  # noqa: S311
+    words = ["héllo", " world", "\n\n", "中文", " 😀", "12345", ", and"]
+    text = "".join(generator.choice(words) for _ in range(5000))
+    path = tmp_path / "document.txt"
+    path.write_text(text, encoding="utf-8")
+
+    # Windows of an odd number of bytes cut the multibyte characters of the file
+    expected = list(chunk_text(text, 50, 10, token_counter, window_size=97))
+    assert list(chunk_text(path, 50, 10, token_counter, window_size=97)) == expected
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert list(chunk_text(mapped, 50, 10, token_counter)) == expected
+
+    (whole,) = chunk_text(path, len(text), token_counter=token_counter)
+    assert whole.token_count == token_counter.string_tokens(text)
+
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    assert list(chunk_text(empty, 10)) == []
+    assert list(chunk_text("", 10)) == []
+
+
+def test_chunk_text_arguments() -> None:
+    """Test that a chunk must fit more tokens than its overlap."""
+    with pytest.raises(ValueError):
+        next(chunk_text("hello", 0))
+    with pytest.raises(ValueError):
+        next(chunk_text("hello", 10, 10))
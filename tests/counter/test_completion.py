@@ -0,0 +1,102 @@
+import random
+from typing import Any
+
+from openai_token_counter import CompletionTokenCounter
+from openai_token_counter.completion import MAX_PENDING_LENGTH
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_running_count_matches_full_count() -> None:
+    """Test that the count of a text streamed in random fragments matches the count of the whole text."""
+    token_counter = TokenCounter(model=MODEL)
+    # Fragments where the split of the text changes at the boundaries: words, numbers, runs of whitespace,
+    # contractions and punctuation
+    alphabet = ["a", "b", "H", " ", "  ", "\n", "\r\n", "'", "s", "t", "re", "1", "2"]
+    alphabet += ["!", "?", "é", "中", "\t", " the", "don", "/", "_", "😀"]
+    generator = random.Random(0)  # noqa: S311
+
+    for _ in range(2000):
+        text = "".join(generator.choices(alphabet, k=generator.randint(1, 30)))
+        counter = CompletionTokenCounter(token_counter)
+        start = 0
+        while start < len(text):
+            end = start + generator.randint(1, 4)
+            counter.add_text(text[start:end])
+            start = end
+
+        assert counter.token_count == len(token_counter.encoding.encode_ordinary(text))
+
+
+def test_long_piece_in_small_deltas() -> None:
+    """Test that a long run of a single piece keeps a bounded tail, so each delta costs the same."""
+    token_counter = TokenCounter(model=MODEL)
+    generator = random.Random(1)  # noqa: S311
+    # Letters without spaces, and CJK text without punctuation
+    texts = [
+        ("".join(generator.choices("abcdefghij", k=20_000)), 4),
+        ("".join(chr(generator.randint(0x4E00, 0x4E40)) for _ in range(6000)), 2),
+    ]
+
+    for text, size in texts:
+        counter = CompletionTokenCounter(token_counter)
+        for start in range(0, len(text), size):
+            counter.add_text(text[start : start + size])
+            assert len(counter._tails["content"][0]) <= MAX_PENDING_LENGTH + size
+
+        # A merge across a cut of the run is the only difference with the whole count
+        exact = len(token_counter.encoding.encode_ordinary(text))
+        assert abs(counter.token_count - exact) <= len(text) // MAX_PENDING_LENGTH
+
+
+def chunk(index: int, delta: dict[str, Any]) -> dict[str, Any]:
+    """Build a streamed chunk with the delta of a choice.
+
+    Args:
+        index (int): The index of the choice.
+        delta (dict[str, Any]): The delta.
+
+    Returns:
+        dict[str, Any]: The chunk.
+    """
+    return {"choices": [{"index": index, "delta": delta}]}
+
+
+def test_chunks() -> None:
+    """Test that the content, the function call and each tool call of each choice are counted as separate strings."""
+    token_counter = TokenCounter(model=MODEL)
+    content = "The weather in Paris is sunny, 22 degrees. Tomorrow will be rainy."
+    arguments = ['{"city": "Paris"}', '{"city": "London", "unit": "celsius"}']
+
+    # A content in choice 0, a function call in choice 1 and two parallel tool calls in choice 2
+    chunks = [chunk(0, {"role": "assistant", "content": ""})]
+    chunks += [
+        chunk(0, {"content": content[start : start + 5]})
+        for start in range(0, len(content), 5)
+    ]
+    chunks.append(chunk(1, {"function_call": {"name": "get_weather", "arguments": ""}}))
+    chunks += [
+        chunk(1, {"function_call": {"arguments": arguments[0][start : start + 3]}})
+        for start in range(0, len(arguments[0]), 3)
+    ]
+    for index in range(len(arguments)):
+        tool_call = {"index": index, "id": f"call_{index}", "type": "function"}
+        tool_call["function"] = {"name": "get_weather"}
+        chunks.append(chunk(2, {"tool_calls": [tool_call]}))
+    for start in range(0, len(arguments[1]), 4):
+        tool_calls = [
+            {"index": index, "function": {"arguments": fragments[start : start + 4]}}
+            for index, fragments in enumerate(arguments)
+        ]
+        chunks.append(chunk(2, {"tool_calls": tool_calls}))
+    chunks.append({"choices": [], "usage": None})
+
+    counter = CompletionTokenCounter(token_counter)
+    counts = [counter.add_chunk(event) for event in chunks]
+
+    strings = [content, "get_weather", arguments[0]]
+    strings += ["get_weather", arguments[0], "get_weather", arguments[1]]
+    assert counts[0] == 0
+    assert counts[-1] == sum(token_counter.string_tokens(string) for string in strings)
@@ -0,0 +1,82 @@
+import random
+from typing import Any
+
+from openai_token_counter import ConversationTokenCounter, get_token_counter
+from openai_token_counter.models import OpenAIFunction, OpenAIMessage, OpenAIRequest
+
+
+MODEL = "gpt-3.5-turbo"
+
+functions = [
+    OpenAIFunction.model_validate(
+        {
+            "name": "search",
+            "description": "Search the knowledge base",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string"}},
+                "required": ["query"],
+            },
+        }
+    )
+]
+raw_messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "system", "name": "example_user", "content": "Be brief."},
+    {"role": "user", "content": "What is the capital of France?"},
+    {
+        "role": "assistant",
+        "function_call": {"name": "search", "arguments": '{"query": "capital"}'},
+    },
+    {"role": "function", "name": "search", "content": "Paris"},
+    {"role": "assistant", "content": "The capital of France is Paris."},
+]
+messages = [OpenAIMessage.model_validate(message) for message in raw_messages]
+
+
+def full_count(conversation: ConversationTokenCounter, **request: Any) -> int:
+    """Count the conversation from scratch.
+
+    Args:
+        conversation (ConversationTokenCounter): The conversation to count.
+        **request (Any): The functions and function call of the conversation.
+
+    Returns:
+        int: The token count.
+    """
+    return get_token_counter(MODEL).estimate_token_count(
+        OpenAIRequest(messages=conversation.messages, **request)
+    )
+
+
+def test_conversation_matches_full_count() -> None:
+    """Test that random updates of a conversation keep the count equal to a full recount."""
+    rng = random.Random(1234)  # noqa: S311
+
+    requests: list[dict[str, Any]] = [
+        {},
+        {"functions": functions},
+        {"functions": functions, "function_call": {"name": "search"}},
+        {"function_call": "none"},
+    ]
+    for request in requests:
+        conversation = ConversationTokenCounter(
+            get_token_counter(MODEL), messages[:2], **request
+        )
+        assert conversation.token_count == full_count(conversation, **request)
+
+        for _ in range(200):
+            operation = rng.choice(["append", "append", "pop", "replace", "truncate"])
+            if operation == "append" or not len(conversation):
+                tokens = conversation.append(rng.choice(messages))
+            elif operation == "pop":
+                conversation.pop(rng.randrange(len(conversation)))
+                tokens = conversation.token_count
+            elif operation == "replace":
+                tokens = conversation.replace(
+                    rng.randrange(len(conversation)), rng.choice(messages)
+                )
+            else:
+                tokens = conversation.truncate(rng.randrange(len(conversation) + 1))
+
+            assert tokens == full_count(conversation, **request)
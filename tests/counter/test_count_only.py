@@ -0,0 +1,18 @@
+from openai_token_counter.token_counter import COUNT_ONLY_MIN_LENGTH, TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_count_only_matches_token_list() -> None:
+    """Test that counting without a token list gives the same count as the token list."""
+    list_counter = TokenCounter(model=MODEL, count_only=False)
+    count_only_counter = TokenCounter(model=MODEL, count_only=True)
+
+    # A lone surrogate, as left by JSON decoding a cut emoji, is replaced like encode does
+    long_strings = ["hello world, ünïcode! " * COUNT_ONLY_MIN_LENGTH]
+    long_strings.append("x " * COUNT_ONLY_MIN_LENGTH + "\ud83d")
+    for string in ["", "hello world", *long_strings]:
+        assert count_only_counter.string_tokens(string) == list_counter.string_tokens(
+            string
+        )
@@ -0,0 +1,103 @@
+from typing import Any
+
+from openai_token_counter.cache import CacheInfo, LRUCache
+from openai_token_counter.models import OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+functions: list[dict[str, Any]] = [
+    {
+        "name": "get_weather",
+        "description": "Get the weather",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string"},
+                "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
+            },
+            "required": ["city"],
+        },
+    }
+]
+messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "What is the weather in Paris?"},
+]
+
+
+def test_function_cache_hits() -> None:
+    """Test that the function definitions are counted once and then served from the cache."""
+    uncached = TokenCounter(model=MODEL, function_cache_size=0)
+    counter = TokenCounter(model=MODEL)
+    request = OpenAIRequest.model_validate(
+        {"messages": messages, "functions": functions}
+    )
+
+    expected = uncached.estimate_token_count(request)
+
+    assert counter.estimate_token_count(request) == expected
+    assert counter.estimate_token_count(request) == expected
+    assert counter.estimate_raw_token_count(messages, functions) == expected
+    assert counter.estimate_raw_token_count(messages, functions) == expected
+    assert counter.function_cache.info() == CacheInfo(
+        hits=2, misses=2, maxsize=128, currsize=2
+    )
+
+    counter.clear_function_cache()
+    assert counter.function_cache.info() == CacheInfo(
+        hits=0, misses=0, maxsize=128, currsize=0
+    )
+    assert uncached.function_cache.info().currsize == 0
+
+
+def test_function_cache_distinguishes_property_order() -> None:
+    """Test that reordering the properties, which changes the definitions, is a different cache entry."""
+    reordered = [
+        {
+            **functions[0],
+            "parameters": {
+                **functions[0]["parameters"],
+                "properties": dict(
+                    reversed(functions[0]["parameters"]["properties"].items())
+                ),
+            },
+        }
+    ]
+    counter = TokenCounter(model=MODEL)
+
+    counter.estimate_raw_token_count(messages, functions)
+    counter.estimate_raw_token_count(messages, reordered)
+
+    assert counter.function_cache.info().misses == 2
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """Test that the cache evicts the least recently used entry when full."""
+    cache: LRUCache[str, int] = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.pop("c") == 3
+    assert cache.info() == CacheInfo(hits=3, misses=1, maxsize=2, currsize=1)
+
+
+def test_lru_cache_setdefault() -> None:
+    """Test that setdefault keeps the cached entry, and adds a missing one like put."""
+    cache: LRUCache[str, int] = LRUCache(2)
+    assert cache.setdefault("a", 1) == 1
+    assert cache.setdefault("a", 2) == 1
+    cache.put("b", 2)
+    cache.setdefault("a", 3)
+    cache.setdefault("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.info() == CacheInfo(hits=2, misses=3, maxsize=2, currsize=2)
+    assert LRUCache[str, int](0).setdefault("a", 1) == 1
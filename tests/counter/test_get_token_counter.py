@@ -0,0 +1,20 @@
+from openai_token_counter import TokenCounter, get_token_counter
+
+
+def test_get_token_counter_is_shared() -> None:
+    """Test that the same token counter is returned for the same model."""
+    counter = get_token_counter("gpt-3.5-turbo")
+
+    assert get_token_counter("gpt-3.5-turbo") is counter
+    assert get_token_counter(None) is not counter
+    assert counter.model == "gpt-3.5-turbo"
+
+
+def test_encoding_is_resolved_once() -> None:
+    """Test that the token counter resolves its encoding once and keeps it."""
+    counter = TokenCounter(model="gpt-3.5-turbo")
+
+    assert counter.encoding is counter.encoding
+    assert counter.string_tokens("hello world") == len(
+        counter.encoding.encode("hello world")
+    )
@@ -0,0 +1,168 @@
+import base64
+import struct
+import zlib
+from typing import Any
+
+import pytest
+
+from openai_token_counter import get_model_spec, openai_token_counter
+from openai_token_counter.images import image_tokens, image_url_size
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-4o"
+
+
+def png(width: int, height: int) -> bytes:
+    """Build a PNG image of a size.
+
+    Args:
+        width (int): The width.
+        height (int): The height.
+
+    Returns:
+        bytes: The image.
+    """
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        """Build a PNG chunk.
+
+        Args:
+            kind (bytes): The chunk type.
+            data (bytes): The chunk data.
+
+        Returns:
+            bytes: The chunk.
+        """
+        checksum = zlib.crc32(kind + data)
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", checksum)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    pixels = zlib.compress(b"\0" * (height * (width + 1)))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", pixels)
+        + chunk(b"IEND", b"")
+    )
+
+
+def jpeg(width: int, height: int, metadata: int) -> bytes:
+    """Build the segments of a JPEG image up to its start of frame, after metadata of a size.
+
+    Args:
+        width (int): The width.
+        height (int): The height.
+        metadata (int): The size of the metadata segments.
+
+    Returns:
+        bytes: The image, with its pixels replaced by filler bytes.
+    """
+    segments = [b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\1\1\0\0\1\0\1\0\0"]
+    while metadata > 0:
+        size = min(metadata, 65533)
+        segments.append(b"\xff\xe1" + struct.pack(">H", size + 2) + b"\xab" * size)
+        metadata -= size
+    segments.append(b"\xff\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1))
+    return b"\xff\xd8" + b"".join(segments) + b"\x00" * 1000
+
+
+def data_url(image: bytes, kind: str = "png") -> str:
+    """Encode an image as a base64 data URL.
+
+    Args:
+        image (bytes): The image.
+        kind (str): The image type.
+
+    Returns:
+        str: The data URL.
+    """
+    return f"data:image/{kind};base64,{base64.b64encode(image).decode()}"
+
+
+@pytest.mark.parametrize(
+    ("image", "size"),
+    [
+        (png(1, 1), (1, 1)),
+        (png(1280, 720), (1280, 720)),
+        (b"GIF89a" + struct.pack("<HH", 640, 480) + b"\0" * 20, (640, 480)),
+        (
+            b"RIFF\0\0\0\0WEBPVP8 \0\0\0\0\0\0\0\x9d\x01\x2a"
+            + struct.pack("<HH", 800, 600),
+            (800, 600),
+        ),
+        (
+            b"RIFF\0\0\0\0WEBPVP8L\0\0\0\0\x2f"
+            + (1023 | (767 << 14)).to_bytes(4, "little"),
+            (1024, 768),
+        ),
+        (
+            b"RIFF\0\0\0\0WEBPVP8X\0\0\0\0\0\0\0\0"
+            + (3999).to_bytes(3, "little")
+            + (2999).to_bytes(3, "little"),
+            (4000, 3000),
+        ),
+        (jpeg(3024, 4032, 0), (3024, 4032)),
+        (jpeg(3024, 4032, 200000), (3024, 4032)),
+        (b"not an image" * 10, None),
+        (b"\x89PNG", None),
+    ],
+)
+def test_image_url_size(image: bytes, size: Any) -> None:
+    """Test that the size of an image is read from the header of its data URL."""
+    assert image_url_size(data_url(image)) == size
+
+
+def test_image_url_size_reads_only_the_header() -> None:
+    """Test that the metadata of a JPEG image is skipped, even when it is not valid base64."""
+    image = data_url(jpeg(100, 50, 100000))
+    header, payload = image.split(",")
+    # Corrupt the payload in the middle of the metadata, which is never decoded
+    corrupted = f"{header},{payload[:1000]}{'!' * 1000}{payload[2000:]}"
+
+    assert image_url_size(corrupted) == (100, 50)
+    assert image_url_size("https://example.com/image.png") is None
+    assert image_url_size("data:image/png,plain") is None
+
+
+def test_image_tokens() -> None:
+    """Test the token counts of the documented examples."""
+    spec = get_model_spec(MODEL)
+
+    assert image_tokens(1024, 1024, "high", spec) == 765
+    assert image_tokens(2048, 4096, "high", spec) == 1105
+    assert image_tokens(4096, 8192, "low", spec) == 85
+    assert image_tokens(2048, 4096, None, spec) == 1105
+    assert image_tokens(None, None, "high", spec) == 85 + 8 * 170
+    assert image_tokens(1024, 1024, "high", get_model_spec("gpt-4o-mini")) == (
+        2833 + 4 * 5667
+    )
+
+
+def test_content_parts() -> None:
+    """Test that text parts are counted as strings and images from their size."""
+    counter = TokenCounter(model=MODEL)
+    messages: list[dict[str, Any]] = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "What is in this image?"},
+                {"type": "image_url", "image_url": {"url": data_url(png(1024, 1024))}},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": "https://example.com/a.png", "detail": "low"},
+                },
+            ],
+        }
+    ]
+    text = [{"role": "user", "content": "What is in this image?"}]
+
+    expected = openai_token_counter(text, MODEL) + 765 + 85
+    assert openai_token_counter(messages, MODEL) == expected
+    assert openai_token_counter(messages, MODEL, validate=False) == expected
+    assert counter.estimate_raw_token_count(messages, approximate=True) >= expected
+
+    with pytest.raises(ValueError):
+        counter.truncate_message(
+            counter.validate_request({"messages": messages}).messages[0], 100
+        )
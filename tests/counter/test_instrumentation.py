@@ -0,0 +1,81 @@
+import json
+from typing import Any
+
+from openai_token_counter import get_token_counter, openai_token_counter_json
+from openai_token_counter.instrumentation import PhaseEvent, PhaseMetrics
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+functions: list[dict[str, Any]] = [
+    {
+        "name": "get_weather",
+        "description": "Get the weather",
+        "parameters": {
+            "type": "object",
+            "properties": {"city": {"type": "string"}},
+            "required": ["city"],
+        },
+    }
+]
+messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "What is the weather in Paris?"},
+]
+
+
+def test_phases_reported_to_callback() -> None:
+    """Test that each phase of a count is reported, and that the counts don't change."""
+    expected = TokenCounter(model=MODEL).estimate_raw_token_count(messages, functions)
+    events: list[PhaseEvent] = []
+    counter = TokenCounter(model=MODEL, metrics=events.append)
+
+    request = counter.validate_request({"messages": messages, "functions": functions})
+
+    assert counter.estimate_token_count(request) == expected
+    phases = [event.phase for event in events]
+    assert phases[:2] == ["validation", "formatting"]
+    assert set(phases[2:]) == {"encoding"}
+    assert events[1].size > 0 and events[1].tokens == 0
+    # Every token but the fixed overheads of the messages, the reply and the functions is encoded
+    overhead = 3 * len(messages) + 3 + 9 - 4
+    assert sum(event.tokens for event in events) == expected - overhead
+    assert all(event.seconds >= 0 for event in events)
+
+
+def test_phase_metrics_aggregates() -> None:
+    """Test that the aggregator sums the phases of every count."""
+    metrics = PhaseMetrics()
+    counter = TokenCounter(model=MODEL, metrics=metrics)
+
+    counter.estimate_raw_token_count(messages, functions)
+    counter.estimate_raw_token_count(messages, functions)
+
+    summary = metrics.summary()
+    # The functions are validated and formatted once, then served from the function cache
+    assert summary["validation"].calls == 1
+    assert summary["formatting"].calls == 1
+    assert summary["encoding"].calls == 2 * (2 * len(messages)) + 1
+    # The system message is padded with a newline when there are functions
+    characters = sum(
+        len(message["role"]) + len(message["content"]) + (message["role"] == "system")
+        for message in messages
+    )
+    assert summary["encoding"].size == 2 * characters + summary["formatting"].size
+
+    metrics.reset()
+    assert metrics.summary() == {}
+
+
+def test_json_body_validation_size() -> None:
+    """Test that validating a JSON body reports its size to the counter of its model."""
+    body = json.dumps({"model": MODEL, "messages": messages}).encode()
+    counter = get_token_counter(MODEL)
+    metrics = counter.metrics = PhaseMetrics()
+    try:
+        openai_token_counter_json(body)
+    finally:
+        counter.metrics = None
+
+    assert metrics.summary()["validation"].size == len(body)
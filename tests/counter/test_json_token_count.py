@@ -0,0 +1,47 @@
+import json
+from typing import Any
+
+from openai_token_counter import openai_token_counter, openai_token_counter_json
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_json_token_count_matches_dicts() -> None:
+    """Test that counting a raw request body gives the same result as counting its dicts."""
+    for test_case in test_cases_raw:
+        args: dict[str, Any] = {
+            "messages": test_case["messages"],
+            "functions": test_case.get("functions"),
+            "function_call": test_case.get("function_call"),
+        }
+        expected = openai_token_counter(**args, model=MODEL)
+        body = json.dumps(
+            {
+                "model": MODEL,
+                "temperature": 0.2,
+                "logit_bias": {"50256": -100},
+                **{key: value for key, value in args.items() if value is not None},
+            }
+        )
+
+        for raw in (body, body.encode(), bytearray(body.encode())):
+            assert openai_token_counter_json(raw) == expected
+            assert openai_token_counter_json(raw, validate=False) == expected
+        view = memoryview(body.encode())
+        assert openai_token_counter_json(view) == expected
+        assert openai_token_counter_json(view, validate=False) == expected
+
+
+def test_json_token_count_default_model() -> None:
+    """Test that the model argument is used for bodies without a model."""
+    messages = [{"role": "user", "content": "Hello world"}]
+    body = json.dumps({"messages": messages}).encode()
+
+    assert openai_token_counter_json(body, model=MODEL) == openai_token_counter(
+        messages, MODEL
+    )
+    assert openai_token_counter_json(
+        body, model=MODEL, validate=False
+    ) == openai_token_counter(messages, MODEL)
@@ -0,0 +1,22 @@
+from typing import Any
+
+from openai_token_counter import openai_token_counter
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_raw_token_count_matches_validated() -> None:
+    """Test that counting from plain dicts gives the same result as counting validated requests."""
+    for test_case in test_cases_raw:
+        args: dict[str, Any] = {
+            "messages": test_case["messages"],
+            "model": MODEL,
+            "functions": test_case.get("functions"),
+            "function_call": test_case.get("function_call"),
+        }
+
+        assert openai_token_counter(**args, validate=False) == openai_token_counter(
+            **args
+        )
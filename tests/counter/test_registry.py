@@ -0,0 +1,131 @@
+from collections.abc import Iterator
+
+import pytest
+
+from openai_token_counter import (
+    ModelSpec,
+    TokenCounter,
+    get_model_spec,
+    get_token_counter,
+    openai_token_counter,
+    register_model,
+    registry,
+    token_counter,
+)
+from openai_token_counter.models import OpenAIRequest
+
+
+@pytest.fixture
+def restore_registry() -> Iterator[None]:
+    """Restore the registered models after a test."""
+    models = dict(registry._models)
+    model_prefixes = dict(registry._model_prefixes)
+    yield
+    registry._models.clear()
+    registry._models.update(models)
+    registry._model_prefixes.clear()
+    registry._model_prefixes.update(model_prefixes)
+    registry._resolved.clear()
+    token_counter._token_counters.clear()
+
+
+def test_model_spec_lookup() -> None:
+    """Test that models are resolved by name, then by prefix, then by tiktoken."""
+    assert get_model_spec("gpt-4").context_window == 8192
+    assert get_model_spec("gpt-4-0613").context_window == 8192
+    assert get_model_spec("gpt-4-32k-0613").context_window == 32768
+    assert get_model_spec("gpt-4o-2024-08-06").encoding == "o200k_base"
+    assert get_model_spec("gpt-35-turbo-16k").encoding == "cl100k_base"
+    assert get_model_spec("ft:gpt-4o-mini-2024-07-18:org::id") == get_model_spec(
+        "gpt-4o-mini"
+    )
+    assert get_model_spec("ft:gpt-4o-2024-08-06:org::id") == get_model_spec("gpt-4o")
+    assert get_model_spec(None) == ModelSpec()
+
+
+def test_gpt_35_turbo_0301_overheads() -> None:
+    """Test that gpt-3.5-turbo-0301 adds a token per message, and replaces the role with the name."""
+    messages = [{"role": "user", "content": "Hello world"}]
+    named = [{"role": "user", "name": "bob", "content": "Hello world"}]
+
+    assert openai_token_counter(messages, "gpt-3.5-turbo-0301") == (
+        openai_token_counter(messages, "gpt-3.5-turbo") + 1
+    )
+    assert openai_token_counter(named, "gpt-3.5-turbo-0301") == (
+        openai_token_counter(named, "gpt-3.5-turbo") - 1
+    )
+
+
+def test_unknown_model_uses_default_spec() -> None:
+    """Test that an unknown model is counted with the default spec instead of failing."""
+    messages = [{"role": "user", "content": "Hello world"}]
+
+    assert get_model_spec("my-model") == ModelSpec()
+    assert openai_token_counter(messages, "my-model") == openai_token_counter(messages)
+
+
+def test_untrusted_model_names() -> None:
+    """Test that model names taken from requests don't grow the resolved specs and the shared counters."""
+    messages = [{"role": "user", "content": "Hello world"}]
+    expected = openai_token_counter(messages, "gpt-4")
+
+    for index in range(2000):
+        assert get_token_counter(f"my-model-{index}") is get_token_counter()
+        assert openai_token_counter(messages, f"gpt-4-{index}") == expected
+
+    assert registry._resolved.get("my-model-1999") is registry.DEFAULT_MODEL_SPEC
+    assert registry._resolved.info().currsize <= registry.RESOLVED_CACHE_SIZE
+    assert (
+        token_counter._token_counters.info().currsize
+        <= token_counter.SHARED_COUNTERS_SIZE
+    )
+
+
+@pytest.mark.usefixtures("restore_registry")
+def test_unknown_model_is_resolved_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that an unknown model name is looked up in the prefixes and tiktoken only once."""
+    calls: list[str] = []
+    resolve_model_spec = registry._resolve_model_spec
+
+    def record_call(model: str) -> ModelSpec:
+        calls.append(model)
+        return resolve_model_spec(model)
+
+    monkeypatch.setattr(registry, "_resolve_model_spec", record_call)
+    registry._resolved.clear()
+
+    for _ in range(3):
+        assert get_model_spec("my-unknown-model") is registry.DEFAULT_MODEL_SPEC
+        assert get_token_counter("my-unknown-model") is get_token_counter()
+    assert calls == ["my-unknown-model"]
+
+
+def test_register_model() -> None:
+    """Test that a registered spec overrides the counting of a model."""
+    messages = [
+        {"role": "user", "content": "Hello world"},
+        {"role": "user", "name": "bob", "content": "Hello"},
+    ]
+    default_count = openai_token_counter(messages, "my-model")
+
+    register_model("my-", ModelSpec(tokens_per_message=4, tokens_per_name=0), True)
+
+    assert get_model_spec("my-model").tokens_per_message == 4
+    assert openai_token_counter(messages, "my-model") == default_count + 1
+
+
+def test_remaining_completion_tokens() -> None:
+    """Test that the remaining completion tokens are the context window minus the prompt."""
+    request = OpenAIRequest.model_validate(
+        {"messages": [{"role": "user", "content": "Hello world"}]}
+    )
+    counter = get_token_counter("gpt-4")
+    prompt_tokens = counter.estimate_token_count(request)
+
+    assert counter.remaining_completion_tokens(request) == 8192 - prompt_tokens
+    assert TokenCounter(
+        model_spec=ModelSpec(context_window=100)
+    ).remaining_completion_tokens(request) == (100 - prompt_tokens)
+
+    with pytest.raises(ValueError):
+        get_token_counter("my-model").remaining_completion_tokens(request)
@@ -0,0 +1,140 @@
+import io
+from collections.abc import Iterator
+from typing import Any, Union
+
+import pytest
+
+from openai_token_counter import (
+    ConversationTokenCounter,
+    openai_token_counter,
+    trim_request,
+)
+from openai_token_counter.completion import MAX_PENDING_LENGTH
+from openai_token_counter.models import OpenAIFunction, OpenAIMessage, OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+LOG = "".join(
+    f"2024-05-01T12:00:{second:02d}Z INFO  worker-{second % 7} processed job #{second * 31} in {second * 1.7:.1f}ms\n"
+    for second in range(60)
+)
+
+
+def chunks(text: str, size: int) -> Iterator[str]:
+    """Split a text into chunks of a size.
+
+    Args:
+        text (str): The text.
+        size (int): The size of the chunks.
+
+    Yields:
+        str: The chunks.
+    """
+    for start in range(0, len(text), size):
+        yield text[start : start + size]
+
+
+def test_streamed_content_matches_string() -> None:
+    """Test that a content given as chunks or as a file counts the same as the string, padded or not."""
+    token_counter = TokenCounter(model=MODEL)
+
+    for pad in (False, True):
+        expected = token_counter.estimate_tokens_in_messages(
+            OpenAIMessage(role="tool", content=LOG), pad=pad
+        )
+        for stream in [chunks(LOG, 1), chunks(LOG, 13), io.StringIO(LOG)]:
+            message = OpenAIMessage(role="tool", content=stream)
+            assert (
+                token_counter.estimate_tokens_in_messages(message, pad=pad) == expected
+            )
+
+    # An empty stream is not padded, like an empty string
+    assert token_counter.estimate_tokens_in_messages(
+        OpenAIMessage(role="user", content=iter([])), pad=True
+    ) == token_counter.estimate_tokens_in_messages(OpenAIMessage(role="user"))
+
+
+def test_streamed_content_in_requests() -> None:
+    """Test that streamed contents are counted with and without validation."""
+    messages: list[dict[str, Any]] = [
+        {"role": "system", "content": "Summarize the log."},
+        {"role": "user", "content": LOG},
+    ]
+    expected = openai_token_counter(messages, MODEL)
+
+    for validate in (True, False):
+        streamed = [messages[0], {"role": "user", "content": chunks(LOG, 100)}]
+        assert openai_token_counter(streamed, MODEL, validate=validate) == expected
+
+
+def test_streamed_content_is_not_truncated() -> None:
+    """Test that a streamed content can't be truncated, since counting it would consume it."""
+    token_counter = TokenCounter(model=MODEL)
+    message = OpenAIMessage(role="user", content=chunks(LOG, 100))
+
+    with pytest.raises(ValueError):
+        token_counter.truncate_message(message, 10_000)
+
+
+def test_streamed_content_is_not_counted_twice() -> None:
+    """Test that a conversation or a trim, which may count a message again padded, rejects a streamed content."""
+    token_counter = TokenCounter(model=MODEL)
+    function = OpenAIFunction.model_validate(
+        {"name": "summarize", "parameters": {"type": "object", "properties": {}}}
+    )
+
+    with pytest.raises(ValueError):
+        ConversationTokenCounter(
+            token_counter,
+            [OpenAIMessage(role="system", content=chunks(LOG, 100))],
+            functions=[function],
+        )
+
+    conversation = ConversationTokenCounter(
+        token_counter, [OpenAIMessage(role="system", content=LOG)]
+    )
+    with pytest.raises(ValueError):
+        conversation.replace(0, OpenAIMessage(role="system", content=io.StringIO(LOG)))
+    assert len(conversation) == 1
+
+    request = OpenAIRequest(
+        messages=[OpenAIMessage(role="system", content=chunks(LOG, 100))],
+        functions=[function],
+    )
+    with pytest.raises(ValueError):
+        trim_request(request, 10_000, token_counter=token_counter)
+
+
+def test_long_streamed_piece(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a long run of a single piece given in small chunks is not encoded again whole with every chunk."""
+    token_counter = TokenCounter(model=MODEL)
+    encoding = token_counter.encoding
+    encode_piece = encoding._encode_single_piece
+    encoded = 0
+
+    def counting_encode_piece(piece: Union[str, bytes]) -> list[int]:
+        """Encode a piece, and count its characters.
+
+        Args:
+            piece (Union[str, bytes]): The piece.
+
+        Returns:
+            list[int]: The tokens of the piece.
+        """
+        nonlocal encoded
+        encoded += len(piece.decode() if isinstance(piece, bytes) else piece)
+        return encode_piece(piece)
+
+    monkeypatch.setattr(encoding, "_encode_single_piece", counting_encode_piece)
+
+    for text in ["=" * 20_000, "abcdefghij" * 2000, "中文数据" * 1500]:
+        for size in (1, 3, 4096):
+            encoded = 0
+            tokens = token_counter.stream_tokens(chunks(text, size))
+
+            # Each chunk encodes at most the kept end of the run and the chunk again
+            assert encoded <= -(-len(text) // size) * 2 * (MAX_PENDING_LENGTH + size)
+            exact = len(encode_piece(text))
+            assert abs(tokens - exact) <= len(text) // MAX_PENDING_LENGTH
@@ -0,0 +1,156 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from openai_token_counter import token_counter
+from openai_token_counter.cache import (
+    SQLITE_MIN_LENGTH,
+    MemoryTokenCountCache,
+    SQLiteTokenCountCache,
+    TokenCountCache,
+)
+from openai_token_counter.models import OpenAIMessage, OpenAIRequest
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a helpful assistant. " * 20
+DOCUMENT = "A retrieved document that is shared by many users. " * 40
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request: pytest.FixtureRequest, tmp_path: Path) -> TokenCountCache:
+    """Create a token count cache for each backend.
+
+    Args:
+        request (pytest.FixtureRequest): The fixture request.
+        tmp_path (Path): A temporary directory.
+
+    Returns:
+        TokenCountCache: The cache.
+    """
+    if request.param == "memory":
+        return MemoryTokenCountCache()
+    # Every hit marks the entry as used, and the strings of the tests are cached like in memory
+    return SQLiteTokenCountCache(
+        str(tmp_path / "tokens.sqlite"), min_length=0, touch_interval=0
+    )
+
+
+def test_string_cache_counts(cache: TokenCountCache) -> None:
+    """Test that cached counts are identical to encoding, and that repeated strings hit the cache."""
+    uncached = TokenCounter(model=MODEL)
+    counter = TokenCounter(model=MODEL, string_cache=cache)
+    requests = [
+        OpenAIRequest(
+            messages=[
+                OpenAIMessage(role="system", content=SYSTEM_PROMPT),
+                OpenAIMessage(role="user", content=f"Question {index}: {DOCUMENT}"),
+            ]
+        )
+        for index in range(3)
+    ]
+
+    for request in requests:
+        assert counter.estimate_token_count(request) == uncached.estimate_token_count(
+            request
+        )
+    assert counter.estimate_token_counts(requests) == uncached.estimate_token_counts(
+        requests
+    )
+
+    info = cache.info()
+    assert info.misses == 4
+    assert info.hits == 6
+    assert info.entries == 4
+    assert info.evictions == 0
+
+
+def test_short_strings_are_counted_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the counts of the first short strings are kept, and not those of long strings or with metrics."""
+    monkeypatch.setattr(token_counter, "SHORT_STRING_CACHE_SIZE", 2)
+    strings = ["system", "user", "Hello world", "system", "user", "Hello world"]
+
+    def encoded(counter: TokenCounter, strings: list[str]) -> list[str]:
+        calls: list[str] = []
+        encode_count = counter._encode_count
+
+        def record_call(string: str) -> int:
+            calls.append(string)
+            return encode_count(string)
+
+        monkeypatch.setattr(counter, "_encode_count", record_call)
+        counts = [counter.string_tokens(string) for string in strings]
+        assert counts == [TokenCounter(model=MODEL).string_tokens(s) for s in strings]
+        return calls
+
+    assert encoded(TokenCounter(model=MODEL), strings) == strings[:3] + ["Hello world"]
+    assert encoded(TokenCounter(model=MODEL), [DOCUMENT] * 2) == [DOCUMENT] * 2
+
+    events: list[Any] = []
+    assert encoded(TokenCounter(model=MODEL, metrics=events.append), strings) == strings
+
+
+def test_string_cache_evicts_by_size(cache: TokenCountCache) -> None:
+    """Test that the least recently used entries are evicted when the cache is full."""
+    cache.put("key1", 1)
+    entry_size = cache.info().size
+    cache.max_size = 3 * entry_size
+
+    cache.put("key2", 2)
+    cache.put("key3", 3)
+    assert cache.get("key1") == 1
+    cache.put("key4", 4)
+
+    assert cache.get("key2") is None
+    assert cache.get("key1") == 1
+    assert cache.info().evictions == 1
+    assert cache.info().entries == 3
+
+    cache.clear()
+    assert cache.info().entries == 0
+
+
+def test_sqlite_cache_is_shared(tmp_path: Path) -> None:
+    """Test that two caches opened on the same file share their entries."""
+    path = str(tmp_path / "tokens.sqlite")
+    first = TokenCounter(model=MODEL, string_cache=SQLiteTokenCountCache(path))
+    second = TokenCounter(model=MODEL, string_cache=SQLiteTokenCountCache(path))
+    content = "x" * SQLITE_MIN_LENGTH
+
+    tokens = first.string_tokens(content)
+
+    assert second.string_tokens(content) == tokens
+    assert second.string_cache is not None
+    assert second.string_cache.info().hits == 1
+
+
+def test_sqlite_cache_lookups_are_reads(tmp_path: Path) -> None:
+    """Test that the SQLite cache skips the strings that encode faster, and marks an entry used once per interval."""
+    cache = SQLiteTokenCountCache(str(tmp_path / "tokens.sqlite"))
+    counter = TokenCounter(model=MODEL, string_cache=cache)
+
+    counter.string_tokens("y" * (SQLITE_MIN_LENGTH - 1))
+    assert cache.info().entries == 0
+
+    def used() -> int:
+        """Get the last use of the only entry.
+
+        Returns:
+            int: The time of the last use, in nanoseconds.
+        """
+        return int(
+            cache._connection().execute("SELECT used FROM entries").fetchone()[0]
+        )
+
+    content = "x" * SQLITE_MIN_LENGTH
+    counter.string_tokens(content)
+    inserted = used()
+    counter.string_tokens(content)
+    assert cache.info().hits == 1
+    assert used() == inserted
+
+    cache.touch_interval = 0
+    counter.string_tokens(content)
+    assert used() > inserted
@@ -0,0 +1,28 @@
+from typing import Any
+
+from openai_token_counter import openai_token_counter, openai_token_counts
+from openai_token_counter.token_counter import BATCH_INLINE_MAX_LENGTH
+from tests.counter.resources import test_cases_raw
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_token_counts_match_token_counter() -> None:
+    """Test that the batch token counter matches the single request token counter."""
+    requests: list[dict[str, Any]] = [
+        {
+            "messages": test_case["messages"],
+            "functions": test_case.get("functions"),
+            "function_call": test_case.get("function_call"),
+        }
+        for test_case in test_cases_raw
+    ]
+    requests.append(
+        {"messages": [{"role": "user", "content": "hello " * BATCH_INLINE_MAX_LENGTH}]}
+    )
+
+    expected = [openai_token_counter(model=MODEL, **request) for request in requests]
+
+    assert openai_token_counts(requests, model=MODEL) == expected
+    assert openai_token_counts([], model=MODEL) == []
@@ -0,0 +1,126 @@
+import json
+from typing import Any
+
+from openai_token_counter import openai_token_counter, openai_token_counter_json
+from openai_token_counter.models import request_adapter
+from openai_token_counter.token_counter import TokenCounter
+
+
+MODEL = "gpt-3.5-turbo"
+
+functions: list[dict[str, Any]] = [
+    {
+        "name": "get_weather",
+        "description": "Get the weather",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string"},
+                "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
+            },
+            "required": ["city"],
+        },
+    },
+    {
+        "name": "get_time",
+        "parameters": {"type": "object", "properties": {"city": {"type": "string"}}},
+    },
+]
+tools: list[dict[str, Any]] = [
+    {"type": "function", "function": function} for function in functions
+]
+messages: list[dict[str, Any]] = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "What is the weather and the time in Paris?"},
+]
+
+
+def test_tools_count_as_functions() -> None:
+    """Test that tools and tool_choice are counted as the equivalent functions and function_call."""
+    choices: list[tuple[Any, Any]] = [
+        (None, None),
+        ("auto", "auto"),
+        ("none", "none"),
+        ("required", "auto"),
+        (
+            {"type": "function", "function": {"name": "get_time"}},
+            {"name": "get_time"},
+        ),
+    ]
+
+    for tool_choice, function_call in choices:
+        expected = openai_token_counter(messages, MODEL, functions, function_call)
+
+        for validate in (True, False):
+            assert (
+                openai_token_counter(
+                    messages,
+                    MODEL,
+                    validate=validate,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                )
+                == expected
+            )
+        body = {"messages": messages, "tools": tools, "tool_choice": tool_choice}
+        for validate in (True, False):
+            assert (
+                openai_token_counter_json(json.dumps(body), MODEL, validate=validate)
+                == expected
+            )
+
+
+def test_tools_share_the_function_cache() -> None:
+    """Test that tools are formatted once, and hit the cache entry of the equivalent functions."""
+    counter = TokenCounter(model=MODEL)
+
+    counter.estimate_token_count(
+        request_adapter.validate_python({"messages": messages, "tools": tools})
+    )
+    counter.estimate_token_count(
+        request_adapter.validate_python({"messages": messages, "functions": functions})
+    )
+    counter.estimate_raw_token_count(messages, tools=tools)
+    counter.estimate_raw_token_count(messages, functions)
+
+    info = counter.function_cache.info()
+    assert (info.hits, info.misses) == (2, 2)
+
+
+def test_tool_calls_and_tool_messages() -> None:
+    """Test that each parallel tool call counts like a function call, and tool messages like function messages."""
+    counter = TokenCounter(model=MODEL)
+    calls = [
+        {"name": "get_weather", "arguments": '{"city": "Paris"}'},
+        {"name": "get_time", "arguments": '{"city": "Paris"}'},
+    ]
+    tool_calls = [
+        {"id": f"call_{index}", "type": "function", "function": call}
+        for index, call in enumerate(calls)
+    ]
+
+    def count(conversation: list[dict[str, Any]]) -> int:
+        validated = counter.estimate_token_count(
+            request_adapter.validate_python({"messages": conversation})
+        )
+        assert counter.estimate_raw_token_count(conversation) == validated
+        return validated
+
+    with_function_calls = count(
+        messages
+        + [{"role": "assistant", "function_call": call} for call in calls]
+        + [{"role": "function", "content": "22 degrees"}]
+        + [{"role": "function", "content": "12:00"}]
+    )
+    with_tool_calls = count(
+        messages
+        + [{"role": "assistant", "tool_calls": tool_calls}]
+        + [{"role": "tool", "tool_call_id": "call_0", "content": "22 degrees"}]
+        + [{"role": "tool", "tool_call_id": "call_1", "content": "12:00"}]
+    )
+
+    # The parallel calls share one assistant message, with its role and message overhead, and the results differ
+    # from the function messages only by their role
+    shared_message = counter.string_tokens("assistant") + 3
+    roles = 2 * (counter.string_tokens("function") - counter.string_tokens("tool"))
+    assert with_tool_calls == with_function_calls - shared_message - roles
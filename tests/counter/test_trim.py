@@ -0,0 +1,111 @@
+import pytest
+
+from openai_token_counter import get_token_counter
+from openai_token_counter.models import OpenAIFunction, OpenAIMessage, OpenAIRequest
+from openai_token_counter.trim import TrimPolicy, trim_request
+
+
+MODEL = "gpt-3.5-turbo"
+
+functions = [
+    OpenAIFunction.model_validate(
+        {
+            "name": "search",
+            "parameters": {"type": "object", "properties": {"q": {"type": "string"}}},
+        }
+    )
+]
+messages = [
+    OpenAIMessage(role="system", content="You are a helpful assistant."),
+    OpenAIMessage(role="user", content="First question, about the weather."),
+    OpenAIMessage(role="assistant", content="It is sunny."),
+    OpenAIMessage(role="system", content="Answer briefly."),
+    OpenAIMessage(role="user", content="Second question, about the news."),
+    OpenAIMessage(role="assistant", content="Nothing new."),
+    OpenAIMessage(role="user", content="Third question?"),
+]
+
+
+def brute_force_trim(
+    request: OpenAIRequest, budget: int, policy: TrimPolicy
+) -> OpenAIRequest:
+    """Trim a request by dropping the oldest messages one at a time and recounting.
+
+    Args:
+        request (OpenAIRequest): The request to trim.
+        budget (int): The token budget.
+        policy (TrimPolicy): The trimming policy.
+
+    Returns:
+        OpenAIRequest: The trimmed request.
+
+    Raises:
+        ValueError: If the request can't fit.
+    """
+    token_counter = get_token_counter(MODEL)
+    first_kept = len(request.messages) - policy.keep_last
+    kept = list(enumerate(request.messages))
+
+    while True:
+        candidate = request.model_copy(
+            update={"messages": [message for _, message in kept]}
+        )
+        if token_counter.estimate_token_count(candidate) <= budget:
+            return candidate
+
+        droppable = [
+            position
+            for position, (index, message) in enumerate(kept)
+            if not (policy.keep_system and message.role == "system")
+            and index < first_kept
+        ]
+        if not droppable:
+            raise ValueError("Doesn't fit")
+        del kept[droppable[0]]
+
+
+@pytest.mark.parametrize("keep_system", [True, False])
+@pytest.mark.parametrize("keep_last", [0, 1, 3])
+@pytest.mark.parametrize("with_functions", [True, False])
+def test_trim_request_matches_brute_force(
+    keep_system: bool, keep_last: int, with_functions: bool
+) -> None:
+    """Test that trimming gives the same request as dropping the oldest messages one by one."""
+    token_counter = get_token_counter(MODEL)
+    policy = TrimPolicy(keep_system=keep_system, keep_last=keep_last)
+    request = OpenAIRequest(
+        messages=messages, functions=functions if with_functions else None
+    )
+    total = token_counter.estimate_token_count(request)
+
+    for budget in range(0, total + 2):
+        try:
+            expected = brute_force_trim(request, budget, policy)
+        except ValueError:
+            with pytest.raises(ValueError):
+                trim_request(request, budget, policy, token_counter)
+            continue
+
+        assert trim_request(request, budget, policy, token_counter) == expected
+
+
+def test_trim_request_truncates_longest() -> None:
+    """Test that the longest content is truncated when dropping messages is not enough."""
+    token_counter = get_token_counter(MODEL)
+    request = OpenAIRequest(
+        messages=[
+            OpenAIMessage(role="system", content="Be brief."),
+            OpenAIMessage(role="user", content="Summarize: " + "lorem ipsum " * 200),
+        ]
+    )
+    budget = 60
+
+    trimmed = trim_request(
+        request, budget, TrimPolicy(truncate_longest=True), token_counter
+    )
+
+    assert token_counter.estimate_token_count(trimmed) <= budget
+    assert trimmed.messages[0] == request.messages[0]
+    content = trimmed.messages[1].content
+    assert isinstance(content, str)
+    assert content.startswith("Summarize: lorem")
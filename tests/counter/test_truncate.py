@@ -0,0 +1,53 @@
+import pytest
+
+from openai_token_counter import get_token_counter
+from openai_token_counter.models import OpenAIMessage
+
+
+MODEL = "gpt-3.5-turbo"
+CONTENT = "Tool output: ünïcödé 日本語 text with emojis 🎉🎉 and numbers 1234567. " * 20
+
+
+def test_truncate_string() -> None:
+    """Test that strings are truncated to valid prefixes that fit the token limit."""
+    token_counter = get_token_counter(MODEL)
+    total = token_counter.string_tokens(CONTENT)
+
+    assert token_counter.truncate_string(CONTENT, total) == CONTENT
+    assert token_counter.truncate_string(CONTENT, 0) == ""
+
+    for max_tokens in range(1, total, 7):
+        truncated = token_counter.truncate_string(CONTENT, max_tokens)
+
+        assert CONTENT.startswith(truncated)
+        assert token_counter.string_tokens(truncated) <= max_tokens
+        assert max_tokens - token_counter.string_tokens(truncated) <= 4
+
+    with pytest.raises(ValueError):
+        token_counter.truncate_string(CONTENT, -1)
+
+
+@pytest.mark.parametrize("pad", [False, True])
+def test_truncate_message(pad: bool) -> None:
+    """Test that truncated messages fit the token limit including their fixed tokens."""
+    token_counter = get_token_counter(MODEL)
+    message = OpenAIMessage(role="user", name="example_user", content=CONTENT)
+    fixed_tokens = token_counter.estimate_tokens_in_messages(
+        OpenAIMessage(role="user", name="example_user")
+    )
+    total = token_counter.estimate_tokens_in_messages(message, pad=pad)
+
+    assert token_counter.truncate_message(message, total, pad=pad) is message
+
+    for max_tokens in range(fixed_tokens, total, 11):
+        truncated = token_counter.truncate_message(message, max_tokens, pad=pad)
+
+        content = truncated.content or ""
+        assert isinstance(content, str)
+        assert CONTENT.startswith(content)
+        assert (
+            token_counter.estimate_tokens_in_messages(truncated, pad=pad) <= max_tokens
+        )
+
+    with pytest.raises(ValueError):
+        token_counter.truncate_message(message, fixed_tokens - 1)
@@ -86,3 +86,69 @@ param7?: {
 } // namespace functions
 """.strip()
     )
+
+
+def test_format_nested_function_definitions() -> None:
+    """Test that nested objects and arrays of objects keep their layout."""
+    functions: list[OpenAIFunction] = [
+        OpenAIFunction.model_validate(
+            {
+                "name": "nested",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "outer": {
+                            "type": "object",
+                            "description": "The outer object",
+                            "properties": {
+                                "items": {
+                                    "type": "array",
+                                    "description": "Not rendered",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "kind": {
+                                                "type": "string",
+                                                "enum": ["a", "b"],
+                                            },
+                                            "empty": {"type": "object"},
+                                        },
+                                        "required": ["kind"],
+                                    },
+                                },
+                                "count": {"type": "integer", "enum": ["1", "2"]},
+                            },
+                            "required": ["items"],
+                        },
+                        "flag": {"type": "boolean"},
+                    },
+                    "required": ["outer"],
+                },
+            }
+        ),
+        OpenAIFunction.model_validate(
+            {"name": "empty", "parameters": {"type": "object", "properties": {}}}
+        ),
+    ]
+
+    expected_output = """namespace functions {
+
+type nested = (_: {
+// The outer object
+outer: {
+  items: {
+    kind: "a" | "b",
+    empty?: {
+
+},
+}[],
+  count?: 1 | 2,
+},
+flag?: boolean,
+}) => any;
+
+type empty = () => any;
+
+} // namespace functions"""
+
+    assert format_function_definitions(functions) == expected_output
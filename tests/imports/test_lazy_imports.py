@@ -0,0 +1,42 @@
+import subprocess  # noqa: S404
+import sys
+from pathlib import Path
+
+import openai_token_counter
+from openai_token_counter import get_token_counter, preload
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def test_import_defers_heavy_modules() -> None:
+    """Test that importing the package and counting without validation don't import pydantic or tiktoken."""
+    source = Path(openai_token_counter.__file__).parent.parent
+    code = (
+        f"import sys; sys.path.insert(0, {str(source)!r})\n"
+        "import openai_token_counter\n"
+        "print(sorted({'asyncio', 'pydantic', 'tiktoken'} & set(sys.modules)))"
+    )
+    # Isolated mode, so nothing imported by the environment of the test run is counted
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-I", "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+
+    assert output.strip() == "[]"
+
+
+def test_lazy_exports() -> None:
+    """Test that the deferred exports resolve to their classes."""
+    from openai_token_counter.async_counter import AsyncTokenCounter
+    from openai_token_counter.trim import trim_request
+
+    assert openai_token_counter.AsyncTokenCounter is AsyncTokenCounter
+    assert openai_token_counter.trim_request is trim_request
+
+
+def test_preload() -> None:
+    """Test that preloading loads the encodings of the models."""
+    preload([MODEL])
+
+    assert "encoding" in vars(get_token_counter(MODEL))
+    assert "openai_token_counter.models" in sys.modules
@@ -0,0 +1,77 @@
+import pytest
+from pydantic import ValidationError
+
+from openai_token_counter.models import (
+    ArrayProp,
+    NumberProp,
+    ObjectProp,
+    OpenAIFunction,
+    OpenAIRequest,
+    StringProp,
+    functions_adapter,
+    request_adapter,
+)
+
+
+def test_properties_are_validated_by_type() -> None:
+    """Test that nested properties are validated to the model of their type."""
+    function = OpenAIFunction.model_validate(
+        {
+            "name": "function",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "integer": {"type": "integer"},
+                    "number": {"type": "number"},
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"name": {"type": "string"}},
+                        },
+                    },
+                },
+            },
+        }
+    )
+
+    properties = function.parameters.properties
+    assert properties is not None
+    assert isinstance(properties["integer"], NumberProp)
+    assert isinstance(properties["number"], NumberProp)
+    items = properties["items"]
+    assert isinstance(items, ArrayProp)
+    assert isinstance(items.items, ObjectProp)
+    assert items.items.properties is not None
+    assert isinstance(items.items.properties["name"], StringProp)
+
+
+def test_unknown_property_type_is_rejected() -> None:
+    """Test that a property with an unknown type reports a single error for its type."""
+    with pytest.raises(ValidationError) as error:
+        functions_adapter.validate_python(
+            [
+                {
+                    "name": "function",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"date": {"type": "date"}},
+                    },
+                }
+            ]
+        )
+
+    assert error.value.error_count() == 1
+    assert error.value.errors()[0]["type"] == "union_tag_invalid"
+
+
+def test_request_adapter_matches_model() -> None:
+    """Test that the request adapter validates like the request model."""
+    request = {
+        "messages": [{"role": "user", "content": "Hello"}],
+        "function_call": {"name": "function"},
+    }
+
+    assert request_adapter.validate_python(request) == OpenAIRequest.model_validate(
+        request
+    )